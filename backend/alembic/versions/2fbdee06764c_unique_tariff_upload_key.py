@@ -0,0 +1,73 @@
+"""unique_tariff_upload_key
+
+Revision ID: 2fbdee06764c
+Revises: 48576226074f
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2fbdee06764c'
+down_revision: Union[str, Sequence[str], None] = '48576226074f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tariffs removed to make the upload key unique, kept for review (and restored by downgrade)
+ARCHIVE_TABLE = 'tariffs_upload_key_duplicates'
+
+# Every tariff but the most recently created one of its upload key
+DUPLICATE_TARIFFS = """
+    SELECT * FROM tariffs
+    WHERE tariff_id NOT IN (
+        SELECT MAX(tariff_id) FROM tariffs
+        GROUP BY policy_id, age_min, age_max, class_type, family_min, family_max,
+                 COALESCE(outpatient_coverage_percentage, -1.0)
+    )
+"""
+
+
+def upgrade() -> None:
+    """Make the tariff upload duplicate key unique so imports can use ON CONFLICT."""
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text(f"SELECT COUNT(*) FROM ({DUPLICATE_TARIFFS}) AS duplicates")).scalar()
+    if duplicates:
+        # The older tariffs of a key may have other prices: move them to the
+        # archive table instead of deleting them
+        if sa.inspect(connection).has_table(ARCHIVE_TABLE):
+            op.execute(f"INSERT INTO {ARCHIVE_TABLE} {DUPLICATE_TARIFFS}")
+        else:
+            op.execute(f"CREATE TABLE {ARCHIVE_TABLE} AS {DUPLICATE_TARIFFS}")
+        op.execute(f"DELETE FROM tariffs WHERE tariff_id IN (SELECT tariff_id FROM {ARCHIVE_TABLE})")
+        print(f"Moved {duplicates} duplicate tariffs to {ARCHIVE_TABLE}; "
+              f"the most recently created tariff of each upload key was kept")
+
+    op.drop_index('ix_tariffs_upload_key', table_name='tariffs', if_exists=True)
+    op.create_index(
+        'uq_tariffs_upload_key',
+        'tariffs',
+        ['policy_id', 'age_min', 'age_max', 'class_type', 'family_min', 'family_max',
+         sa.text('coalesce(outpatient_coverage_percentage, -1.0)')],
+        unique=True,
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Restore the non-unique upload key index and the archived duplicate tariffs."""
+    op.drop_index('uq_tariffs_upload_key', table_name='tariffs', if_exists=True)
+    op.create_index(
+        'ix_tariffs_upload_key',
+        'tariffs',
+        ['policy_id', 'age_min', 'age_max', 'class_type',
+         'family_min', 'family_max', 'outpatient_coverage_percentage'],
+        if_not_exists=True
+    )
+    if sa.inspect(op.get_bind()).has_table(ARCHIVE_TABLE):
+        op.execute(f"INSERT INTO tariffs SELECT * FROM {ARCHIVE_TABLE}")
+        op.drop_table(ARCHIVE_TABLE)
@@ -0,0 +1,42 @@
+"""add_tariff_lookup_indexes
+
+Revision ID: 48576226074f
+Revises: 17fe06e87df4
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '48576226074f'
+down_revision: Union[str, Sequence[str], None] = '17fe06e87df4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add composite indexes for tariff matching and the upload duplicate key."""
+    # init_database() may already have created them via create_all on fresh databases
+    op.create_index(
+        'ix_tariffs_policy_class_age',
+        'tariffs',
+        ['policy_id', 'class_type', 'age_min', 'age_max'],
+        if_not_exists=True
+    )
+    op.create_index(
+        'ix_tariffs_upload_key',
+        'tariffs',
+        ['policy_id', 'age_min', 'age_max', 'class_type',
+         'family_min', 'family_max', 'outpatient_coverage_percentage'],
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Drop tariff lookup indexes."""
+    op.drop_index('ix_tariffs_upload_key', table_name='tariffs', if_exists=True)
+    op.drop_index('ix_tariffs_policy_class_age', table_name='tariffs', if_exists=True)
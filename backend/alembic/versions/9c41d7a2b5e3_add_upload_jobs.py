@@ -0,0 +1,52 @@
+"""add_upload_jobs
+
+Revision ID: 9c41d7a2b5e3
+Revises: 2fbdee06764c
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41d7a2b5e3'
+down_revision: Union[str, Sequence[str], None] = '2fbdee06764c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the upload_jobs table for background bulk uploads."""
+    op.create_table(
+        'upload_jobs',
+        sa.Column('job_id', sa.String(length=32), nullable=False),
+        sa.Column('upload_type', sa.String(length=20), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column(
+            'status',
+            sa.Enum('queued', 'running', 'completed', 'failed', name='uploadjobstatus'),
+            nullable=False
+        ),
+        sa.Column('rows_total', sa.Integer(), nullable=True),
+        sa.Column('rows_processed', sa.Integer(), nullable=False),
+        sa.Column('records_created', sa.Integer(), nullable=False),
+        sa.Column('records_updated', sa.Integer(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('job_id'),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Drop the upload_jobs table."""
+    op.drop_table('upload_jobs', if_exists=True)
+    sa.Enum(name='uploadjobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""add_upload_ledger
+
+Revision ID: c3e8a1f4d2b7
+Revises: 9c41d7a2b5e3
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f4d2b7'
+down_revision: Union[str, Sequence[str], None] = '9c41d7a2b5e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the upload ledger (file digests) and per-row digest tables."""
+    op.create_table(
+        'upload_ledger',
+        sa.Column('ledger_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('upload_type', sa.String(length=20), nullable=False),
+        sa.Column('file_digest', sa.String(length=64), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('records_processed', sa.Integer(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('reusable', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('ledger_id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_upload_ledger_file_digest', 'upload_ledger', ['file_digest'], if_not_exists=True)
+
+    op.create_table(
+        'upload_row_digests',
+        sa.Column('upload_type', sa.String(length=20), nullable=False),
+        sa.Column('row_key', sa.String(length=255), nullable=False),
+        sa.Column('policy_id', sa.Integer(), nullable=False),
+        sa.Column('row_digest', sa.String(length=64), nullable=False),
+        sa.Column('ledger_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['ledger_id'], ['upload_ledger.ledger_id']),
+        sa.PrimaryKeyConstraint('upload_type', 'row_key'),
+        if_not_exists=True
+    )
+    op.create_index('ix_upload_row_digests_policy_id', 'upload_row_digests', ['policy_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Drop the upload ledger tables."""
+    op.drop_index('ix_upload_row_digests_policy_id', table_name='upload_row_digests', if_exists=True)
+    op.drop_table('upload_row_digests', if_exists=True)
+    op.drop_index('ix_upload_ledger_file_digest', table_name='upload_ledger', if_exists=True)
+    op.drop_table('upload_ledger', if_exists=True)
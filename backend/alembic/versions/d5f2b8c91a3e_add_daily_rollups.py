@@ -0,0 +1,83 @@
+"""add_daily_rollups
+
+Revision ID: d5f2b8c91a3e
+Revises: c3e8a1f4d2b7
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f2b8c91a3e'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a1f4d2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the daily analytics rollup tables and fill them from existing data."""
+    op.create_table(
+        'policy_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('policy_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=30), nullable=False),
+        sa.Column('policy_count', sa.Integer(), nullable=False),
+        sa.Column('premium_count', sa.Integer(), nullable=False),
+        sa.Column('premium_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'policy_id', 'status'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'claim_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('policy_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=30), nullable=False),
+        sa.Column('claim_count', sa.Integer(), nullable=False),
+        sa.Column('amount_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'policy_id', 'status'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'user_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('user_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'is_active'),
+        if_not_exists=True
+    )
+    op.create_index('ix_user_policies_status_user', 'user_policies', ['status', 'user_id'], if_not_exists=True)
+
+    # Same as app.rollups.rebuild_rollups()
+    op.execute("""
+        INSERT INTO policy_daily_rollups (day, policy_id, status, policy_count, premium_count, premium_sum)
+        SELECT date(issued_at), policy_id, CAST(status AS VARCHAR), count(*), count(premium_paid), coalesce(sum(premium_paid), 0)
+        FROM user_policies
+        WHERE issued_at IS NOT NULL
+        GROUP BY date(issued_at), policy_id, CAST(status AS VARCHAR)
+    """)
+    op.execute("""
+        INSERT INTO claim_daily_rollups (day, policy_id, status, claim_count, amount_sum)
+        SELECT date(claims.date_filed), user_policies.policy_id, CAST(claims.status AS VARCHAR), count(*), coalesce(sum(claims.claim_amount), 0)
+        FROM claims JOIN user_policies ON user_policies.user_policy_id = claims.user_policy_id
+        WHERE claims.date_filed IS NOT NULL
+        GROUP BY date(claims.date_filed), user_policies.policy_id, CAST(claims.status AS VARCHAR)
+    """)
+    op.execute("""
+        INSERT INTO user_daily_rollups (day, is_active, user_count)
+        SELECT date(created_at), is_active, count(*)
+        FROM users
+        WHERE created_at IS NOT NULL
+        GROUP BY date(created_at), is_active
+    """)
+
+
+def downgrade() -> None:
+    """Drop the daily analytics rollup tables."""
+    op.drop_index('ix_user_policies_status_user', table_name='user_policies', if_exists=True)
+    op.drop_table('user_daily_rollups', if_exists=True)
+    op.drop_table('claim_daily_rollups', if_exists=True)
+    op.drop_table('policy_daily_rollups', if_exists=True)
@@ -0,0 +1,62 @@
+"""add_user_search_indexes
+
+Revision ID: e7a4c2d9b1f6
+Revises: d5f2b8c91a3e
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a4c2d9b1f6'
+down_revision: Union[str, Sequence[str], None] = 'd5f2b8c91a3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create trigram indexes for user name/email search (see app.user_search)."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+                name, email, content='users', content_rowid='user_id', tokenize='trigram'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+                INSERT INTO users_search(rowid, name, email) VALUES (new.user_id, new.name, new.email);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+                INSERT INTO users_search(users_search, rowid, name, email) VALUES ('delete', old.user_id, old.name, old.email);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name, email ON users BEGIN
+                INSERT INTO users_search(users_search, rowid, name, email) VALUES ('delete', old.user_id, old.name, old.email);
+                INSERT INTO users_search(rowid, name, email) VALUES (new.user_id, new.name, new.email);
+            END
+        """)
+        op.execute("INSERT INTO users_search(users_search) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Drop the user search indexes."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_email_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_users_name_trgm")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS users_search_au")
+        op.execute("DROP TRIGGER IF EXISTS users_search_ad")
+        op.execute("DROP TRIGGER IF EXISTS users_search_ai")
+        op.execute("DROP TABLE IF EXISTS users_search")
@@ -0,0 +1,38 @@
+"""index_upper_tariff_class
+
+Revision ID: f3b9d1c7a2e5
+Revises: e7a4c2d9b1f6
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d1c7a2e5'
+down_revision: Union[str, Sequence[str], None] = 'e7a4c2d9b1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index upper(class_type), which quote matching compares, instead of class_type."""
+    op.drop_index('ix_tariffs_policy_class_age', table_name='tariffs', if_exists=True)
+    op.create_index(
+        'ix_tariffs_policy_class_age',
+        'tariffs',
+        ['policy_id', sa.text('upper(class_type)'), 'age_min', 'age_max']
+    )
+
+
+def downgrade() -> None:
+    """Index class_type as stored."""
+    op.drop_index('ix_tariffs_policy_class_age', table_name='tariffs')
+    op.create_index(
+        'ix_tariffs_policy_class_age',
+        'tariffs',
+        ['policy_id', 'class_type', 'age_min', 'age_max']
+    )
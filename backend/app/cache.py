@@ -0,0 +1,178 @@
+"""
+Shared cache backends and the catalog version.
+
+CACHE_BACKEND selects where cached values live:
+  - "local" (default): bounded in-process LRU with per-entry TTL
+  - "redis": shared between uvicorn workers, needs the redis package and REDIS_URL
+
+The catalog version is a counter that every admin write to plans, tariffs or
+criteria bumps. Cache keys that depend on the catalog embed the version, so a
+bump makes all older entries unreachable without having to delete them.
+
+With the local backend the counter is private to the process, so a bump only
+reaches the worker that handled the write. catalog_ttl() caps the lifetime of
+catalog-dependent entries at LOCAL_CATALOG_TTL_SECONDS there, which bounds how
+long other workers serve stale results; run several workers with
+CACHE_BACKEND=redis to invalidate them all at once.
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+import threading
+import json
+import time
+import os
+
+try:
+    import redis
+    REDIS_SUPPORT = True
+except ImportError:
+    REDIS_SUPPORT = False
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2048))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Longest lifetime of catalog-dependent entries with the local backend
+LOCAL_CATALOG_TTL_SECONDS = int(os.getenv("LOCAL_CATALOG_TTL_SECONDS", 30))
+# Worker processes (uvicorn --workers and gunicorn -w default to it)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+CATALOG_VERSION_KEY = "catalog_version"
+
+
+class LocalCache:
+    """Thread-safe LRU cache with TTL, private to this process"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Counters are kept apart so LRU eviction never resets them
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set the key only if it is absent (or expired); returns whether it was set"""
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] >= time.monotonic()):
+                return False
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCache:
+    """Cache shared by all workers; values are stored as JSON"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "insurance-app:"):
+        if not REDIS_SUPPORT:
+            raise ImportError("redis is not installed. Please install it to use CACHE_BACKEND=redis.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=ttl or None)
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, json.dumps(value, default=str), ex=ttl or None, nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def get_counter(self, key: str) -> int:
+        raw = self.client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the configured cache backend (created on first use)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == "redis":
+                    _cache = RedisCache()
+                else:
+                    _cache = LocalCache()
+    return _cache
+
+
+def set_cache(cache):
+    """Swap the cache backend (e.g. a LocalCache stand-in for tests)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def catalog_ttl(ttl: int) -> int:
+    """TTL for an entry that depends on the catalog version, capped for the local backend"""
+    if CACHE_BACKEND == "redis":
+        return ttl
+    return min(ttl, LOCAL_CATALOG_TTL_SECONDS)
+
+
+def check_cache_backend():
+    """Warn when catalog changes cannot reach every worker right away"""
+    if CACHE_BACKEND != "redis" and WEB_CONCURRENCY > 1:
+        print(
+            f"Warning: CACHE_BACKEND=local with {WEB_CONCURRENCY} workers: catalog changes reach "
+            f"other workers only after {LOCAL_CATALOG_TTL_SECONDS}s. Set CACHE_BACKEND=redis."
+        )
+
+
+def get_catalog_version() -> int:
+    return get_cache().get_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> int:
+    """Record an admin write to plans, tariffs or criteria"""
+    from app.tariff_index import invalidate_tariff_index
+    version = get_cache().incr(CATALOG_VERSION_KEY)
+    invalidate_tariff_index()
+    return version
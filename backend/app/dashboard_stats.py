@@ -0,0 +1,365 @@
+"""
+Admin dashboard statistics with a stale-while-revalidate cache.
+
+Results are cached per (start_date, end_date) in the shared cache backend.
+An entry younger than DASHBOARD_CACHE_FRESH_SECONDS is served as is. An older
+one (up to DASHBOARD_CACHE_MAX_STALE_SECONDS more) is still served, while one
+background refresh recomputes it; a lock key in the cache makes sure only one
+request (in any worker) starts that refresh. Requests that find no entry
+compute it themselves, except that while another request is computing the same
+entry they wait for it for up to DASHBOARD_CACHE_WAIT_SECONDS.
+
+Approving or rejecting an application or a claim bumps the dashboard version,
+which is part of every cache key, so older entries are never served again.
+Other writes show up once an entry goes stale.
+
+Hit rates and computation times are reported at /_metrics.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, distinct, func, select, true
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+import threading
+import time
+import os
+
+from app import metrics, models
+from app.cache import get_cache
+from app.database import SessionLocal
+
+DASHBOARD_CACHE_FRESH_SECONDS = int(os.getenv("DASHBOARD_CACHE_FRESH_SECONDS", 30))
+DASHBOARD_CACHE_MAX_STALE_SECONDS = int(os.getenv("DASHBOARD_CACHE_MAX_STALE_SECONDS", 600))
+DASHBOARD_CACHE_WAIT_SECONDS = float(os.getenv("DASHBOARD_CACHE_WAIT_SECONDS", 5))
+
+DASHBOARD_VERSION_KEY = "dashboard_version"
+
+# A refresh lock outlives a crashed refresh by at most this long
+REFRESH_LOCK_SECONDS = 60
+WAIT_POLL_SECONDS = 0.05
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the single background refresh thread (created on first use)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dashboard-refresh")
+    return _executor
+
+
+def resolve_period(start_date: Optional[date], end_date: Optional[date]) -> Tuple[date, date]:
+    """Date range of the stats (default to current month if not provided)"""
+    if not end_date:
+        end_date = datetime.utcnow().date()
+    if not start_date:
+        # Default to first day of current month
+        start_date = end_date.replace(day=1)
+    return start_date, end_date
+
+
+def compute_dashboard_stats(db: Session, start_date: date, end_date: date) -> dict:
+    """Dashboard statistics for the period, computed from the database"""
+    # Previous period for comparison
+    prev_start = (start_date - timedelta(days=32)).replace(day=1)
+    prev_end = start_date - timedelta(days=1)
+    
+    # Everything except active users is read from the daily rollups (see app.rollups)
+    PolicyRollup = models.PolicyDailyRollup
+    ClaimRollup = models.ClaimDailyRollup
+    UserRollup = models.UserDailyRollup
+    is_active = PolicyRollup.status == models.UserPolicyStatus.active.name
+    
+    def days_between(column, first: date, last: date):
+        return and_(column >= first, column <= last)
+    
+    # Every tile is a conditional aggregate over its rollup; the three one-row
+    # subqueries are read with a single statement
+    policy_stats = select(
+        func.coalesce(func.sum(PolicyRollup.policy_count), 0).label('total_policies'),
+        func.coalesce(func.sum(PolicyRollup.policy_count).filter(is_active), 0).label('active_policies'),
+        func.coalesce(func.sum(PolicyRollup.policy_count).filter(
+            PolicyRollup.status == models.UserPolicyStatus.pending_payment.name
+        ), 0).label('pending_applications'),
+        func.sum(PolicyRollup.premium_sum).filter(is_active).label('total_revenue'),
+        func.sum(PolicyRollup.premium_count).filter(is_active).label('premium_count'),
+        func.coalesce(func.sum(PolicyRollup.policy_count).filter(
+            days_between(PolicyRollup.day, start_date, end_date)
+        ), 0).label('current_period_policies'),
+        func.coalesce(func.sum(PolicyRollup.policy_count).filter(
+            days_between(PolicyRollup.day, prev_start, prev_end)
+        ), 0).label('prev_period_policies'),
+        func.sum(PolicyRollup.premium_sum).filter(
+            is_active, days_between(PolicyRollup.day, start_date, end_date)
+        ).label('current_period_revenue'),
+        func.sum(PolicyRollup.premium_sum).filter(
+            is_active, days_between(PolicyRollup.day, prev_start, prev_end)
+        ).label('prev_period_revenue'),
+    ).subquery()
+    
+    # Signup periods end before their last day, as created_at <= end_date always has
+    user_stats = select(
+        func.coalesce(func.sum(UserRollup.user_count), 0).label('total_users'),
+        func.coalesce(func.sum(UserRollup.user_count).filter(
+            UserRollup.day >= start_date,
+            UserRollup.day < end_date
+        ), 0).label('current_period_users'),
+        func.coalesce(func.sum(UserRollup.user_count).filter(
+            UserRollup.day >= prev_start,
+            UserRollup.day < prev_end
+        ), 0).label('prev_period_users'),
+    ).subquery()
+    
+    claim_stats = select(
+        func.coalesce(func.sum(ClaimRollup.claim_count).filter(
+            ClaimRollup.status.in_([models.ClaimStatus.submitted.name, models.ClaimStatus.in_review.name])
+        ), 0).label('pending_claims'),
+        func.coalesce(func.sum(ClaimRollup.claim_count).filter(
+            ClaimRollup.status == models.ClaimStatus.approved.name
+        ), 0).label('approved_claims'),
+        func.coalesce(func.sum(ClaimRollup.claim_count).filter(
+            ClaimRollup.status == models.ClaimStatus.rejected.name
+        ), 0).label('rejected_claims'),
+    ).subquery()
+    
+    # Active users: users with at least one active policy (distinct, so not
+    # summable from rollups; served by ix_user_policies_status_user)
+    active_user_stats = select(
+        func.count(distinct(models.UserPolicy.user_id)).label('active_users')
+    ).where(
+        models.UserPolicy.status == models.UserPolicyStatus.active
+    ).subquery()
+    
+    stats = db.execute(
+        select(policy_stats, user_stats, claim_stats, active_user_stats).select_from(
+            policy_stats.join(user_stats, true()).join(claim_stats, true()).join(active_user_stats, true())
+        )
+    ).one()
+    
+    total_users = stats.total_users
+    active_users = stats.active_users
+    total_policies = stats.total_policies
+    active_policies = stats.active_policies
+    pending_applications = stats.pending_applications
+    total_revenue = stats.total_revenue or 0
+    avg_premium = (float(total_revenue) / stats.premium_count) if stats.premium_count else 0
+    
+    pending_claims = stats.pending_claims
+    approved_claims = stats.approved_claims
+    rejected_claims = stats.rejected_claims
+    total_claims = pending_claims + approved_claims + rejected_claims
+    approval_rate = (approved_claims / total_claims * 100) if total_claims > 0 else 0
+    
+    # Month-over-month growth calculations
+    current_period_users = stats.current_period_users
+    prev_period_users = stats.prev_period_users
+    users_growth = ((current_period_users - prev_period_users) / prev_period_users * 100) if prev_period_users > 0 else 0
+    
+    current_period_policies = stats.current_period_policies
+    prev_period_policies = stats.prev_period_policies
+    policies_growth = ((current_period_policies - prev_period_policies) / prev_period_policies * 100) if prev_period_policies > 0 else 0
+    
+    current_period_revenue = stats.current_period_revenue or 0
+    prev_period_revenue = stats.prev_period_revenue or 0
+    revenue_growth = ((float(current_period_revenue) - float(prev_period_revenue)) / float(prev_period_revenue) * 100) if prev_period_revenue > 0 else 0
+    
+    # Top insurance types by sales (count of active policies)
+    top_types = db.query(
+        models.InsuranceType.name,
+        func.sum(PolicyRollup.policy_count).label('count')
+    ).join(
+        models.InsurancePlan, models.InsurancePlan.type_id == models.InsuranceType.type_id
+    ).join(
+        PolicyRollup, PolicyRollup.policy_id == models.InsurancePlan.policy_id
+    ).filter(
+        is_active
+    ).group_by(
+        models.InsuranceType.name
+    ).having(
+        func.sum(PolicyRollup.policy_count) > 0
+    ).order_by(
+        func.sum(PolicyRollup.policy_count).desc()
+    ).limit(5).all()
+    
+    # Top providers by policy count
+    top_providers = db.query(
+        models.Provider.name,
+        func.sum(PolicyRollup.policy_count).label('count')
+    ).join(
+        models.InsurancePlan, models.InsurancePlan.provider_id == models.Provider.provider_id
+    ).join(
+        PolicyRollup, PolicyRollup.policy_id == models.InsurancePlan.policy_id
+    ).filter(
+        is_active
+    ).group_by(
+        models.Provider.name
+    ).having(
+        func.sum(PolicyRollup.policy_count) > 0
+    ).order_by(
+        func.sum(PolicyRollup.policy_count).desc()
+    ).limit(5).all()
+    
+    # Monthly revenue and applications trends (last 6 calendar months), one GROUP BY
+    months = []
+    month_start = end_date.replace(day=1)
+    for _ in range(6):
+        months.insert(0, month_start)
+        month_start = (month_start - timedelta(days=1)).replace(day=1)
+    trend_end = (months[-1] + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    
+    if db.get_bind().dialect.name == 'postgresql':
+        month = func.to_char(PolicyRollup.day, 'YYYY-MM')
+    else:
+        month = func.strftime('%Y-%m', PolicyRollup.day)
+    month = month.label('month')
+    monthly = {
+        row.month: row
+        for row in db.query(
+            month,
+            func.sum(PolicyRollup.premium_sum).filter(is_active).label('revenue'),
+            func.sum(PolicyRollup.policy_count).label('applications')
+        ).filter(
+            days_between(PolicyRollup.day, months[0], trend_end)
+        ).group_by(month)
+    }
+    
+    revenue_trend = []
+    applications_trend = []
+    for month_start in months:
+        key = month_start.strftime("%Y-%m")
+        row = monthly.get(key)
+        revenue_trend.append({
+            "month": key,
+            "revenue": float(row.revenue or 0) if row else 0.0
+        })
+        applications_trend.append({
+            "month": key,
+            "applications": row.applications if row else 0
+        })
+    
+    return {
+        "total_users": total_users,
+        "active_users": active_users,
+        "total_policies": total_policies,
+        "active_policies": active_policies,
+        "pending_applications": pending_applications,
+        "pending_claims": pending_claims,
+        "total_revenue": float(total_revenue),
+        "average_premium": float(avg_premium),
+        "users_growth": round(users_growth, 2),
+        "policies_growth": round(policies_growth, 2),
+        "revenue_growth": round(revenue_growth, 2),
+        "approval_rate": round(approval_rate, 2),
+        "claims_approved": approved_claims,
+        "claims_rejected": rejected_claims,
+        "top_insurance_types": [{"name": name, "count": count} for name, count in top_types],
+        "top_providers": [{"name": name, "count": count} for name, count in top_providers],
+        "revenue_trend": revenue_trend,
+        "applications_trend": applications_trend,
+    }
+
+
+def bump_dashboard_version() -> int:
+    """Record an application or claim decision; cached stats are recomputed"""
+    return get_cache().incr(DASHBOARD_VERSION_KEY)
+
+
+def dashboard_cache_key(start_date: date, end_date: date) -> str:
+    version = get_cache().get_counter(DASHBOARD_VERSION_KEY)
+    return f"dashboard:v{version}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def _compute_entry(db: Session, key: str, start_date: date, end_date: date) -> dict:
+    """Compute the stats and store them under key"""
+    started = time.perf_counter()
+    stats = compute_dashboard_stats(db, start_date, end_date)
+    metrics.observe("dashboard_stats.compute", time.perf_counter() - started)
+    get_cache().set(
+        key,
+        {"stats": stats, "computed_at": time.time()},
+        ttl=DASHBOARD_CACHE_FRESH_SECONDS + DASHBOARD_CACHE_MAX_STALE_SECONDS
+    )
+    return stats
+
+
+def _refresh(key: str, start_date: date, end_date: date):
+    db = SessionLocal()
+    try:
+        _compute_entry(db, key, start_date, end_date)
+        metrics.incr("dashboard_stats.refreshes")
+    except Exception as e:
+        metrics.incr("dashboard_stats.refresh_errors")
+        print(f"Dashboard stats refresh failed: {e}")
+    finally:
+        db.close()
+        get_cache().delete(key + ":refresh")
+
+
+def _wait_for_entry(key: str) -> Optional[dict]:
+    """Entry being computed by another request, if it shows up in time"""
+    deadline = time.monotonic() + DASHBOARD_CACHE_WAIT_SECONDS
+    cache = get_cache()
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(key + ":refresh") is None:
+            return None
+    return None
+
+
+def get_dashboard_stats(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> dict:
+    """Dashboard statistics, served from the cache when possible"""
+    start_date, end_date = resolve_period(start_date, end_date)
+    if DASHBOARD_CACHE_FRESH_SECONDS <= 0:
+        return compute_dashboard_stats(db, start_date, end_date)
+
+    cache = get_cache()
+    key = dashboard_cache_key(start_date, end_date)
+    lock_key = key + ":refresh"
+
+    entry = cache.get(key)
+    if entry is not None:
+        if time.time() - entry["computed_at"] <= DASHBOARD_CACHE_FRESH_SECONDS:
+            metrics.incr("dashboard_stats.hits")
+        else:
+            metrics.incr("dashboard_stats.stale_hits")
+            if cache.add(lock_key, 1, ttl=REFRESH_LOCK_SECONDS):
+                get_executor().submit(_refresh, key, start_date, end_date)
+        return entry["stats"]
+
+    metrics.incr("dashboard_stats.misses")
+    if not cache.add(lock_key, 1, ttl=REFRESH_LOCK_SECONDS):
+        entry = _wait_for_entry(key)
+        if entry is not None:
+            return entry["stats"]
+        return _compute_entry(db, key, start_date, end_date)
+    try:
+        return _compute_entry(db, key, start_date, end_date)
+    finally:
+        cache.delete(lock_key)
+
+
+def cache_metrics() -> dict:
+    hits = metrics.counter("dashboard_stats.hits")
+    stale_hits = metrics.counter("dashboard_stats.stale_hits")
+    misses = metrics.counter("dashboard_stats.misses")
+    requests = hits + stale_hits + misses
+    return {
+        "requests": requests,
+        "hits": hits,
+        "stale_hits": stale_hits,
+        "misses": misses,
+        "hit_rate": round((hits + stale_hits) / requests, 4) if requests else None,
+        "refreshes": metrics.counter("dashboard_stats.refreshes"),
+        "refresh_errors": metrics.counter("dashboard_stats.refresh_errors"),
+        "compute": metrics.timing("dashboard_stats.compute"),
+    }
+
+
+metrics.register("dashboard_stats", cache_metrics)
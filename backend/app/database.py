@@ -1,8 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 import os
+import threading
+import time
+
+from app import metrics
 
 load_dotenv()  # Load .env variables
 
@@ -11,21 +19,215 @@ if not SQLALCHEMY_DATABASE_URL:
     # Fallback for local development if env not set
     SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+_is_sqlite = _url.get_backend_name() == "sqlite"
+_is_sqlite_memory = _is_sqlite and _url.database in (None, "", ":memory:")
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool (size workers so that workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# stays below the server's max_connections)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Seconds before a pooled connection is replaced (-1 keeps connections forever)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1 if _is_sqlite else 1800))
+# Test connections before use (drops connections closed by the server or a proxy)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", not _is_sqlite)
+# Postgres statement_timeout in milliseconds (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+# SQLite: write-ahead log (readers don't block the writer) and lock wait
+SQLITE_WAL = _env_bool("SQLITE_WAL", True)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+
+# Drivers of the async engine, by backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+# Query parameters of a Postgres URL that the async engine keeps. SQLAlchemy passes
+# the query to asyncpg.connect() as keywords, so libpq-only parameters
+# (channel_binding, gssencmode, connect_timeout, ...) are dropped. sslmode is
+# translated to asyncpg's ssl.
+ASYNCPG_QUERY_PARAMS = {"ssl", "target_session_attrs", "prepared_statement_cache_size"}
+# asyncpg's prepared statement cache. Poolers in transaction mode (PgBouncer, Neon's
+# -pooler hosts) run each transaction on any server connection, where statements
+# prepared on another one don't exist, so the cache is off unless configured
+ASYNCPG_STATEMENT_CACHE_SIZE = int(os.getenv("ASYNCPG_STATEMENT_CACHE_SIZE", 0))
+
+
+class _MeteredPool:
+    """Records how long each checkout waits under <metric>.* (see pool_metrics)"""
+    metric = "db_pool"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            metrics.incr(f"{self.metric}.checkout_timeouts")
+            raise
+        finally:
+            metrics.observe(f"{self.metric}.checkout", time.perf_counter() - started)
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    metric = "db_pool"
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    metric = "db_async_pool"
+
+
+def _engine_options(is_async: bool = False) -> dict:
+    if _is_sqlite_memory:
+        # One shared in-memory database; keep SQLAlchemy's SQLite pool
+        return {"connect_args": {"check_same_thread": False}}
+
+    options = {
+        "poolclass": MeteredAsyncQueuePool if is_async else MeteredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if _is_sqlite:
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+    elif _url.get_backend_name() == "postgresql":
+        connect_args = {}
+        if is_async:
+            connect_args["statement_cache_size"] = ASYNCPG_STATEMENT_CACHE_SIZE
+            # SQLAlchemy's own cache of asyncpg prepared statements
+            connect_args["prepared_statement_cache_size"] = ASYNCPG_STATEMENT_CACHE_SIZE
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            if is_async:
+                connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+            else:
+                connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        if connect_args:
+            options["connect_args"] = connect_args
+    return options
+
+
+def _async_url():
+    """The database URL with the async driver of its backend"""
+    backend = _url.get_backend_name()
+    if _is_sqlite_memory:
+        # An async engine would open a second, empty in-memory database
+        raise RuntimeError("async handlers need a file or server database; DATABASE_URL is in-memory SQLite")
+    if backend not in ASYNC_DRIVERS:
+        raise NotImplementedError(f"No async driver is configured for {backend} (supported: {', '.join(ASYNC_DRIVERS)})")
+    url = _url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    if backend == "postgresql":
+        if "sslmode" in url.query:
+            # asyncpg takes ssl=<mode> instead of libpq's sslmode
+            url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+        dropped = sorted(set(url.query) - ASYNCPG_QUERY_PARAMS)
+        if dropped:
+            print(f"Note: the async engine ignores DATABASE_URL parameters asyncpg doesn't take: {', '.join(dropped)}")
+            url = url.difference_update_query(dropped)
+    return url
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Sessions for async def handlers, bound to get_async_engine(). They are not
+# expired on commit: attributes cannot be lazy-loaded once the handler has returned
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
 # Expose effective DB info for diagnostics
 DB_URL_EFFECTIVE = SQLALCHEMY_DATABASE_URL
 DB_DIALECT = engine.dialect.name
 
+
+def _register_pool_events(target, metric: str):
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.incr(f"{metric}.connects")
+        if _is_sqlite:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+            if SQLITE_WAL and not _is_sqlite_memory:
+                cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.close()
+
+    @event.listens_for(target, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.incr(f"{metric}.invalidated")
+
+
+def _pool_report(pool, metric: str) -> dict:
+    """Pool occupancy and checkout waits of this process"""
+    report = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        report.update({
+            "size": pool.size(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # Connections open beyond pool_size (QueuePool counts unopened slots as negative)
+            "overflow": max(0, pool.overflow()),
+        })
+    report.update({
+        "connects": metrics.counter(f"{metric}.connects"),
+        "invalidated": metrics.counter(f"{metric}.invalidated"),
+        "checkout_timeouts": metrics.counter(f"{metric}.checkout_timeouts"),
+        "checkout": metrics.timing(f"{metric}.checkout"),
+    })
+    return report
+
+
+def pool_metrics() -> dict:
+    return _pool_report(engine.pool, "db_pool")
+
+
+def async_pool_metrics() -> dict:
+    return _pool_report(_async_engine.pool, "db_async_pool")
+
+
+_register_pool_events(engine, "db_pool")
+metrics.register("db_pool", pool_metrics)
+
+
+def get_async_engine():
+    """Async engine on the same database (created on first use)"""
+    global _async_engine
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                async_engine = create_async_engine(_async_url(), **_engine_options(is_async=True))
+                _register_pool_events(async_engine.sync_engine, "db_async_pool")
+                metrics.register("db_async_pool", async_pool_metrics)
+                _async_engine = async_engine
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Close the async engine's connections if it was created"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
 # Global session dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Session dependency for async def handlers
+async def get_async_db():
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
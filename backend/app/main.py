@@ -4,7 +4,12 @@ from fastapi.staticfiles import StaticFiles
 from app.routes import auth_routes
 from app.routes import marketplace_routes, policy_routes, claims_routes, notifications_routes, document_routes, admin_routes
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, Base, engine, DB_URL_EFFECTIVE, DB_DIALECT
+from app.database import SessionLocal, Base, engine, dispose_async_engine, DB_URL_EFFECTIVE, DB_DIALECT
+from app.upload_jobs import fail_interrupted_jobs
+from app.cache import check_cache_backend
+from app import metrics
+from app import rollups
+from app import user_search
 from sqlalchemy import text
 from contextlib import asynccontextmanager
 import os
@@ -155,6 +160,22 @@ def init_database():
                 # Table might not exist yet, will be created by Base.metadata.create_all
                 print(f"Note: Columns will be added when table is created: {_e}")
                 pass
+        # Create the user search indexes for databases built with create_all
+        try:
+            with engine.begin() as conn:
+                if user_search.ensure_search_index(conn):
+                    print("Created user search indexes")
+        except Exception as _e:
+            print(f"Warning: Could not create user search indexes: {_e}")
+        # Build the analytics rollups when they were just created next to existing data
+        try:
+            if rollups.rollups_missing(db):
+                counts = rollups.rebuild_rollups(db)
+                db.commit()
+                print(f"Built analytics rollups: {counts}")
+        except Exception as _e:
+            db.rollback()
+            print(f"Warning: Could not build analytics rollups: {_e}")
         print("Database initialization complete.")
     except Exception as e:
         print(f"Error during database initialization: {e}")
@@ -171,8 +192,11 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     init_database()
+    fail_interrupted_jobs()
+    check_cache_backend()
     yield
-    # Shutdown (if needed, add cleanup here)
+    # Shutdown
+    await dispose_async_engine()
 
 
 app = FastAPI(title="The Insurance App API", lifespan=lifespan)
@@ -204,6 +228,12 @@ def root():
     return {"message": "Welcome to The Insurance App"}
 
 
+@app.get("/_metrics")
+def metrics_report():
+    """Process-local operational metrics (cache hit rates, computation times)."""
+    return metrics.snapshot()
+
+
 @app.get("/_health/db")
 def db_healthcheck():
     """Return basic DB connectivity and which database is configured."""
@@ -0,0 +1,256 @@
+"""
+Policy matching engines for /marketplace/policies/match.
+
+The quote endpoint delegates to one of the engines below. The engine is chosen
+with the QUOTE_ENGINE environment variable:
+  - "index" (default): in-memory tariff index, no database round-trips per quote
+  - "numpy": columnar tariff snapshot evaluated with vectorized masks
+  - "sql": single SQL statement that filters and ranks tariffs in the database
+  - "scan": original per-policy scan, kept for comparison and as a fallback
+
+Results are cached per normalized criteria and catalog version, for
+QUOTE_CACHE_TTL_SECONDS (0 disables the cache; the local cache backend keeps
+them at most LOCAL_CATALOG_TTL_SECONDS, see app.cache).
+"""
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from typing import List
+import os
+
+from app import models, schemas
+from app.cache import catalog_ttl, get_cache, get_catalog_version
+from app.serializers import plan_detail_options
+
+QUOTE_ENGINE = os.getenv("QUOTE_ENGINE", "index").lower()
+QUOTE_CACHE_TTL_SECONDS = int(os.getenv("QUOTE_CACHE_TTL_SECONDS", 600))
+
+
+def tariff_matches(tariff, criteria: schemas.PolicyMatchCriteria) -> bool:
+    """Check whether a single tariff row fits the user's criteria"""
+    # Match class type (case-insensitive comparison)
+    if tariff.class_type.upper() != criteria.insurance_class.upper():
+        return False
+
+    # Match family type
+    if criteria.insurance_type == "individual":
+        # For individual, check if family_size of 1 falls within the tariff's range
+        # This allows tariffs that support both individuals and families (e.g., family_min=1, family_max=100)
+        if not (tariff.family_min <= 1 <= tariff.family_max):
+            return False
+    else:  # family
+        # For family, check if family_size falls within range
+        if criteria.family_size is None:
+            return False
+        if not (tariff.family_min <= criteria.family_size <= tariff.family_max):
+            return False
+
+    # Match primary age
+    if not (tariff.age_min <= criteria.primary_age <= tariff.age_max):
+        return False
+
+    # Match family member ages (if applicable)
+    if criteria.insurance_type == "family" and criteria.family_ages:
+        for age in criteria.family_ages:
+            if not (tariff.age_min <= age <= tariff.age_max):
+                return False
+
+    return True
+
+
+def build_matched_policy(policy_out: schemas.InsurancePlanDetailOut, matching_tariffs: list) -> schemas.MatchedPolicyOut:
+    """
+    Group the matching tariffs of one plan into a single quote result.
+    The base tariff is the one with the lowest outpatient coverage, and every
+    tariff with outpatient coverage > 0% is offered as an add-on.
+    """
+    # Find base tariff (prefer one with no outpatient coverage or 0%)
+    # Use the one with the lowest outpatient_coverage_percentage (or None)
+    base_tariff = None
+    for tariff in matching_tariffs:
+        if base_tariff is None:
+            base_tariff = tariff
+        else:
+            # Prefer tariff with no outpatient or 0% outpatient
+            base_outpatient = base_tariff.outpatient_coverage_percentage or 0.0
+            tariff_outpatient = tariff.outpatient_coverage_percentage or 0.0
+            if tariff_outpatient < base_outpatient:
+                base_tariff = tariff
+
+    # Collect all outpatient options (all tariffs with outpatient coverage > 0%)
+    outpatient_options = []
+    for tariff in matching_tariffs:
+        if tariff.outpatient_coverage_percentage is not None and tariff.outpatient_coverage_percentage > 0:
+            outpatient_options.append(schemas.OutpatientOption(
+                outpatient_coverage_percentage=tariff.outpatient_coverage_percentage,
+                outpatient_price_usd=float(tariff.outpatient_price_usd) if tariff.outpatient_price_usd else None,
+                tariff_id=tariff.tariff_id
+            ))
+
+    # Sort outpatient options by percentage (ascending)
+    outpatient_options.sort(key=lambda x: x.outpatient_coverage_percentage)
+
+    if not isinstance(base_tariff, schemas.MatchedTariffOut):
+        base_tariff = schemas.MatchedTariffOut.from_orm(base_tariff)
+
+    return schemas.MatchedPolicyOut(
+        policy=policy_out,
+        matching_tariff=base_tariff,
+        outpatient_options=outpatient_options
+    )
+
+
+def match_policies_scan(db: Session, criteria: schemas.PolicyMatchCriteria) -> List[schemas.MatchedPolicyOut]:
+    """Original matching path: one tariff query per active policy, filtered in Python"""
+    policies = db.query(models.InsurancePlan).options(*plan_detail_options()).filter(
+        models.InsurancePlan.status == "active"
+    ).order_by(models.InsurancePlan.policy_id).all()
+
+    matched_policies = []
+    for policy in policies:
+        tariffs = db.query(models.Tariff).filter(
+            models.Tariff.policy_id == policy.policy_id
+        ).order_by(models.Tariff.tariff_id).all()
+
+        matching_tariffs = [t for t in tariffs if tariff_matches(t, criteria)]
+        if matching_tariffs:
+            matched_policies.append(build_matched_policy(
+                schemas.InsurancePlanDetailOut.from_orm(policy),
+                matching_tariffs
+            ))
+
+    return matched_policies
+
+
+def quote_family_size(criteria: schemas.PolicyMatchCriteria):
+    """Family size a tariff must cover, or None when the criteria can never match"""
+    if criteria.insurance_type == "individual":
+        return 1
+    return criteria.family_size
+
+
+def quote_age_bounds(criteria: schemas.PolicyMatchCriteria):
+    """Youngest and oldest age that a matching tariff must cover"""
+    ages = [criteria.primary_age]
+    if criteria.insurance_type == "family" and criteria.family_ages:
+        ages.extend(criteria.family_ages)
+    return min(ages), max(ages)
+
+
+def match_policies_sql(db: Session, criteria: schemas.PolicyMatchCriteria) -> List[schemas.MatchedPolicyOut]:
+    """
+    Single-statement matching path.
+    All predicates run in the database, and a window function ranks each plan's
+    matching tariffs so the base tariff comes back flagged. Rows are ordered by
+    plan, so grouping is one linear pass. Works on Postgres and SQLite (>= 3.25).
+    """
+    family_size = quote_family_size(criteria)
+    if family_size is None:
+        return []
+    age_low, age_high = quote_age_bounds(criteria)
+
+    Tariff = models.Tariff
+    Plan = models.InsurancePlan
+
+    # Same rule as build_matched_policy: lowest outpatient coverage wins, first tariff on ties
+    base_rank = func.row_number().over(
+        partition_by=Tariff.policy_id,
+        order_by=(func.coalesce(Tariff.outpatient_coverage_percentage, 0.0), Tariff.tariff_id)
+    ).label("base_rank")
+
+    stmt = select(Plan, models.Provider, models.InsuranceType, Tariff, base_rank).join(
+        Tariff, Tariff.policy_id == Plan.policy_id
+    ).join(
+        models.Provider, models.Provider.provider_id == Plan.provider_id
+    ).join(
+        models.InsuranceType, models.InsuranceType.type_id == Plan.type_id
+    ).where(
+        Plan.status == "active",
+        func.upper(Tariff.class_type) == criteria.insurance_class.upper(),
+        Tariff.family_min <= family_size,
+        Tariff.family_max >= family_size,
+        Tariff.age_min <= age_low,
+        Tariff.age_max >= age_high
+    ).order_by(Plan.policy_id, Tariff.tariff_id)
+
+    matched_policies = []
+    current_plan = None
+    base_tariff = None
+    outpatient_tariffs = []
+
+    def flush():
+        outpatient_tariffs.sort(key=lambda t: t.outpatient_coverage_percentage)
+        matched_policies.append(schemas.MatchedPolicyOut(
+            policy=schemas.InsurancePlanDetailOut.from_orm(current_plan),
+            matching_tariff=schemas.MatchedTariffOut.from_orm(base_tariff),
+            outpatient_options=[
+                schemas.OutpatientOption(
+                    outpatient_coverage_percentage=t.outpatient_coverage_percentage,
+                    outpatient_price_usd=float(t.outpatient_price_usd) if t.outpatient_price_usd else None,
+                    tariff_id=t.tariff_id
+                )
+                for t in outpatient_tariffs
+            ]
+        ))
+
+    for plan, _provider, _insurance_type, tariff, rank in db.execute(stmt):
+        if current_plan is not None and plan.policy_id != current_plan.policy_id:
+            flush()
+            base_tariff = None
+            outpatient_tariffs = []
+        current_plan = plan
+        if rank == 1:
+            base_tariff = tariff
+        if tariff.outpatient_coverage_percentage is not None and tariff.outpatient_coverage_percentage > 0:
+            outpatient_tariffs.append(tariff)
+
+    if current_plan is not None:
+        flush()
+
+    return matched_policies
+
+
+def quote_cache_key(criteria: schemas.PolicyMatchCriteria, catalog_version: int) -> str:
+    """
+    Cache key for a quote. Only the class, the family size a tariff must cover
+    and the youngest/oldest age affect the result, so criteria that differ in
+    anything else (case, age order, unused fields) share an entry.
+    """
+    family_size = quote_family_size(criteria)
+    age_low, age_high = quote_age_bounds(criteria)
+    return f"quote:v{catalog_version}:{criteria.insurance_class.upper()}:{family_size}:{age_low}:{age_high}"
+
+
+def run_engine(db: Session, criteria: schemas.PolicyMatchCriteria) -> List[schemas.MatchedPolicyOut]:
+    """Run the configured matching engine without the cache"""
+    if QUOTE_ENGINE == "scan":
+        return match_policies_scan(db, criteria)
+    if QUOTE_ENGINE == "sql":
+        return match_policies_sql(db, criteria)
+
+    from app.tariff_index import get_tariff_index
+    return get_tariff_index(db, quote_index_class()).match(criteria)
+
+
+def quote_index_class():
+    """In-memory index implementation for the configured engine"""
+    if QUOTE_ENGINE == "numpy":
+        from app.vector_index import VectorTariffIndex
+        return VectorTariffIndex
+    from app.tariff_index import TariffIndex
+    return TariffIndex
+
+
+def match_policies(db: Session, criteria: schemas.PolicyMatchCriteria) -> List[dict]:
+    """Return quote results as plain dicts, served from the quote cache when possible"""
+    if QUOTE_CACHE_TTL_SECONDS <= 0:
+        return [m.dict() for m in run_engine(db, criteria)]
+
+    cache = get_cache()
+    key = quote_cache_key(criteria, get_catalog_version())
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = [m.dict() for m in run_engine(db, criteria)]
+    cache.set(key, result, ttl=catalog_ttl(QUOTE_CACHE_TTL_SECONDS))
+    return result
@@ -0,0 +1,58 @@
+"""
+Process-local operational metrics, served at /_metrics.
+
+Modules record counters with incr() and durations with observe(), and
+register a section function that turns them into the figures they report
+(rates, averages). Values are per process; with several uvicorn workers each
+one reports its own.
+"""
+from typing import Callable, Dict
+import threading
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timings: Dict[str, dict] = {}
+_sections: Dict[str, Callable[[], dict]] = {}
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, seconds: float):
+    """Record one duration"""
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0})
+        timing["count"] += 1
+        timing["total_seconds"] += seconds
+        timing["max_seconds"] = max(timing["max_seconds"], seconds)
+        timing["last_seconds"] = seconds
+
+
+def counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def timing(name: str) -> dict:
+    """count, total/avg/max/last seconds of a duration"""
+    with _lock:
+        values = dict(_timings.get(name) or {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0})
+    values["avg_seconds"] = values["total_seconds"] / values["count"] if values["count"] else 0.0
+    return {key: round(value, 6) if isinstance(value, float) else value for key, value in values.items()}
+
+
+def register(section: str, report: Callable[[], dict]):
+    """Add a section to the /_metrics report"""
+    _sections[section] = report
+
+
+def snapshot() -> dict:
+    report = {}
+    for section, section_report in _sections.items():
+        try:
+            report[section] = section_report()
+        except Exception as e:
+            report[section] = {"error": str(e)}
+    return report
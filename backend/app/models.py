@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Text, Boolean, Numeric, Enum as SQLEnum, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Text, Boolean, Numeric, Enum as SQLEnum, Date, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
 
 from datetime import datetime
@@ -34,6 +35,13 @@ class ClaimStatus(enum.Enum):
     rejected = "rejected"
 
 
+class UploadJobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
 # Models
 class User(Base):
     __tablename__ = "users"
@@ -180,6 +188,11 @@ class UserPolicy(Base):
     version = relationship("PolicyDocumentVersion", back_populates="user_policies")
     claims = relationship("Claim", back_populates="user_policy")
 
+    __table_args__ = (
+        # Active-user counts on the admin dashboard (index-only scan)
+        Index("ix_user_policies_status_user", "status", "user_id"),
+    )
+
 
 class Claim(Base):
     __tablename__ = "claims"
@@ -219,6 +232,20 @@ class Tariff(Base):
 
     plan = relationship("InsurancePlan", backref="tariffs")
 
+    __table_args__ = (
+        # Quote matching and per-policy admin listings/deletes. Quotes compare
+        # classes case-insensitively, so the index is on upper(class_type)
+        Index("ix_tariffs_policy_class_age", policy_id, func.upper(class_type), age_min, age_max),
+        # Duplicate key used by the tariff upload; NULL outpatient coverage is folded
+        # to -1 so rows without outpatient coverage also conflict with each other
+        Index(
+            "uq_tariffs_upload_key",
+            policy_id, age_min, age_max, class_type,
+            family_min, family_max, func.coalesce(outpatient_coverage_percentage, -1.0),
+            unique=True
+        ),
+    )
+
 
 class PlanCriteria(Base):
     __tablename__ = "plan_criteria"
@@ -230,3 +257,84 @@ class PlanCriteria(Base):
 
     # Relationship
     plan = relationship("InsurancePlan", backref="criteria")
+
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    job_id = Column(String(32), primary_key=True)  # uuid4 hex
+    upload_type = Column(String(20), nullable=False)  # policies, tariffs or criteria
+    filename = Column(String(255), nullable=True)
+    status = Column(SQLEnum(UploadJobStatus), nullable=False, default=UploadJobStatus.queued)
+
+    # Progress
+    rows_total = Column(Integer, nullable=True)  # Estimate; unknown for JSON files
+    rows_processed = Column(Integer, nullable=False, default=0)
+    records_created = Column(Integer, nullable=False, default=0)
+    records_updated = Column(Integer, nullable=False, default=0)
+
+    result = Column(Text, nullable=True)  # UploadResponse as JSON once completed
+    error = Column(Text, nullable=True)  # Reason the job failed
+
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class UploadLedger(Base):
+    __tablename__ = "upload_ledger"
+
+    ledger_id = Column(Integer, primary_key=True, autoincrement=True)
+    upload_type = Column(String(20), nullable=False)  # tariffs or criteria
+    file_digest = Column(String(64), nullable=False, index=True)  # SHA-256 of the uploaded bytes and parse options
+    filename = Column(String(255), nullable=True)
+    records_processed = Column(Integer, nullable=False, default=0)
+    result = Column(Text, nullable=True)  # UploadResponse as JSON
+    # Set once the upload completed; cleared when the catalog is changed outside uploads
+    reusable = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadRowDigest(Base):
+    __tablename__ = "upload_row_digests"
+
+    upload_type = Column(String(20), primary_key=True)
+    row_key = Column(String(255), primary_key=True)  # Duplicate key of the row (policy_id for criteria)
+    policy_id = Column(Integer, nullable=False, index=True)
+    row_digest = Column(String(64), nullable=False)  # SHA-256 of the normalized row last written
+    ledger_id = Column(Integer, ForeignKey("upload_ledger.ledger_id"), nullable=True)
+
+
+# Daily analytics rollups, maintained by app.rollups
+class PolicyDailyRollup(Base):
+    __tablename__ = "policy_daily_rollups"
+
+    day = Column(Date, primary_key=True)  # Date the policy was issued
+    policy_id = Column(Integer, primary_key=True)  # Insurance plan (gives provider and type)
+    status = Column(String(30), primary_key=True)  # UserPolicyStatus name
+    policy_count = Column(Integer, nullable=False, default=0)
+    premium_count = Column(Integer, nullable=False, default=0)  # Policies with a premium, for averages
+    premium_sum = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class ClaimDailyRollup(Base):
+    __tablename__ = "claim_daily_rollups"
+
+    day = Column(Date, primary_key=True)  # Date the claim was filed
+    policy_id = Column(Integer, primary_key=True)  # Insurance plan of the claimed user policy
+    status = Column(String(30), primary_key=True)  # ClaimStatus name
+    claim_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class UserDailyRollup(Base):
+    __tablename__ = "user_daily_rollups"
+
+    day = Column(Date, primary_key=True)  # Date the user signed up
+    is_active = Column(Boolean, primary_key=True)
+    user_count = Column(Integer, nullable=False, default=0)
+
+
+# Every session that writes these models keeps the daily rollups current
+from app import rollups  # noqa: E402,F401
@@ -0,0 +1,126 @@
+"""
+Offset and keyset pagination for the admin list endpoints.
+
+Offset pages (?page=N) count every matching row and skip the rows of earlier
+pages, so deep pages get slower with the table. Keyset pages start with an
+empty ?cursor= and continue with the next_cursor of the previous page: each
+page is read with "key > last key ORDER BY key LIMIT page_size" on an indexed
+unique key, so every page costs the same however deep it is. next_cursor is
+None on the last page.
+
+Keyset pages skip the count unless ?total= asks for it:
+  - "exact": count every matching row
+  - "estimate": the planner's row estimate for unfiltered lists on Postgres,
+    otherwise a count that stops at PAGINATION_COUNT_CAP rows
+    (total_is_estimate tells whether the cap was reached)
+"""
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Query
+from typing import Any, Callable, Optional
+import base64
+import json
+import os
+
+PAGINATION_COUNT_CAP = int(os.getenv("PAGINATION_COUNT_CAP", 10000))
+
+TOTAL_MODES = "^(exact|estimate)$"
+
+
+def encode_cursor(last_key: Any) -> str:
+    payload = json.dumps({"after": last_key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Last key of the previous page (None for the first page)"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))["after"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _table_estimate(query: Query) -> Optional[int]:
+    """Planner row estimate of the table behind an unfiltered query (Postgres only)"""
+    session = query.session
+    if session.get_bind().dialect.name != 'postgresql':
+        return None
+    table = query.column_descriptions[0]['entity'].__table__
+    estimate = session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table.name}
+    ).scalar()
+    # -1 / 0 until the table has been analyzed
+    return estimate if estimate and estimate > 0 else None
+
+
+def count_total(query: Query, mode: Optional[str], filtered: bool = True):
+    """(total, total_is_estimate) for a keyset page"""
+    if mode == "exact":
+        return query.order_by(None).count(), False
+    if mode != "estimate":
+        return None, False
+
+    if not filtered:
+        estimate = _table_estimate(query)
+        if estimate is not None:
+            return estimate, True
+
+    capped = query.order_by(None).limit(PAGINATION_COUNT_CAP).subquery()
+    total = query.session.execute(select(func.count()).select_from(capped)).scalar()
+    return total, total >= PAGINATION_COUNT_CAP
+
+
+def paginate(
+    query: Query,
+    key_column,
+    serialize: Callable[[list], list],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = None,
+    filtered: bool = True
+) -> dict:
+    """
+    One page of query in the PaginatedResponse shape: keyset mode when a cursor
+    (possibly empty) is given, otherwise the existing offset mode.
+    key_column must be unique and indexed; serialize turns the rows into items.
+    """
+    if cursor is None:
+        total = query.count()
+        items = query.offset((page - 1) * page_size).limit(page_size).all()
+        return {
+            "items": serialize(items),
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+
+    last_key = decode_cursor(cursor)
+    total, total_is_estimate = count_total(query, total_mode, filtered)
+
+    page_query = query.order_by(None).order_by(key_column.asc())
+    if last_key is not None:
+        page_query = page_query.filter(key_column > last_key)
+    # One extra row tells whether there is a next page
+    items = page_query.limit(page_size + 1).all()
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(getattr(items[-1], key_column.key))
+
+    return {
+        "items": serialize(items),
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "page": None,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,291 @@
+"""
+Daily rollups of user policies, claims and users for admin analytics.
+
+Each rollup table holds counts and sums per day and status; policies and
+claims are also split by insurance plan, which gives provider and insurance
+type through insurance_plans. Reports sum a few rollup rows per day instead of
+scanning user_policies and claims.
+
+The rollups are kept current by a before_flush hook on every Session
+(registered when app.models is imported, so any code that writes models gets
+it): every flush that inserts, deletes or changes a user policy, claim or user
+adds the difference to the affected rollup rows in the same transaction. Bulk
+query.update()/delete() calls bypass the hook; run rebuild_rollups() (see
+backend/rebuild_rollups.py) after changing these tables by other means.
+
+Rows without a date (day) are not counted.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import String, cast, event, func, inspect, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+
+from app import models
+
+# Tracked columns of each source model
+POLICY_FIELDS = ('issued_at', 'status', 'policy_id', 'premium_paid')
+CLAIM_FIELDS = ('date_filed', 'status', 'user_policy_id', 'claim_amount')
+USER_FIELDS = ('created_at', 'is_active')
+
+
+def _day(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _status(value) -> Optional[str]:
+    # Enum columns store member names
+    return value.name if value is not None else None
+
+
+def _money(value) -> Optional[Decimal]:
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def _with_default(obj, field: str):
+    """Value of a pending object's column, applying the column default the insert would use"""
+    value = getattr(obj, field)
+    if value is None:
+        default = obj.__table__.c[field].default
+        if default is not None:
+            value = default.arg(None) if default.is_callable else default.arg
+            setattr(obj, field, value)
+    return value
+
+
+def _previous(obj, field: str):
+    """Value of a column as last loaded from the database"""
+    history = inspect(obj).attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, field)
+
+
+def _loaded_on_set(target, value, oldvalue, initiator):
+    pass
+
+
+# Setting a tracked column of an expired object (e.g. after a commit) loads
+# its previous value first, so the flush hook can take it out of the rollups
+for _model, _fields in ((models.UserPolicy, POLICY_FIELDS), (models.Claim, CLAIM_FIELDS), (models.User, USER_FIELDS)):
+    for _field in _fields:
+        event.listen(getattr(_model, _field), "set", _loaded_on_set, active_history=True)
+
+
+def _changed(obj, fields: Tuple[str, ...]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _claim_plan_id(
+    session: Session, claim: models.Claim, user_policy_id, pending: Dict[int, int], previous: bool = False
+) -> Optional[int]:
+    """
+    Insurance plan of a claim's user policy as of before this flush (previous)
+    or after it (pending maps user policies inserted by this flush)
+    """
+    user_policy = claim.user_policy
+    if user_policy is None or user_policy.user_policy_id not in (user_policy_id, None):
+        if user_policy_id is None:
+            return None
+        if user_policy_id in pending:
+            return pending[user_policy_id]
+        user_policy = session.identity_map.get(session.identity_key(models.UserPolicy, user_policy_id))
+        if user_policy is None:
+            return session.query(models.UserPolicy.policy_id).filter(
+                models.UserPolicy.user_policy_id == user_policy_id
+            ).scalar()
+    return _previous(user_policy, 'policy_id') if previous else user_policy.policy_id
+
+
+def _claim_in_flush(session: Session, claim_id: int) -> bool:
+    """Whether the flush counts this claim itself (changed or deleted)"""
+    claim = session.identity_map.get(session.identity_key(models.Claim, claim_id))
+    return claim is not None and (claim in session.deleted or _changed(claim, CLAIM_FIELDS))
+
+
+class RollupDelta:
+    """Pending rollup changes of one flush: rollup model -> key -> column deltas"""
+
+    def __init__(self):
+        self.tables: Dict[type, Dict[tuple, Dict[str, object]]] = {}
+
+    def add(self, model, key: dict, sign: int, **values):
+        if any(value is None for value in key.values()):
+            return
+        rows = self.tables.setdefault(model, {})
+        row_key = tuple(sorted(key.items()))
+        totals = rows.setdefault(row_key, {})
+        for column, value in values.items():
+            if value is None:
+                continue
+            totals[column] = totals.get(column, 0) + sign * value
+
+    def policy(self, sign: int, issued_at, status, policy_id, premium_paid):
+        self.add(
+            models.PolicyDailyRollup,
+            {'day': _day(issued_at), 'status': _status(status), 'policy_id': policy_id},
+            sign,
+            policy_count=1,
+            premium_count=1 if premium_paid is not None else 0,
+            premium_sum=_money(premium_paid)
+        )
+
+    def claim(self, sign: int, date_filed, status, policy_id, claim_amount):
+        self.add(
+            models.ClaimDailyRollup,
+            {'day': _day(date_filed), 'status': _status(status), 'policy_id': policy_id},
+            sign,
+            claim_count=1,
+            amount_sum=_money(claim_amount)
+        )
+
+    def user(self, sign: int, created_at, is_active):
+        self.add(
+            models.UserDailyRollup,
+            {'day': _day(created_at), 'is_active': bool(is_active)},
+            sign,
+            user_count=1
+        )
+
+    def apply(self, session: Session):
+        """Add the deltas to the rollup rows (creating missing rows)"""
+        dialect = session.get_bind().dialect.name
+        for model, rows in self.tables.items():
+            rows = [dict(key, **totals) for key, totals in rows.items() if any(totals.values())]
+            if not rows:
+                continue
+            if dialect == 'postgresql':
+                stmt = postgresql.insert(model)
+            elif dialect == 'sqlite':
+                stmt = sqlite.insert(model)
+            else:
+                raise NotImplementedError(f"Rollup upsert is not supported on {dialect}")
+            table = model.__table__
+            measures = [column.name for column in table.columns if not column.primary_key]
+            for row in rows:
+                for column in measures:
+                    row.setdefault(column, 0)
+            stmt = stmt.values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key],
+                set_={column: table.c[column] + stmt.excluded[column] for column in measures}
+            )
+            session.connection().execute(stmt)
+
+
+@event.listens_for(Session, "before_flush")
+def update_rollups(session: Session, flush_context, instances):
+    delta = RollupDelta()
+    pending = {
+        obj.user_policy_id: obj.policy_id
+        for obj in session.new
+        if isinstance(obj, models.UserPolicy) and obj.user_policy_id is not None
+    }
+
+    for obj in session.new:
+        if isinstance(obj, models.UserPolicy):
+            delta.policy(1, *[_with_default(obj, field) for field in POLICY_FIELDS])
+        elif isinstance(obj, models.Claim):
+            date_filed, status, user_policy_id, claim_amount = [_with_default(obj, field) for field in CLAIM_FIELDS]
+            delta.claim(1, date_filed, status, _claim_plan_id(session, obj, user_policy_id, pending), claim_amount)
+        elif isinstance(obj, models.User):
+            delta.user(1, *[_with_default(obj, field) for field in USER_FIELDS])
+
+    for obj in session.dirty:
+        if isinstance(obj, models.UserPolicy) and _changed(obj, POLICY_FIELDS):
+            delta.policy(-1, *[_previous(obj, field) for field in POLICY_FIELDS])
+            delta.policy(1, *[getattr(obj, field) for field in POLICY_FIELDS])
+            previous_plan_id = _previous(obj, 'policy_id')
+            if previous_plan_id != obj.policy_id:
+                # Claims are counted under the plan of their user policy
+                for claim_id, date_filed, status, claim_amount in session.query(
+                    models.Claim.claim_id, models.Claim.date_filed, models.Claim.status, models.Claim.claim_amount
+                ).filter(models.Claim.user_policy_id == obj.user_policy_id):
+                    if _claim_in_flush(session, claim_id):
+                        continue
+                    delta.claim(-1, date_filed, status, previous_plan_id, claim_amount)
+                    delta.claim(1, date_filed, status, obj.policy_id, claim_amount)
+        elif isinstance(obj, models.Claim) and _changed(obj, CLAIM_FIELDS):
+            date_filed, status, user_policy_id, claim_amount = [_previous(obj, field) for field in CLAIM_FIELDS]
+            delta.claim(
+                -1, date_filed, status, _claim_plan_id(session, obj, user_policy_id, pending, previous=True), claim_amount
+            )
+            delta.claim(
+                1, obj.date_filed, obj.status,
+                _claim_plan_id(session, obj, obj.user_policy_id, pending), obj.claim_amount
+            )
+        elif isinstance(obj, models.User) and _changed(obj, USER_FIELDS):
+            delta.user(-1, *[_previous(obj, field) for field in USER_FIELDS])
+            delta.user(1, *[getattr(obj, field) for field in USER_FIELDS])
+
+    for obj in session.deleted:
+        if isinstance(obj, models.UserPolicy):
+            delta.policy(-1, *[_previous(obj, field) for field in POLICY_FIELDS])
+        elif isinstance(obj, models.Claim):
+            date_filed, status, user_policy_id, claim_amount = [_previous(obj, field) for field in CLAIM_FIELDS]
+            delta.claim(
+                -1, date_filed, status, _claim_plan_id(session, obj, user_policy_id, pending, previous=True), claim_amount
+            )
+        elif isinstance(obj, models.User):
+            delta.user(-1, *[_previous(obj, field) for field in USER_FIELDS])
+
+    delta.apply(session)
+
+
+def rollups_missing(db: Session) -> bool:
+    """Whether the rollups are empty although there are users or policies to count"""
+    for model in (models.PolicyDailyRollup, models.ClaimDailyRollup, models.UserDailyRollup):
+        if db.query(model).first() is not None:
+            return False
+    return (
+        db.query(models.User.user_id).first() is not None
+        or db.query(models.UserPolicy.user_policy_id).first() is not None
+    )
+
+
+def rebuild_rollups(db: Session):
+    """Recompute every rollup table from the source tables; the caller commits"""
+    policy_day = func.date(models.UserPolicy.issued_at)
+    policy_status = cast(models.UserPolicy.status, String)
+    claim_day = func.date(models.Claim.date_filed)
+    claim_status = cast(models.Claim.status, String)
+    user_day = func.date(models.User.created_at)
+
+    sources = {
+        models.PolicyDailyRollup: select(
+            policy_day, models.UserPolicy.policy_id, policy_status,
+            func.count(),
+            func.count(models.UserPolicy.premium_paid),
+            func.coalesce(func.sum(models.UserPolicy.premium_paid), 0)
+        ).where(
+            models.UserPolicy.issued_at.isnot(None)
+        ).group_by(policy_day, models.UserPolicy.policy_id, policy_status),
+        models.ClaimDailyRollup: select(
+            claim_day, models.UserPolicy.policy_id, claim_status,
+            func.count(),
+            func.coalesce(func.sum(models.Claim.claim_amount), 0)
+        ).join(
+            models.UserPolicy, models.UserPolicy.user_policy_id == models.Claim.user_policy_id
+        ).where(
+            models.Claim.date_filed.isnot(None)
+        ).group_by(claim_day, models.UserPolicy.policy_id, claim_status),
+        models.UserDailyRollup: select(
+            user_day, models.User.is_active, func.count()
+        ).where(
+            models.User.created_at.isnot(None)
+        ).group_by(user_day, models.User.is_active),
+    }
+
+    counts = {}
+    for model, source in sources.items():
+        db.query(model).delete(synchronize_session=False)
+        columns = [column.name for column in model.__table__.columns]
+        db.execute(insert(model).from_select(columns, source))
+        counts[model.__tablename__] = db.query(func.count()).select_from(model).scalar()
+    return counts
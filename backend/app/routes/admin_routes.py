@@ -1,14 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_, or_
-from typing import Optional, List
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, Optional, List
 from datetime import date, datetime
+from functools import partial
+import tempfile
+import json
 
-from app import models, schemas, utils
+from app import models, schemas, utils, serializers, tariff_import, upload_jobs, upload_ledger, dashboard_stats, pagination, user_search
 from app.database import get_db
+from app.cache import bump_catalog_version
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# Tariff diffs up to this size stay in memory before spilling to disk
+UPLOAD_DIFF_SPOOL_SIZE = 8 * 1024 * 1024
 security = HTTPBearer()
 
 
@@ -78,193 +88,8 @@ def get_dashboard_stats(
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Get comprehensive dashboard statistics"""
-    from datetime import timedelta
-    from sqlalchemy import distinct, extract
-    
-    # Get date range (default to current month if not provided)
-    if not end_date:
-        end_date = datetime.utcnow().date()
-    if not start_date:
-        # Default to first day of current month
-        start_date = end_date.replace(day=1)
-    
-    # Previous period for comparison
-    prev_start = (start_date - timedelta(days=32)).replace(day=1)
-    prev_end = start_date - timedelta(days=1)
-    
-    # Total users
-    total_users = db.query(func.count(models.User.user_id)).scalar()
-    
-    # Active users (users with at least one active policy)
-    active_users_query = db.query(func.count(func.distinct(models.UserPolicy.user_id))).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    )
-    active_users = active_users_query.scalar()
-    
-    # Total policies (all user policies)
-    total_policies = db.query(func.count(models.UserPolicy.user_policy_id)).scalar()
-    
-    # Active policies count
-    active_policies = db.query(func.count(models.UserPolicy.user_policy_id)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    ).scalar()
-    
-    # Pending applications
-    pending_applications = db.query(func.count(models.UserPolicy.user_policy_id)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.pending_payment
-    ).scalar()
-    
-    # Total revenue (sum of premium_paid for active policies)
-    total_revenue = db.query(func.sum(models.UserPolicy.premium_paid)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    ).scalar() or 0
-    
-    # Claims metrics
-    pending_claims = db.query(func.count(models.Claim.claim_id)).filter(
-        models.Claim.status.in_([models.ClaimStatus.submitted, models.ClaimStatus.in_review])
-    ).scalar()
-    
-    approved_claims = db.query(func.count(models.Claim.claim_id)).filter(
-        models.Claim.status == models.ClaimStatus.approved
-    ).scalar()
-    
-    rejected_claims = db.query(func.count(models.Claim.claim_id)).filter(
-        models.Claim.status == models.ClaimStatus.rejected
-    ).scalar()
-    
-    total_claims = pending_claims + approved_claims + rejected_claims
-    approval_rate = (approved_claims / total_claims * 100) if total_claims > 0 else 0
-    
-    # Average premium per policy
-    avg_premium = db.query(func.avg(models.UserPolicy.premium_paid)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    ).scalar() or 0
-    
-    # Month-over-month growth calculations
-    current_period_users = db.query(func.count(models.User.user_id)).filter(
-        models.User.created_at >= start_date,
-        models.User.created_at <= end_date
-    ).scalar()
-    
-    prev_period_users = db.query(func.count(models.User.user_id)).filter(
-        models.User.created_at >= prev_start,
-        models.User.created_at <= prev_end
-    ).scalar()
-    
-    users_growth = ((current_period_users - prev_period_users) / prev_period_users * 100) if prev_period_users > 0 else 0
-    
-    current_period_policies = db.query(func.count(models.UserPolicy.user_policy_id)).filter(
-        models.UserPolicy.issued_at >= datetime.combine(start_date, datetime.min.time()),
-        models.UserPolicy.issued_at <= datetime.combine(end_date, datetime.max.time())
-    ).scalar()
-    
-    prev_period_policies = db.query(func.count(models.UserPolicy.user_policy_id)).filter(
-        models.UserPolicy.issued_at >= datetime.combine(prev_start, datetime.min.time()),
-        models.UserPolicy.issued_at <= datetime.combine(prev_end, datetime.max.time())
-    ).scalar()
-    
-    policies_growth = ((current_period_policies - prev_period_policies) / prev_period_policies * 100) if prev_period_policies > 0 else 0
-    
-    current_period_revenue = db.query(func.sum(models.UserPolicy.premium_paid)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active,
-        models.UserPolicy.issued_at >= datetime.combine(start_date, datetime.min.time()),
-        models.UserPolicy.issued_at <= datetime.combine(end_date, datetime.max.time())
-    ).scalar() or 0
-    
-    prev_period_revenue = db.query(func.sum(models.UserPolicy.premium_paid)).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active,
-        models.UserPolicy.issued_at >= datetime.combine(prev_start, datetime.min.time()),
-        models.UserPolicy.issued_at <= datetime.combine(prev_end, datetime.max.time())
-    ).scalar() or 0
-    
-    revenue_growth = ((float(current_period_revenue) - float(prev_period_revenue)) / float(prev_period_revenue) * 100) if prev_period_revenue > 0 else 0
-    
-    # Top insurance types by sales (count of active policies)
-    top_types = db.query(
-        models.InsuranceType.name,
-        func.count(models.UserPolicy.user_policy_id).label('count')
-    ).join(
-        models.InsurancePlan, models.InsurancePlan.type_id == models.InsuranceType.type_id
-    ).join(
-        models.UserPolicy, models.UserPolicy.policy_id == models.InsurancePlan.policy_id
-    ).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    ).group_by(
-        models.InsuranceType.name
-    ).order_by(
-        func.count(models.UserPolicy.user_policy_id).desc()
-    ).limit(5).all()
-    
-    # Top providers by policy count
-    top_providers = db.query(
-        models.Provider.name,
-        func.count(models.UserPolicy.user_policy_id).label('count')
-    ).join(
-        models.InsurancePlan, models.InsurancePlan.provider_id == models.Provider.provider_id
-    ).join(
-        models.UserPolicy, models.UserPolicy.policy_id == models.InsurancePlan.policy_id
-    ).filter(
-        models.UserPolicy.status == models.UserPolicyStatus.active
-    ).group_by(
-        models.Provider.name
-    ).order_by(
-        func.count(models.UserPolicy.user_policy_id).desc()
-    ).limit(5).all()
-    
-    # Monthly revenue trend (last 6 months)
-    revenue_trend = []
-    for i in range(5, -1, -1):
-        month_start = (end_date.replace(day=1) - timedelta(days=32*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_revenue = db.query(func.sum(models.UserPolicy.premium_paid)).filter(
-            models.UserPolicy.status == models.UserPolicyStatus.active,
-            models.UserPolicy.issued_at >= datetime.combine(month_start, datetime.min.time()),
-            models.UserPolicy.issued_at <= datetime.combine(month_end, datetime.max.time())
-        ).scalar() or 0
-        
-        revenue_trend.append({
-            "month": month_start.strftime("%Y-%m"),
-            "revenue": float(month_revenue)
-        })
-    
-    # Monthly applications trend
-    applications_trend = []
-    for i in range(5, -1, -1):
-        month_start = (end_date.replace(day=1) - timedelta(days=32*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_apps = db.query(func.count(models.UserPolicy.user_policy_id)).filter(
-            models.UserPolicy.issued_at >= datetime.combine(month_start, datetime.min.time()),
-            models.UserPolicy.issued_at <= datetime.combine(month_end, datetime.max.time())
-        ).scalar()
-        
-        applications_trend.append({
-            "month": month_start.strftime("%Y-%m"),
-            "applications": month_apps
-        })
-    
-    return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "total_policies": total_policies,
-        "active_policies": active_policies,
-        "pending_applications": pending_applications,
-        "pending_claims": pending_claims,
-        "total_revenue": float(total_revenue),
-        "average_premium": float(avg_premium),
-        "users_growth": round(users_growth, 2),
-        "policies_growth": round(policies_growth, 2),
-        "revenue_growth": round(revenue_growth, 2),
-        "approval_rate": round(approval_rate, 2),
-        "claims_approved": approved_claims,
-        "claims_rejected": rejected_claims,
-        "top_insurance_types": [{"name": name, "count": count} for name, count in top_types],
-        "top_providers": [{"name": name, "count": count} for name, count in top_providers],
-        "revenue_trend": revenue_trend,
-        "applications_trend": applications_trend,
-    }
+    """Get comprehensive dashboard statistics (cached, see app.dashboard_stats)"""
+    return dashboard_stats.get_dashboard_stats(db, start_date, end_date)
 
 
 # ==================== Users Management ====================
@@ -275,19 +100,17 @@ def get_users(
     search: Optional[str] = None,
     is_active: Optional[bool] = None,
     is_admin: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="Keyset pagination: empty for the first page, then next_cursor"),
+    total: Optional[str] = Query(None, pattern=pagination.TOTAL_MODES, description="Total for keyset pages: exact or estimate"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Get paginated list of users"""
+    """Get paginated list of users (offset pages, or keyset pages by user_id)"""
     query = db.query(models.User)
     
     if search:
-        query = query.filter(
-            or_(
-                models.User.name.ilike(f"%{search}%"),
-                models.User.email.ilike(f"%{search}%")
-            )
-        )
+        # Best matches first (keyset pages stay in user_id order)
+        query = user_search.search_users(query, search).order_by(models.User.user_id)
     
     if is_active is not None:
         query = query.filter(models.User.is_active == is_active)
@@ -295,16 +118,12 @@ def get_users(
     if is_admin is not None:
         query = query.filter(models.User.is_admin == is_admin)
     
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    return {
-        "items": [schemas.UserOut.from_orm(user) for user in items],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    return pagination.paginate(
+        query, models.User.user_id,
+        lambda users: [schemas.UserOut.from_orm(user) for user in users],
+        page, page_size, cursor, total,
+        filtered=bool(search) or is_active is not None or is_admin is not None
+    )
 
 
 @router.get("/users/{user_id}", response_model=schemas.UserOut)
@@ -403,7 +222,9 @@ def get_user_policies(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_policies = db.query(models.UserPolicy).filter(
+    user_policies = db.query(models.UserPolicy).options(
+        *serializers.user_policy_detail_options()
+    ).filter(
         models.UserPolicy.user_id == user_id
     ).all()
     
@@ -500,7 +321,9 @@ def get_user_claims(
     if not user_policy_ids:
         return []
     
-    claims = db.query(models.Claim).filter(
+    claims = db.query(models.Claim).options(
+        joinedload(models.Claim.user_policy)
+    ).filter(
         models.Claim.user_policy_id.in_(user_policy_ids)
     ).all()
     
@@ -516,10 +339,12 @@ def get_policies(
     status: Optional[str] = None,
     type_id: Optional[int] = None,
     provider_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset pagination: empty for the first page, then next_cursor"),
+    total: Optional[str] = Query(None, pattern=pagination.TOTAL_MODES, description="Total for keyset pages: exact or estimate"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Get paginated list of policies"""
+    """Get paginated list of policies (offset pages, or keyset pages by policy_id)"""
     query = db.query(models.InsurancePlan)
     
     if search:
@@ -539,16 +364,12 @@ def get_policies(
     if provider_id:
         query = query.filter(models.InsurancePlan.provider_id == provider_id)
     
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    return {
-        "items": [schemas.InsurancePlanDetailOut.from_orm(policy) for policy in items],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    return pagination.paginate(
+        query.options(*serializers.plan_detail_options()), models.InsurancePlan.policy_id,
+        lambda policies: [serializers.serialize_plan_detail(policy) for policy in policies],
+        page, page_size, cursor, total,
+        filtered=bool(search or status or type_id or provider_id)
+    )
 
 
 @router.get("/policies/{policy_id}", response_model=schemas.InsurancePlanDetailOut)
@@ -558,7 +379,9 @@ def get_policy(
     admin_user: models.User = Depends(get_current_admin)
 ):
     """Get policy by ID"""
-    policy = db.query(models.InsurancePlan).filter(models.InsurancePlan.policy_id == policy_id).first()
+    policy = db.query(models.InsurancePlan).options(
+        *serializers.plan_detail_options()
+    ).filter(models.InsurancePlan.policy_id == policy_id).first()
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     return schemas.InsurancePlanDetailOut.from_orm(policy)
@@ -573,8 +396,11 @@ def create_policy(
     """Create a new policy"""
     policy = models.InsurancePlan(**policy_data.dict())
     db.add(policy)
+    # New or removed plans change which uploaded rows pass validation
+    upload_ledger.forget_uploads(db, "tariffs", "criteria", keep_rows=True)
     db.commit()
     db.refresh(policy)
+    bump_catalog_version()
     return schemas.InsurancePlanDetailOut.from_orm(policy)
 
 
@@ -596,6 +422,7 @@ def update_policy(
     
     db.commit()
     db.refresh(policy)
+    bump_catalog_version()
     return schemas.InsurancePlanDetailOut.from_orm(policy)
 
 
@@ -666,7 +493,10 @@ def delete_policy(
         )
     
     db.delete(policy)
+    # New or removed plans change which uploaded rows pass validation
+    upload_ledger.forget_uploads(db, "tariffs", "criteria", keep_rows=True)
     db.commit()
+    bump_catalog_version()
     return {"message": "Policy deleted successfully"}
 
 
@@ -679,10 +509,12 @@ def get_claims(
     user_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = Query(None, description="Keyset pagination: empty for the first page, then next_cursor"),
+    total: Optional[str] = Query(None, pattern=pagination.TOTAL_MODES, description="Total for keyset pages: exact or estimate"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Get paginated list of claims"""
+    """Get paginated list of claims (offset pages, or keyset pages by claim_id)"""
     query = db.query(models.Claim)
     
     if status:
@@ -697,16 +529,12 @@ def get_claims(
     if end_date:
         query = query.filter(models.Claim.date_filed <= end_date)
     
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    return {
-        "items": [schemas.ClaimDetailOut.from_orm(claim) for claim in items],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    return pagination.paginate(
+        query.options(joinedload(models.Claim.user_policy)), models.Claim.claim_id,
+        lambda claims: [schemas.ClaimDetailOut.from_orm(claim) for claim in claims],
+        page, page_size, cursor, total,
+        filtered=bool(status or user_id or start_date or end_date)
+    )
 
 
 @router.get("/claims/{claim_id}", response_model=schemas.ClaimDetailOut)
@@ -735,6 +563,7 @@ def approve_claim(
     
     claim.status = models.ClaimStatus.approved
     db.commit()
+    dashboard_stats.bump_dashboard_version()
     db.refresh(claim)
     return schemas.ClaimDetailOut.from_orm(claim)
 
@@ -756,6 +585,7 @@ def reject_claim(
         claim.description = f"{claim.description or ''}\n[Rejected: {reason}]".strip()
     
     db.commit()
+    dashboard_stats.bump_dashboard_version()
     db.refresh(claim)
     return schemas.ClaimDetailOut.from_orm(claim)
 
@@ -816,6 +646,7 @@ def update_provider(
     
     db.commit()
     db.refresh(provider)
+    bump_catalog_version()
     return schemas.ProviderOut.from_orm(provider)
 
 
@@ -855,10 +686,15 @@ def get_applications(
     policy_type_id: Optional[int] = None,
     provider_id: Optional[int] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset pagination: empty for the first page, then next_cursor"),
+    total: Optional[str] = Query(None, pattern=pagination.TOTAL_MODES, description="Total for keyset pages: exact or estimate"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Get paginated list of policy applications (pending_payment by default)"""
+    """
+    Get paginated list of policy applications (pending_payment by default).
+    Keyset pages follow user_policy_id, which is assigned in issue order.
+    """
     query = db.query(models.UserPolicy)
     
     # Filter by status - default to pending_payment
@@ -867,8 +703,8 @@ def get_applications(
     else:
         query = query.filter(models.UserPolicy.status == models.UserPolicyStatus.pending_payment)
     
-    # Join with policy for filtering
-    query = query.join(models.InsurancePlan)
+    # Join with policy and user for filtering; the same joins load them for the response
+    query = query.join(models.UserPolicy.plan).join(models.UserPolicy.user)
     
     if policy_type_id:
         query = query.filter(models.InsurancePlan.type_id == policy_type_id)
@@ -876,37 +712,18 @@ def get_applications(
     if provider_id:
         query = query.filter(models.InsurancePlan.provider_id == provider_id)
     
-    # Search by user name or email
+    # Search by user name or email, best matches first
     if search:
-        query = query.join(models.User).filter(
-            or_(
-                models.User.name.ilike(f"%{search}%"),
-                models.User.email.ilike(f"%{search}%")
-            )
-        )
+        query = user_search.search_users(query, search)
     
     # Order by oldest first (priority queue)
     query = query.order_by(models.UserPolicy.issued_at.asc())
     
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    # Build response with user and policy details
-    result_items = []
-    for user_policy in items:
-        user = db.query(models.User).filter(models.User.user_id == user_policy.user_id).first()
-        policy_data = schemas.UserPolicyDetailOut.from_orm(user_policy)
-        policy_dict = policy_data.dict()
-        policy_dict["user"] = schemas.UserOut.from_orm(user).dict()
-        result_items.append(policy_dict)
-    
-    return {
-        "items": result_items,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    return pagination.paginate(
+        query.options(*serializers.application_options()), models.UserPolicy.user_policy_id,
+        lambda items: [serializers.serialize_application(user_policy) for user_policy in items],
+        page, page_size, cursor, total
+    )
 
 
 @router.get("/applications/{user_policy_id}", response_model=schemas.ApplicationDetailOut)
@@ -979,6 +796,7 @@ def approve_application(
     user_policy.status = models.UserPolicyStatus.active
     
     db.commit()
+    dashboard_stats.bump_dashboard_version()
     db.refresh(user_policy)
     
     return schemas.UserPolicyDetailOut.from_orm(user_policy)
@@ -1015,18 +833,38 @@ def reject_application(
         pass
     
     db.commit()
+    dashboard_stats.bump_dashboard_version()
     db.refresh(user_policy)
     
     return schemas.UserPolicyDetailOut.from_orm(user_policy)
 
 
 # ==================== Bulk Upload Endpoints ====================
-@router.post("/upload/policies", response_model=schemas.UploadResponse)
-def upload_policies(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin)
-):
+# Each upload is handled by a process_*_upload function. The endpoints run it
+# in the request, or with ?background=true queue it as a job (see app.upload_jobs)
+# that clients follow through /admin/upload/jobs/{job_id}.
+def queue_upload(
+    upload_type: str,
+    file: UploadFile,
+    processor: Callable,
+    db: Session,
+    admin_user: models.User,
+    all_sheets: bool = False
+) -> JSONResponse:
+    """Queue an upload as a background job and answer 202 with the job"""
+    job = upload_jobs.submit_upload_job(db, upload_type, file, processor, created_by=admin_user.user_id,
+                                        all_sheets=all_sheets)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(schemas.UploadJobOut.from_orm(job))
+    )
+
+
+def process_policy_upload(
+    file: UploadFile,
+    db: Session,
+    progress: Optional[Callable] = None
+) -> schemas.UploadResponse:
     """Upload insurance policies from CSV or JSON file"""
     errors = []
     records_processed = 0
@@ -1038,23 +876,28 @@ def upload_policies(
         file_extension = file.filename.split('.')[-1].lower()
         
         if file_extension == 'csv':
-            data_list = utils.parse_csv_file(file)
+            data_list = utils.iter_csv_rows(file)
         elif file_extension == 'json':
-            data_list = utils.parse_json_file(file)
+            data_list = utils.iter_json_rows(file)
         else:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid file type. Only CSV and JSON files are supported."
             )
         
+        validation = utils.UploadValidationContext(db)
+        
         # Process each record
         for idx, data in enumerate(data_list):
+            if progress is not None:
+                progress(records_processed, records_created, records_updated)
             records_processed += 1
             try:
                 # Validate data
-                is_valid, error_msg = utils.validate_policy_data(data, db)
+                is_valid, error_msg = utils.validate_policy_data(data, validation, idx + 1)
                 if not is_valid:
-                    errors.append(f"Row {idx + 1}: {error_msg}")
+                    if error_msg:
+                        errors.append(f"Row {idx + 1}: {error_msg}")
                     continue
                 
                 policy_data = {
@@ -1090,7 +933,11 @@ def upload_policies(
             except Exception as e:
                 errors.append(f"Row {idx + 1}: {str(e)}")
         
+        errors.extend(validation.unknown_id_errors())
+        # New or removed plans change which uploaded rows pass validation
+        upload_ledger.forget_uploads(db, "tariffs", "criteria", keep_rows=True)
         db.commit()
+        bump_catalog_version()
         
         return schemas.UploadResponse(
             message="Upload completed",
@@ -1105,223 +952,186 @@ def upload_policies(
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
 
-@router.post("/upload/tariffs", response_model=schemas.UploadResponse)
-def upload_tariffs(
+@router.post(
+    "/upload/policies",
+    response_model=schemas.UploadResponse,
+    responses={202: {"model": schemas.UploadJobOut, "description": "Queued as a background job"}}
+)
+def upload_policies(
     file: UploadFile = File(...),
+    background: bool = Query(False, description="Process the file as a background job"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Upload tariff data from CSV, JSON, or Excel (.xlsx) file"""
+    """Upload insurance policies from CSV or JSON file"""
+    if background:
+        return queue_upload("policies", file, process_policy_upload, db, admin_user)
+    return process_policy_upload(file, db)
+
+
+def process_tariff_upload(
+    file: UploadFile,
+    db: Session,
+    progress: Optional[Callable] = None,
+    all_sheets: bool = False,
+    dry_run: bool = False,
+    diff_sink: Optional[Callable[[dict], None]] = None,
+    force: bool = False
+) -> schemas.UploadResponse:
+    """
+    Upload tariff data from CSV, JSON, or Excel (.xlsx) file.
+    With all_sheets, every sheet of an Excel workbook is imported (read in
+    parallel) and errors name the sheet and row.
+    With dry_run nothing is written: rows are classified as created, updated or
+    unchanged against the current catalog, and each classified row is passed
+    to diff_sink when one is given.
+    Unless force is set, a file identical to the last tariff upload is not
+    processed again, and rows unchanged since they were last uploaded are
+    skipped (see app.upload_ledger).
+    """
     errors = []
     records_processed = 0
     records_created = 0
     records_updated = 0
+    records_unchanged = 0
+    planned_tariffs = {}  # dry run: keys created or updated by earlier chunks
     
-    # Batch size for commits to avoid too many parameters in a single SQL statement
-    # Increased to 100 for better performance - SQLAlchemy can handle this many parameters
-    BATCH_SIZE = 100
+    # Rows are streamed from the file and validated/written one chunk at a time,
+    # so memory use does not depend on the size of the upload; chunks loaded
+    # with COPY are larger since each one is a single round trip
+    BATCH_SIZE = tariff_import.TARIFF_COPY_BATCH_SIZE if tariff_import.copy_supported(db) else 500
     
     try:
         # Parse file based on extension
         file_extension = file.filename.split('.')[-1].lower()
         
         if file_extension == 'csv':
-            data_list = utils.parse_csv_file(file)
+            rows = utils.iter_csv_rows(file)
         elif file_extension == 'json':
-            data_list = utils.parse_json_file(file)
+            rows = utils.iter_json_rows(file)
         elif file_extension in ['xlsx', 'xls']:
             if file_extension == 'xls':
                 raise HTTPException(
                     status_code=400,
                     detail="Old Excel format (.xls) is not supported. Please convert to .xlsx format."
                 )
-            data_list = utils.parse_excel_file(file)
+            rows = utils.iter_excel_sheet_rows(file) if all_sheets else utils.iter_excel_rows(file)
         else:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid file type. Only CSV, JSON, and Excel (.xlsx) files are supported."
             )
         
-        # Pre-load all existing tariffs into memory for fast duplicate checking
-        # This avoids a database query for every single record
-        print(f"Pre-loading existing tariffs for duplicate checking...")
-        existing_tariffs_map = {}
-        all_existing_tariffs = db.query(models.Tariff).all()
-        for tariff in all_existing_tariffs:
-            # Create a unique key for duplicate checking
-            key = (
-                tariff.policy_id,
-                tariff.age_min,
-                tariff.age_max,
-                tariff.class_type,
-                tariff.family_min,
-                tariff.family_max,
-                tariff.outpatient_coverage_percentage
-            )
-            existing_tariffs_map[key] = tariff
-        print(f"Loaded {len(existing_tariffs_map)} existing tariffs into memory")
+        validation = utils.UploadValidationContext(db)
+        normalize_tariff_row = utils.RowNormalizer(tariff_import.TARIFF_ROW_SPEC, tariff_import.TARIFF_COLUMN_ALIASES)
         
-        # Process each record
-        for idx, data in enumerate(data_list):
-            records_processed += 1
-            try:
-                # Normalize data keys (handle case variations and spaces)
-                normalized_data = {}
-                for key, value in data.items():
-                    # Normalize key: lowercase, replace spaces/underscores/dashes with underscores
-                    normalized_key = str(key).strip().lower().replace(' ', '_').replace('-', '_')
+        ledger = None
+        if not dry_run:
+            digest = upload_ledger.file_digest(file, all_sheets=all_sheets)
+            repeated = None if force else upload_ledger.find_repeated_upload(db, "tariffs", digest)
+            if repeated is not None:
+                return upload_ledger.repeated_upload_response(repeated)
+            ledger = upload_ledger.start_upload(db, "tariffs", digest, file.filename)
+        
+        # Existing tariffs are matched by the database through the unique
+        # upload key (see tariff_import.upsert_tariffs), nothing is pre-loaded
+        row_number = 0
+        for chunk in utils.iter_chunks(rows, BATCH_SIZE):
+            staged_tariffs = {}  # duplicate key -> values to upsert
+            staged_refs = {}  # duplicate key -> row reference, for the diff
+            
+            for data in chunk:
+                if progress is not None:
+                    progress(records_processed, records_created, records_updated)
+                row_number += 1
+                records_processed += 1
+                # Rows from multi-sheet workbooks are reported as "<sheet>:<row>"
+                sheet_name = data.pop(utils.EXCEL_SHEET_KEY, None)
+                sheet_row = data.pop(utils.EXCEL_SHEET_ROW_KEY, None)
+                row_ref = f"{sheet_name}:{sheet_row}" if sheet_name is not None else row_number
+                try:
+                    # Column names are resolved once per file, then each value is converted
+                    tariff_data = normalize_tariff_row(data)
                     
-                    # Handle common column name variations
-                    # Map plan_id to policy_id
-                    if normalized_key == 'plan_id':
-                        normalized_key = 'policy_id'
+                    # Validate data
+                    is_valid, error_msg = utils.validate_tariff_data(tariff_data, validation, row_ref)
+                    if not is_valid:
+                        if error_msg:
+                            errors.append(f"Row {row_ref}: {error_msg}")
+                        continue
                     
-                    normalized_data[normalized_key] = value
-                
-                # Convert string values to appropriate types first (before validation)
-                def safe_int(value, default=None):
-                    if value is None or value == '':
-                        return default
-                    try:
-                        # Handle Excel numeric types and strings
-                        if isinstance(value, (int, float)):
-                            return int(value)
-                        # Convert string to number
-                        return int(float(str(value).strip()))
-                    except (ValueError, TypeError, AttributeError):
-                        return default
-                
-                # Pre-convert numeric fields for validation
-                if 'policy_id' in normalized_data:
-                    normalized_data['policy_id'] = safe_int(normalized_data.get('policy_id'))
-                if 'age_min' in normalized_data:
-                    normalized_data['age_min'] = safe_int(normalized_data.get('age_min'))
-                if 'age_max' in normalized_data:
-                    normalized_data['age_max'] = safe_int(normalized_data.get('age_max'))
-                if 'family_min' in normalized_data:
-                    normalized_data['family_min'] = safe_int(normalized_data.get('family_min'), 1)
-                if 'family_max' in normalized_data:
-                    normalized_data['family_max'] = safe_int(normalized_data.get('family_max'), 1)
-                
-                # Validate data
-                is_valid, error_msg = utils.validate_tariff_data(normalized_data, db)
-                if not is_valid:
-                    errors.append(f"Row {idx + 1}: {error_msg}")
-                    continue
-                
-                def safe_float(value):
-                    if value is None or value == '':
-                        return None
-                    try:
-                        return float(value)
-                    except (ValueError, TypeError):
-                        return None
-                
-                def safe_percentage(value):
-                    """Convert percentage value (1-100) to decimal (0-1) format"""
-                    if value is None or value == '':
-                        return None
-                    try:
-                        percentage = float(value)
-                        # If value is > 1, assume it's a percentage (1-100) and convert to decimal (0-1)
-                        if percentage > 1:
-                            return percentage / 100.0
-                        # If value is <= 1, assume it's already in decimal format (0-1)
-                        return percentage
-                    except (ValueError, TypeError):
-                        return None
-                
-                tariff_data = {
-                    'policy_id': normalized_data.get('policy_id'),  # Already converted above
-                    'age_min': normalized_data.get('age_min'),  # Already converted above
-                    'age_max': normalized_data.get('age_max'),  # Already converted above
-                    'class_type': str(normalized_data.get('class_type', '')).strip(),
-                    'family_type': str(normalized_data.get('family_type', '')).strip() if normalized_data.get('family_type') else None,
-                    'family_min': normalized_data.get('family_min', 1),  # Already converted above
-                    'family_max': normalized_data.get('family_max', 1),  # Already converted above
-                    'inpatient_usd': safe_float(normalized_data.get('inpatient_usd')),
-                    'total_usd': safe_float(normalized_data.get('total_usd')),
-                    'outpatient_coverage_percentage': safe_percentage(normalized_data.get('outpatient_coverage_percentage')),
-                    'outpatient_price_usd': safe_float(normalized_data.get('outpatient_price_usd'))
-                }
-                
-                # Validate required fields after conversion
-                if tariff_data['policy_id'] is None:
-                    errors.append(f"Row {idx + 1}: policy_id is required and must be a valid integer")
-                    continue
-                if tariff_data['age_min'] is None:
-                    errors.append(f"Row {idx + 1}: age_min is required and must be a valid integer")
-                    continue
-                if tariff_data['age_max'] is None:
-                    errors.append(f"Row {idx + 1}: age_max is required and must be a valid integer")
-                    continue
-                if not tariff_data['class_type']:
-                    errors.append(f"Row {idx + 1}: class_type is required")
-                    continue
-                
-                # Check for duplicate tariff using in-memory lookup (much faster than DB query)
-                # A tariff is considered duplicate if it has the same:
-                # policy_id, age_min, age_max, class_type, family_min, family_max, and outpatient_coverage_percentage
-                duplicate_key = (
-                    tariff_data['policy_id'],
-                    tariff_data['age_min'],
-                    tariff_data['age_max'],
-                    tariff_data['class_type'],
-                    tariff_data['family_min'],
-                    tariff_data['family_max'],
-                    tariff_data['outpatient_coverage_percentage']
-                )
-                
-                existing_tariff = existing_tariffs_map.get(duplicate_key)
-                
-                if existing_tariff:
-                    # Update existing tariff with new values
-                    existing_tariff.family_type = tariff_data['family_type']
-                    existing_tariff.inpatient_usd = tariff_data['inpatient_usd']
-                    existing_tariff.total_usd = tariff_data['total_usd']
-                    existing_tariff.outpatient_coverage_percentage = tariff_data['outpatient_coverage_percentage']
-                    existing_tariff.outpatient_price_usd = tariff_data['outpatient_price_usd']
-                    records_updated += 1
-                else:
-                    # Create new tariff entry
-                    tariff = models.Tariff(**tariff_data)
-                    db.add(tariff)
-                    records_created += 1
-                    # Add to map so we don't create duplicates within the same upload
-                    existing_tariffs_map[duplicate_key] = tariff
-                
-                # Commit in batches to improve performance
-                # Commit every BATCH_SIZE records (created + updated combined)
-                total_processed = records_created + records_updated
-                if total_processed > 0 and total_processed % BATCH_SIZE == 0:
-                    try:
-                        db.commit()
-                        print(f"Committed batch: {total_processed} records processed so far")
-                    except Exception as commit_error:
-                        db.rollback()
-                        errors.append(f"Row {idx + 1}: Failed to commit batch: {str(commit_error)}")
-                        raise  # Re-raise to stop processing
-                
-            except Exception as e:
-                import traceback
-                error_detail = str(e)
-                # Include more context for debugging
-                if hasattr(e, '__class__'):
-                    error_detail = f"{e.__class__.__name__}: {error_detail}"
-                errors.append(f"Row {idx + 1}: {error_detail}")
-                # Log full traceback for debugging (but don't send to user)
-                print(f"Error processing row {idx + 1}:")
-                print(traceback.format_exc())
-        
-        # Final commit for any remaining records
-        try:
-            db.commit()
-        except Exception as commit_error:
-            db.rollback()
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to commit remaining records: {str(commit_error)}"
+                    # A tariff is considered duplicate if it has the same:
+                    # policy_id, age_min, age_max, class_type, family_min, family_max, and outpatient_coverage_percentage
+                    duplicate_key = tariff_import.tariff_duplicate_key(tariff_data)
+                    if duplicate_key in staged_tariffs:
+                        # Same key earlier in this chunk: the later row wins
+                        records_updated += 1
+                    staged_tariffs[duplicate_key] = tariff_data
+                    staged_refs[duplicate_key] = row_ref
+                    
+                except Exception as e:
+                    import traceback
+                    error_detail = str(e)
+                    # Include more context for debugging
+                    if hasattr(e, '__class__'):
+                        error_detail = f"{e.__class__.__name__}: {error_detail}"
+                    errors.append(f"Row {row_ref}: {error_detail}")
+                    # Log full traceback for debugging (but don't send to user)
+                    print(f"Error processing row {row_ref}:")
+                    print(traceback.format_exc())
+            
+            if dry_run:
+                # Compare the chunk with the catalog without writing it
+                for action, tariff_data, changes in tariff_import.diff_tariffs(db, list(staged_tariffs.values()), planned_tariffs):
+                    if action == "create":
+                        records_created += 1
+                    elif action == "update":
+                        records_updated += 1
+                    else:
+                        records_unchanged += 1
+                    if diff_sink is not None:
+                        diff_sink({
+                            "action": action,
+                            "row": staged_refs[tariff_import.tariff_duplicate_key(tariff_data)],
+                            "tariff": tariff_data,
+                            "changes": {column: {"from": old, "to": new} for column, (old, new) in changes.items()}
+                        })
+                continue
+            
+            # Skip rows whose digest matches the one recorded when they were last uploaded
+            staged_digests = {key: upload_ledger.row_digest(tariff_data) for key, tariff_data in staged_tariffs.items()}
+            stored_digests = {} if force else upload_ledger.load_row_digests(
+                db, "tariffs", [upload_ledger.row_key(key) for key in staged_tariffs]
             )
+            changed_keys = [
+                key for key in staged_tariffs
+                if stored_digests.get(upload_ledger.row_key(key)) != staged_digests[key]
+            ]
+            records_unchanged += len(staged_tariffs) - len(changed_keys)
+            
+            # Write the chunk with a single INSERT ... ON CONFLICT DO UPDATE (fed
+            # by COPY on Postgres); rows identical to the stored tariff are not rewritten
+            try:
+                created, updated, unchanged = tariff_import.write_tariffs(db, [staged_tariffs[key] for key in changed_keys])
+                records_created += created
+                records_updated += updated
+                records_unchanged += unchanged
+                upload_ledger.save_row_digests(db, "tariffs", ledger.ledger_id, [
+                    (upload_ledger.row_key(key), key[0], staged_digests[key]) for key in changed_keys
+                ])
+                db.commit()
+                print(f"Committed batch: {records_created + records_updated} records processed so far")
+                if progress is not None:
+                    progress(records_processed, records_created, records_updated)
+            except Exception as commit_error:
+                db.rollback()
+                errors.append(f"Row {row_ref}: Failed to commit batch: {str(commit_error)}")
+                raise  # Re-raise to stop processing
+        
+        if not dry_run:
+            bump_catalog_version()
+        
+        errors.extend(validation.unknown_id_errors())
         
         # Group errors by type for better reporting
         error_summary = {}
@@ -1346,52 +1156,131 @@ def upload_tariffs(
             for error_type, count in sorted(error_summary.items(), key=lambda x: x[1], reverse=True)[:10]:
                 summary_lines.append(f"  - {error_type}: {count} occurrences")
         
-        message = "Upload completed"
+        message = "Dry run completed, no changes were written" if dry_run else "Upload completed"
         if summary_lines:
             message += "\n\n" + "\n".join(summary_lines)
         
-        return schemas.UploadResponse(
+        response = schemas.UploadResponse(
             message=message,
             records_processed=records_processed,
             records_created=records_created,
             records_updated=records_updated,
+            records_unchanged=records_unchanged,
+            dry_run=dry_run,
             errors=limited_errors
         )
+        if ledger is not None:
+            upload_ledger.complete_upload(ledger, response)
+            db.commit()
+        return response
         
     except Exception as e:
         db.rollback()
+        # Earlier batches may already be committed
+        if not dry_run:
+            bump_catalog_version()
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
 
-@router.post("/upload/criteria", response_model=schemas.UploadResponse)
-def upload_criteria(
+@router.post(
+    "/upload/tariffs",
+    response_model=schemas.UploadResponse,
+    responses={202: {"model": schemas.UploadJobOut, "description": "Queued as a background job"}}
+)
+def upload_tariffs(
     file: UploadFile = File(...),
+    background: bool = Query(False, description="Process the file as a background job"),
+    all_sheets: bool = Query(False, description="Import every sheet of an Excel workbook, not just the first"),
+    dry_run: bool = Query(False, description="Only report what would be created, updated or left unchanged"),
+    diff: Optional[str] = Query(None, pattern="^ndjson$", description="With dry_run, download every classified row as NDJSON"),
+    force: bool = Query(False, description="Process every row even if the file or rows were uploaded before"),
     db: Session = Depends(get_db),
     admin_user: models.User = Depends(get_current_admin)
 ):
-    """Upload plan criteria from JSON or Excel file"""
+    """Upload tariffs from CSV, JSON or Excel file"""
+    if diff and not dry_run:
+        raise HTTPException(status_code=400, detail="diff=ndjson requires dry_run=true")
+    if diff and background:
+        raise HTTPException(status_code=400, detail="diff=ndjson is not available for background uploads")
+    
+    processor = partial(process_tariff_upload, all_sheets=all_sheets, dry_run=dry_run, force=force)
+    if background:
+        return queue_upload("tariffs", file, processor, db, admin_user, all_sheets=all_sheets)
+    if not diff:
+        return processor(file, db)
+    
+    # Spool the diff while the file is processed, then send it with the summary as the last line
+    diff_file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_DIFF_SPOOL_SIZE, mode="w+")
+    
+    def write_diff(entry: dict):
+        diff_file.write(json.dumps(entry, default=str) + "\n")
+    
+    result = processor(file, db, diff_sink=write_diff)
+    write_diff({"summary": result.dict()})
+    diff_file.seek(0)
+    
+    def stream_diff():
+        try:
+            for line in diff_file:
+                yield line
+        finally:
+            diff_file.close()
+    
+    return StreamingResponse(
+        stream_diff(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="tariff-diff.ndjson"'}
+    )
+
+
+def process_criteria_upload(
+    file: UploadFile,
+    db: Session,
+    progress: Optional[Callable] = None,
+    force: bool = False
+) -> schemas.UploadResponse:
+    """
+    Upload plan criteria from JSON or Excel file.
+    Unless force is set, a file identical to the last criteria upload is not
+    processed again, and policies whose criteria are unchanged since they were
+    last uploaded are skipped (see app.upload_ledger).
+    """
     errors = []
+    header_warnings = []
     records_processed = 0
     records_created = 0
     records_updated = 0
+    records_unchanged = 0
     
     try:
         file_extension = file.filename.split('.')[-1].lower()
-        
-        if file_extension == 'json':
-            data_list = utils.parse_json_file(file)
-        elif file_extension in ['xlsx', 'xls']:
-            # Parse Excel file and convert to nested structure
-            flat_data_list = utils.parse_excel_file(file)
-            data_list = utils.parse_criteria_excel_to_json(flat_data_list)
-        else:
+        if file_extension not in ['json', 'xlsx', 'xls']:
             raise HTTPException(
                 status_code=400,
                 detail="Only JSON and Excel (.xlsx) files are supported for criteria uploads."
             )
         
+        # Checked before the file is parsed: a repeated file costs one hash
+        digest = upload_ledger.file_digest(file)
+        repeated = None if force else upload_ledger.find_repeated_upload(db, "criteria", digest)
+        if repeated is not None:
+            return upload_ledger.repeated_upload_response(repeated)
+        
+        if file_extension == 'json':
+            data_list = utils.iter_json_rows(file)
+        else:
+            # Parse Excel file and convert to nested structure
+            data_list = utils.parse_criteria_excel_to_json(utils.iter_excel_rows(file), header_warnings)
+        
+        validation = utils.UploadValidationContext(db)
+        
+        stored_digests = {} if force else upload_ledger.load_row_digests(db, "criteria")
+        written_digests = {}  # row key -> (row_key, policy_id, digest) of criteria written by this upload
+        
         # Process each record
         for idx, data in enumerate(data_list):
+            if progress is not None:
+                progress(records_processed, records_created, records_updated)
             records_processed += 1
             try:
                 if 'policy_id' not in data:
@@ -1410,12 +1299,17 @@ def upload_criteria(
                 criteria_data = data['criteria_data']
                 outpatient_criteria_data = data['outpatient_criteria_data']
                 
+                # Same criteria as the last upload wrote for this policy
+                row_digest = upload_ledger.row_digest({
+                    'criteria_data': criteria_data,
+                    'outpatient_criteria_data': outpatient_criteria_data
+                })
+                if stored_digests.get(str(policy_id)) == row_digest:
+                    records_unchanged += 1
+                    continue
+                
                 # Validate policy exists
-                policy = db.query(models.InsurancePlan).filter(
-                    models.InsurancePlan.policy_id == policy_id
-                ).first()
-                if not policy:
-                    errors.append(f"Row {idx + 1}: Policy with ID {policy_id} not found")
+                if not validation.check_id("Policy", policy_id, validation.policy_ids(), idx + 1):
                     continue
                 
                 # Validate criteria_data structure
@@ -1450,24 +1344,88 @@ def upload_criteria(
                     db.add(plan_criteria)
                     records_created += 1
                 
+                written_digests[str(policy_id)] = (str(policy_id), policy_id, row_digest)
+                
             except Exception as e:
                 errors.append(f"Row {idx + 1}: {str(e)}")
         
+        errors.extend(validation.unknown_id_errors())
+        # Recorded after the rows: the criteria are committed together, and
+        # nothing is flushed while rows are read (see upload_jobs.JobProgress)
+        ledger = upload_ledger.start_upload(db, "criteria", digest, file.filename)
+        upload_ledger.save_row_digests(db, "criteria", ledger.ledger_id, list(written_digests.values()))
         db.commit()
+        bump_catalog_version()
         
-        return schemas.UploadResponse(
-            message="Upload completed",
+        message = "Upload completed"
+        if header_warnings:
+            message += "\n\nAmbiguous Headers:\n" + "\n".join(f"  - {warning}" for warning in header_warnings)
+        
+        response = schemas.UploadResponse(
+            message=message,
             records_processed=records_processed,
             records_created=records_created,
             records_updated=records_updated,
+            records_unchanged=records_unchanged,
             errors=errors
         )
+        upload_ledger.complete_upload(ledger, response)
+        db.commit()
+        return response
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
 
+@router.post(
+    "/upload/criteria",
+    response_model=schemas.UploadResponse,
+    responses={202: {"model": schemas.UploadJobOut, "description": "Queued as a background job"}}
+)
+def upload_criteria(
+    file: UploadFile = File(...),
+    background: bool = Query(False, description="Process the file as a background job"),
+    force: bool = Query(False, description="Process every row even if the file or rows were uploaded before"),
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(get_current_admin)
+):
+    """Upload plan criteria from JSON or Excel file"""
+    processor = partial(process_criteria_upload, force=force)
+    if background:
+        return queue_upload("criteria", file, processor, db, admin_user)
+    return processor(file, db)
+
+
+@router.get("/upload/jobs/{job_id}", response_model=schemas.UploadJobOut)
+def get_upload_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(get_current_admin)
+):
+    """Get the state and progress of a background upload job"""
+    job = upload_jobs.get_upload_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return schemas.UploadJobOut.from_orm(job)
+
+
+@router.get("/upload/jobs/{job_id}/events")
+def stream_upload_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(get_current_admin)
+):
+    """Stream the progress of a background upload job as server-sent events"""
+    if not upload_jobs.get_upload_job(db, job_id):
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return StreamingResponse(
+        upload_jobs.stream_upload_job(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ==================== Plan Criteria CRUD ====================
 @router.post("/policies/{policy_id}/criteria", response_model=schemas.PlanCriteriaOut)
 def create_or_update_criteria(
@@ -1493,7 +1451,9 @@ def create_or_update_criteria(
         # Update existing
         existing.criteria_data = criteria_data.criteria_data.dict()
         existing.outpatient_criteria_data = criteria_data.outpatient_criteria_data.dict()
+        upload_ledger.forget_uploads(db, "criteria", policy_id=policy_id)
         db.commit()
+        bump_catalog_version()
         db.refresh(existing)
         return schemas.PlanCriteriaOut.from_orm(existing)
     else:
@@ -1504,7 +1464,9 @@ def create_or_update_criteria(
             outpatient_criteria_data=criteria_data.outpatient_criteria_data.dict()
         )
         db.add(plan_criteria)
+        upload_ledger.forget_uploads(db, "criteria", policy_id=policy_id)
         db.commit()
+        bump_catalog_version()
         db.refresh(plan_criteria)
         return schemas.PlanCriteriaOut.from_orm(plan_criteria)
 
@@ -1541,7 +1503,9 @@ def delete_policy_criteria(
         raise HTTPException(status_code=404, detail="Criteria not found for this policy")
     
     db.delete(criteria)
+    upload_ledger.forget_uploads(db, "criteria", policy_id=policy_id)
     db.commit()
+    bump_catalog_version()
     return {"message": "Criteria deleted successfully"}
 
 
@@ -1574,7 +1538,16 @@ def create_tariffs(
         db.add(tariff)
         created_tariffs.append(tariff)
     
-    db.commit()
+    upload_ledger.forget_uploads(db, "tariffs", policy_id=policy_id)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="A tariff with the same policy, ages, class, family range and outpatient coverage already exists"
+        )
+    bump_catalog_version()
     for tariff in created_tariffs:
         db.refresh(tariff)
     
@@ -1592,7 +1565,7 @@ def get_policy_tariffs(
         models.Tariff.policy_id == policy_id
     ).all()
     
-    return [schemas.TariffOut.from_orm(t) for t in tariffs]
+    return [serializers.serialize_tariff(t) for t in tariffs]
 
 
 @router.delete("/tariffs/{tariff_id}")
@@ -1610,7 +1583,9 @@ def delete_tariff(
         raise HTTPException(status_code=404, detail="Tariff not found")
     
     db.delete(tariff)
+    upload_ledger.forget_uploads(db, "tariffs", policy_id=tariff.policy_id)
     db.commit()
+    bump_catalog_version()
     return {"message": "Tariff deleted successfully"}
 
 
@@ -1635,7 +1610,9 @@ def delete_all_policy_tariffs(
     db.query(models.Tariff).filter(
         models.Tariff.policy_id == policy_id
     ).delete()
+    upload_ledger.forget_uploads(db, "tariffs", policy_id=policy_id)
     db.commit()
+    bump_catalog_version()
     return {"message": f"Successfully deleted {count} tariff(s) for policy {policy_id}"}
 
 
@@ -1,24 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 
-from app.database import get_db
-from app import models, schemas
+from app.database import get_async_db, get_db
+from app import models, schemas, serializers
 
 router = APIRouter(prefix="/policies", tags=["Policies"])
 
 
 @router.get("/mine", response_model=List[schemas.UserPolicyDetailOut])
-def my_policies(
+async def my_policies(
     user_id: int,  # In production, get this from JWT token
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's policies with full details"""
-    user_policies = db.query(models.UserPolicy).filter(
-        models.UserPolicy.user_id == user_id
-    ).all()
-    return user_policies
+    result = await db.execute(
+        select(models.UserPolicy).options(
+            *serializers.user_policy_detail_options()
+        ).where(
+            models.UserPolicy.user_id == user_id
+        )
+    )
+    return result.scalars().all()
 
 
 @router.post("/purchase", response_model=schemas.UserPolicyOut)
@@ -84,7 +90,9 @@ def activate_policy(
 @router.get("/{user_policy_id}", response_model=schemas.UserPolicyDetailOut)
 def get_user_policy(user_policy_id: int, db: Session = Depends(get_db)):
     """Get a specific user policy with details"""
-    user_policy = db.query(models.UserPolicy).filter(
+    user_policy = db.query(models.UserPolicy).options(
+        *serializers.user_policy_detail_options()
+    ).filter(
         models.UserPolicy.user_policy_id == user_policy_id
     ).first()
     if not user_policy:
@@ -3,6 +3,7 @@ from typing import Optional, List
 from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
+import json
 
 
 # Custom field validators for enum serialization
@@ -162,6 +163,10 @@ class PolicyDocumentRequirementOut(BaseModel):
     requirement_level: str
     notes: Optional[str] = None
 
+    @validator('requirement_level', pre=True)
+    def convert_requirement_level_to_str(cls, v):
+        return enum_to_str(v)
+
     class Config:
         orm_mode = True
 
@@ -308,10 +313,14 @@ class ApplicationDetailOut(UserPolicyDetailOut):
 # Pagination Schema
 class PaginatedResponse(BaseModel):
     items: List[dict]
-    total: int
-    page: int
+    # Keyset pages (see app.pagination) leave out the page number and, unless
+    # asked for, the total
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # Plan Criteria Schemas
@@ -481,6 +490,19 @@ class PolicyMatchCriteria(BaseModel):
     family_ages: Optional[List[int]] = None
 
 
+class PolicyMatchBatchRequest(BaseModel):
+    """Many quotes in one call, e.g. a broker's employee roster"""
+    criteria: List[PolicyMatchCriteria]
+
+    @validator('criteria')
+    def check_batch_size(cls, v):
+        if not v:
+            raise ValueError("criteria must not be empty")
+        if len(v) > 5000:
+            raise ValueError("criteria must contain at most 5000 entries")
+        return v
+
+
 class MatchedTariffOut(TariffOut):
     """Tariff with policy info for matching results"""
     pass
@@ -513,4 +535,36 @@ class UploadResponse(BaseModel):
     records_processed: int
     records_created: int
     records_updated: int = 0
-    errors: List[str] = []
\ No newline at end of file
+    records_unchanged: int = 0  # Matched existing rows with identical values (not rewritten)
+    dry_run: bool = False
+    errors: List[str] = []
+
+class UploadJobOut(BaseModel):
+    """Background upload job; result is set once the job has completed"""
+    job_id: str
+    upload_type: str
+    filename: Optional[str] = None
+    status: str
+    rows_total: Optional[int] = None
+    rows_processed: int = 0
+    records_created: int = 0
+    records_updated: int = 0
+    result: Optional[UploadResponse] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @validator('status', pre=True)
+    def convert_status_to_str(cls, v):
+        return enum_to_str(v)
+
+    @validator('result', pre=True)
+    def parse_result(cls, v):
+        # Stored as JSON text on the job row
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
+
+    class Config:
+        orm_mode = True
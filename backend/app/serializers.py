@@ -0,0 +1,110 @@
+"""
+Loading strategies and fast serializers for plan, user policy, tariff and
+outpatient payloads.
+
+Listing endpoints and the quote engines serialize many rows per response.
+from_orm() validates every field of every row, and the nested provider and
+insurance_type relationships are lazy-loaded one SELECT at a time. The helpers
+here eager-load those relationships up front and turn ORM rows into plain dicts
+using a field plan compiled once from the Pydantic schema.
+"""
+from sqlalchemy.orm import contains_eager, joinedload
+from typing import Callable, Dict, Optional
+
+from app import models, schemas
+
+
+def plan_detail_options():
+    """Loader options for queries returning InsurancePlanDetailOut"""
+    return [
+        joinedload(models.InsurancePlan.provider),
+        joinedload(models.InsurancePlan.insurance_type),
+    ]
+
+
+def user_policy_detail_options():
+    """Loader options for queries returning UserPolicyDetailOut"""
+    return [
+        joinedload(models.UserPolicy.plan).joinedload(models.InsurancePlan.provider),
+        joinedload(models.UserPolicy.plan).joinedload(models.InsurancePlan.insurance_type),
+        joinedload(models.UserPolicy.version),
+    ]
+
+
+def application_options():
+    """Loader options for application queries that already join InsurancePlan and User"""
+    return [
+        contains_eager(models.UserPolicy.plan).joinedload(models.InsurancePlan.provider),
+        contains_eager(models.UserPolicy.plan).joinedload(models.InsurancePlan.insurance_type),
+        contains_eager(models.UserPolicy.user),
+        joinedload(models.UserPolicy.version),
+    ]
+
+
+def _to_float(value):
+    return float(value)
+
+
+def compile_serializer(
+    schema,
+    converters: Optional[Dict[str, Callable]] = None,
+    nested: Optional[Dict[str, Callable]] = None
+) -> Callable:
+    """
+    Build a function that turns an ORM object into the dict schema.from_orm(obj).dict()
+    would produce. Float fields are coerced (Numeric columns come back as Decimal);
+    other conversions are passed in explicitly.
+    """
+    converters = converters or {}
+    nested = nested or {}
+    field_plan = []
+    for name, field in schema.__fields__.items():
+        if name in nested:
+            convert = nested[name]
+        elif name in converters:
+            convert = converters[name]
+        elif field.type_ is float:
+            convert = _to_float
+        else:
+            convert = None
+        field_plan.append((name, convert))
+
+    def serialize(obj) -> dict:
+        result = {}
+        for name, convert in field_plan:
+            value = getattr(obj, name)
+            if convert is not None and value is not None:
+                value = convert(value)
+            result[name] = value
+        return result
+
+    serialize.__name__ = f"serialize_{schema.__name__}"
+    serialize.schema = schema
+    return serialize
+
+
+serialize_provider = compile_serializer(schemas.ProviderOut)
+serialize_insurance_type = compile_serializer(schemas.InsuranceTypeOut)
+serialize_plan_detail = compile_serializer(
+    schemas.InsurancePlanDetailOut,
+    converters={"status": schemas.enum_to_str},
+    nested={"provider": serialize_provider, "insurance_type": serialize_insurance_type}
+)
+serialize_user = compile_serializer(schemas.UserOut)
+serialize_document_version = compile_serializer(schemas.PolicyDocumentVersionOut)
+serialize_user_policy_detail = compile_serializer(
+    schemas.UserPolicyDetailOut,
+    converters={"status": schemas.enum_to_str},
+    nested={"plan": serialize_plan_detail, "version": serialize_document_version}
+)
+
+
+def serialize_application(user_policy) -> dict:
+    """UserPolicyDetailOut of an application with its applicant (UserOut) as user"""
+    result = serialize_user_policy_detail(user_policy)
+    result["user"] = serialize_user(user_policy.user)
+    return result
+
+
+serialize_tariff = compile_serializer(schemas.TariffOut)
+serialize_outpatient_option = compile_serializer(schemas.OutpatientOption)
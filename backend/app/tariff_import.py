@@ -0,0 +1,268 @@
+"""
+Set-based write path for tariff imports.
+
+Parsed tariff rows are applied with one INSERT ... ON CONFLICT DO UPDATE per
+chunk against the uq_tariffs_upload_key unique index, so the database decides
+which rows are new and which already exist. No tariffs are loaded up front.
+Matched rows whose values are the same are left alone, not rewritten.
+
+On Postgres with psycopg2, write_tariffs() streams the chunk into a temporary
+staging table with COPY FROM STDIN and merges it with one INSERT ... SELECT
+... ON CONFLICT statement, which avoids building and binding a multi-row
+VALUES statement. Other databases (SQLite) use upsert_tariffs().
+
+diff_tariffs() computes the same outcome without writing, for dry runs.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import Column, MetaData, Table, and_, func, literal_column, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+import io
+import os
+
+from app import models, utils
+
+# Uploaded tariff columns: field -> (converter, value when the column is missing)
+TARIFF_ROW_SPEC = {
+    'policy_id': (utils.safe_int, None),
+    'age_min': (utils.safe_int, None),
+    'age_max': (utils.safe_int, None),
+    'class_type': (utils.safe_optional_text, None),
+    'family_type': (utils.safe_optional_text, None),
+    'family_min': (partial(utils.safe_int, default=1), 1),
+    'family_max': (partial(utils.safe_int, default=1), 1),
+    'inpatient_usd': (utils.safe_float, None),
+    'total_usd': (utils.safe_float, None),
+    'outpatient_coverage_percentage': (utils.safe_percentage, None),
+    'outpatient_price_usd': (utils.safe_float, None),
+}
+
+# Other names accepted for tariff columns (after header normalization)
+TARIFF_COLUMN_ALIASES = {'plan_id': 'policy_id'}
+
+# Columns overwritten when an uploaded row matches an existing tariff
+TARIFF_UPDATE_COLUMNS = ['family_type', 'inpatient_usd', 'total_usd', 'outpatient_price_usd']
+
+# Numeric(10, 2) columns; compared the way the database stores them
+TARIFF_MONEY_COLUMNS = {'inpatient_usd', 'total_usd', 'outpatient_price_usd'}
+CENT = Decimal('0.01')
+
+# Tariff upload chunk size when rows are loaded with COPY (otherwise 500)
+TARIFF_COPY_BATCH_SIZE = int(os.getenv("TARIFF_COPY_BATCH_SIZE", 5000))
+
+# Columns written by an upload, in COPY order
+TARIFF_LOAD_COLUMNS = [
+    'policy_id', 'age_min', 'age_max', 'class_type', 'family_type', 'family_min', 'family_max',
+    'inpatient_usd', 'total_usd', 'outpatient_coverage_percentage', 'outpatient_price_usd'
+]
+
+# Characters that must be escaped in COPY text format
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Per-connection staging table for COPY; emptied by every commit
+tariff_stage = Table(
+    "tariff_import_stage",
+    MetaData(),
+    *[Column(column, models.Tariff.__table__.c[column].type) for column in TARIFF_LOAD_COLUMNS],
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS"
+)
+
+# Must match the expressions of uq_tariffs_upload_key exactly
+TARIFF_CONFLICT_TARGET = [
+    models.Tariff.policy_id,
+    models.Tariff.age_min,
+    models.Tariff.age_max,
+    models.Tariff.class_type,
+    models.Tariff.family_min,
+    models.Tariff.family_max,
+    # Rendered inline: a bound parameter would not match the index expression
+    func.coalesce(models.Tariff.outpatient_coverage_percentage, literal_column("-1.0")),
+]
+
+
+def tariff_duplicate_key(tariff_data: dict) -> tuple:
+    """Duplicate key of a normalized tariff row (same columns as the unique index)"""
+    return (
+        tariff_data['policy_id'],
+        tariff_data['age_min'],
+        tariff_data['age_max'],
+        tariff_data['class_type'],
+        tariff_data['family_min'],
+        tariff_data['family_max'],
+        tariff_data['outpatient_coverage_percentage']
+    )
+
+
+def _on_conflict_update(stmt):
+    """Update matched tariffs, skipping rows that would not change (they are not returned either)"""
+    table = models.Tariff.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=TARIFF_CONFLICT_TARGET,
+        set_={column: stmt.excluded[column] for column in TARIFF_UPDATE_COLUMNS},
+        where=or_(*[table.c[column].is_distinct_from(stmt.excluded[column]) for column in TARIFF_UPDATE_COLUMNS])
+    )
+
+
+def _postgres_counts(db: Session, stmt, rows: int) -> Tuple[int, int, int]:
+    # xmax is 0 for freshly inserted row versions
+    flags = db.execute(stmt.returning(literal_column("xmax = 0"))).scalars().all()
+    created = sum(1 for inserted in flags if inserted)
+    return created, len(flags) - created, rows - len(flags)
+
+
+def upsert_tariffs(db: Session, rows: List[dict]) -> Tuple[int, int, int]:
+    """
+    Insert or update tariff rows in a single statement.
+    Rows must not repeat a duplicate key (Postgres refuses to update a row twice
+    in one statement). Returns (created, updated, unchanged) as reported by the
+    database. The caller commits.
+    """
+    if not rows:
+        return 0, 0, 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(models.Tariff)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(models.Tariff)
+    else:
+        raise NotImplementedError(f"Tariff upsert is not supported on {dialect}")
+
+    stmt = _on_conflict_update(stmt.values(rows))
+
+    if dialect == 'postgresql':
+        return _postgres_counts(db, stmt, len(rows))
+
+    # SQLite hands out rowids above the current maximum to new rows
+    max_id = db.execute(select(func.max(models.Tariff.tariff_id))).scalar() or 0
+    ids = db.execute(stmt.returning(models.Tariff.tariff_id)).scalars().all()
+    created = sum(1 for tariff_id in ids if tariff_id > max_id)
+    return created, len(ids) - created, len(rows) - len(ids)
+
+
+def copy_supported(db: Session) -> bool:
+    """Whether write_tariffs() loads rows with COPY on this connection"""
+    dialect = db.get_bind().dialect
+    return dialect.name == 'postgresql' and dialect.driver == 'psycopg2'
+
+
+def _copy_value(value) -> str:
+    """One field in COPY text format"""
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_upsert_tariffs(db: Session, rows: List[dict]) -> Tuple[int, int, int]:
+    """
+    Same as upsert_tariffs(), but the rows are streamed into the staging table
+    with COPY FROM STDIN and merged with a single INSERT ... SELECT. Requires
+    psycopg2. The caller commits, which also empties the staging table.
+    """
+    if not rows:
+        return 0, 0, 0
+
+    buffer = io.StringIO()
+    for tariff_data in rows:
+        buffer.write('\t'.join(_copy_value(tariff_data.get(column)) for column in TARIFF_LOAD_COLUMNS))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    db.execute(CreateTable(tariff_stage, if_not_exists=True))
+    db.execute(tariff_stage.delete())
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {tariff_stage.name} ({', '.join(TARIFF_LOAD_COLUMNS)}) FROM STDIN",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+    stmt = postgresql.insert(models.Tariff).from_select(
+        TARIFF_LOAD_COLUMNS,
+        select(*[tariff_stage.c[column] for column in TARIFF_LOAD_COLUMNS])
+    )
+    return _postgres_counts(db, _on_conflict_update(stmt), len(rows))
+
+
+def write_tariffs(db: Session, rows: List[dict]) -> Tuple[int, int, int]:
+    """Apply normalized tariff rows with COPY where supported, else with upsert_tariffs()"""
+    if copy_supported(db):
+        return copy_upsert_tariffs(db, rows)
+    return upsert_tariffs(db, rows)
+
+
+def _comparable(column: str, value):
+    if value is None:
+        return None
+    if column in TARIFF_MONEY_COLUMNS:
+        return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+    return value
+
+
+def tariff_changes(current: dict, tariff_data: dict) -> Dict[str, tuple]:
+    """Update columns that differ, as {column: (current, new)}"""
+    changes = {}
+    for column in TARIFF_UPDATE_COLUMNS:
+        if _comparable(column, current.get(column)) != _comparable(column, tariff_data.get(column)):
+            changes[column] = (current.get(column), tariff_data.get(column))
+    return changes
+
+
+# Duplicate keys per lookup on SQLite, which probes the upload key index once
+# per key (an OR of equalities) and limits the expression depth
+SQLITE_KEY_LOOKUP_SIZE = 200
+
+
+def load_current_tariffs(db: Session, keys: List[tuple]) -> Dict[tuple, dict]:
+    """Update-column values of the existing tariffs with the given duplicate keys"""
+    if not keys:
+        return {}
+    columns = [getattr(models.Tariff, column) for column in TARIFF_UPDATE_COLUMNS]
+    values = [key[:-1] + (-1.0 if key[-1] is None else key[-1],) for key in keys]
+    if db.get_bind().dialect.name == 'sqlite':
+        # SQLite scans the table for a row-value IN list
+        conditions = [
+            or_(*[
+                and_(*[target == value for target, value in zip(TARIFF_CONFLICT_TARGET, key)])
+                for key in values[start:start + SQLITE_KEY_LOOKUP_SIZE]
+            ])
+            for start in range(0, len(values), SQLITE_KEY_LOOKUP_SIZE)
+        ]
+    else:
+        conditions = [tuple_(*TARIFF_CONFLICT_TARGET).in_(values)]
+
+    current = {}
+    for condition in conditions:
+        query = select(*TARIFF_CONFLICT_TARGET[:-1], models.Tariff.outpatient_coverage_percentage, *columns).where(condition)
+        for row in db.execute(query):
+            current[tuple(row[:7])] = dict(zip(TARIFF_UPDATE_COLUMNS, row[7:]))
+    return current
+
+
+def diff_tariffs(db: Session, rows: List[dict], planned: Optional[Dict[tuple, dict]] = None) -> List[tuple]:
+    """
+    Classify rows as ("create" | "update" | "unchanged", tariff_data, changes)
+    without writing. planned carries rows created or updated by earlier chunks
+    of the same dry run and is updated in place.
+    """
+    planned = {} if planned is None else planned
+    keys = [tariff_duplicate_key(tariff_data) for tariff_data in rows]
+    current_tariffs = load_current_tariffs(db, [key for key in keys if key not in planned])
+
+    diff = []
+    for key, tariff_data in zip(keys, rows):
+        current = planned.get(key) or current_tariffs.get(key)
+        if current is None:
+            diff.append(("create", tariff_data, {}))
+        else:
+            changes = tariff_changes(current, tariff_data)
+            diff.append(("update" if changes else "unchanged", tariff_data, changes))
+        if diff[-1][0] != "unchanged":
+            planned[key] = {column: tariff_data.get(column) for column in TARIFF_UPDATE_COLUMNS}
+    return diff
@@ -0,0 +1,161 @@
+"""
+Process-local tariff index for policy matching.
+
+The index is built once from the active plans and their tariffs and answers
+quotes without touching the database. Tariffs are bucketed by (class_type,
+policy_id); inside each bucket they are sorted by age_min so an age probe is a
+binary search followed by a scan of the candidates that start early enough.
+
+The index remembers the catalog version it was built from (see app.cache) and
+is rebuilt on the next quote after an admin write bumps it. With a local cache
+backend other uvicorn workers pick up changes when the index expires, after
+TARIFF_INDEX_TTL_SECONDS capped at LOCAL_CATALOG_TTL_SECONDS (see app.cache).
+Builds and the size of the live indexes are reported under tariff_index in
+/_metrics.
+"""
+from bisect import bisect_right
+from sqlalchemy.orm import Session
+from typing import Dict, List
+import threading
+import time
+import os
+
+from app import metrics, models, schemas
+from app.cache import catalog_ttl, get_catalog_version
+from app.serializers import plan_detail_options
+from app.matching import build_matched_policy, quote_family_size, quote_age_bounds
+
+TARIFF_INDEX_TTL_SECONDS = int(os.getenv("TARIFF_INDEX_TTL_SECONDS", 300))
+
+
+class _TariffBucket:
+    """Tariffs of one (class_type, policy) pair, sorted by age_min"""
+
+    __slots__ = ("age_mins", "entries")
+
+    def __init__(self, tariffs: List[schemas.MatchedTariffOut]):
+        tariffs = sorted(tariffs, key=lambda t: (t.age_min, t.tariff_id))
+        self.age_mins = [t.age_min for t in tariffs]
+        self.entries = [
+            (t.age_max, t.family_min, t.family_max, t.tariff_id, t)
+            for t in tariffs
+        ]
+
+    def probe(self, age_low: int, age_high: int, family_size: int) -> List[schemas.MatchedTariffOut]:
+        """Return tariffs covering [age_low, age_high] and family_size, in tariff_id order"""
+        # Only tariffs with age_min <= age_low can cover the youngest age
+        end = bisect_right(self.age_mins, age_low)
+        hits = [
+            (tariff_id, tariff)
+            for age_max, family_min, family_max, tariff_id, tariff in self.entries[:end]
+            if age_max >= age_high and family_min <= family_size <= family_max
+        ]
+        hits.sort(key=lambda hit: hit[0])
+        return [tariff for _, tariff in hits]
+
+
+class TariffIndex:
+    """In-memory view of the active catalog used to answer quotes"""
+
+    def __init__(
+        self,
+        plans: List[schemas.InsurancePlanDetailOut],
+        tariffs: List[schemas.MatchedTariffOut],
+        catalog_version: int = 0
+    ):
+        self.plans: Dict[int, schemas.InsurancePlanDetailOut] = {p.policy_id: p for p in plans}
+        self.tariff_count = len(tariffs)
+        self.catalog_version = catalog_version
+        self.built_at = time.monotonic()
+        self._build([t for t in tariffs if t.policy_id in self.plans])
+
+    def _build(self, tariffs: List[schemas.MatchedTariffOut]):
+        """Arrange the tariffs for probing; subclasses may use another layout"""
+        grouped: Dict[str, Dict[int, List[schemas.MatchedTariffOut]]] = {}
+        for tariff in tariffs:
+            grouped.setdefault(tariff.class_type.upper(), {}).setdefault(tariff.policy_id, []).append(tariff)
+
+        # class_type -> [(policy_id, bucket)] in policy_id order
+        self._by_class: Dict[str, List[tuple]] = {
+            class_type: [(policy_id, _TariffBucket(by_policy[policy_id])) for policy_id in sorted(by_policy)]
+            for class_type, by_policy in grouped.items()
+        }
+
+    @classmethod
+    def load(cls, db: Session) -> "TariffIndex":
+        """Build the index from the database (two queries)"""
+        catalog_version = get_catalog_version()
+        policies = db.query(models.InsurancePlan).options(*plan_detail_options()).filter(
+            models.InsurancePlan.status == "active"
+        ).all()
+        plans = [schemas.InsurancePlanDetailOut.from_orm(p) for p in policies]
+
+        tariffs = db.query(models.Tariff).filter(
+            models.Tariff.policy_id.in_([p.policy_id for p in plans])
+        ).all() if plans else []
+
+        return cls(plans, [schemas.MatchedTariffOut.from_orm(t) for t in tariffs], catalog_version)
+
+    def is_stale(self, catalog_version: int) -> bool:
+        if catalog_version != self.catalog_version:
+            return True
+        return time.monotonic() - self.built_at > catalog_ttl(TARIFF_INDEX_TTL_SECONDS)
+
+    def match(self, criteria: schemas.PolicyMatchCriteria) -> List[schemas.MatchedPolicyOut]:
+        """Answer a quote using only index probes"""
+        family_size = quote_family_size(criteria)
+        if family_size is None:
+            return []
+        age_low, age_high = quote_age_bounds(criteria)
+
+        matched_policies = []
+        for policy_id, bucket in self._by_class.get(criteria.insurance_class.upper(), []):
+            matching_tariffs = bucket.probe(age_low, age_high, family_size)
+            if matching_tariffs:
+                matched_policies.append(build_matched_policy(self.plans[policy_id], matching_tariffs))
+        return matched_policies
+
+
+# One live snapshot per index implementation
+_indexes: Dict[type, TariffIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_tariff_index(db: Session, index_class: type = TariffIndex) -> TariffIndex:
+    """Return the current index, rebuilding it if it was invalidated or expired"""
+    catalog_version = get_catalog_version()
+    index = _indexes.get(index_class)
+    if index is not None and not index.is_stale(catalog_version):
+        return index
+
+    with _index_lock:
+        # Another thread may have rebuilt it while we waited for the lock
+        index = _indexes.get(index_class)
+        if index is None or index.is_stale(catalog_version):
+            started = time.perf_counter()
+            index = index_class.load(db)
+            metrics.observe("tariff_index.build", time.perf_counter() - started)
+            _indexes[index_class] = index
+        return index
+
+
+def invalidate_tariff_index():
+    """Drop all indexes so the next quote rebuilds them from the database"""
+    with _index_lock:
+        _indexes.clear()
+
+
+def index_metrics() -> dict:
+    """Build timings and the live indexes with what they hold"""
+    report = {"build": metrics.timing("tariff_index.build")}
+    for index_class, index in list(_indexes.items()):
+        report[index_class.__name__] = {
+            "plans": len(index.plans),
+            "tariffs": index.tariff_count,
+            "catalog_version": index.catalog_version,
+            "age_seconds": round(time.monotonic() - index.built_at, 1),
+        }
+    return report
+
+
+metrics.register("tariff_index", index_metrics)
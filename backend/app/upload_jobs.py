@@ -0,0 +1,249 @@
+"""
+Background processing of admin bulk uploads.
+
+With ?background=true the upload endpoints copy the file to a temporary file,
+record an UploadJob row and answer right away with the job. A thread pool
+(UPLOAD_JOB_WORKERS threads) runs the same processing function as the
+synchronous endpoint with its own session and writes row-level progress to the
+job row at most every UPLOAD_JOB_PROGRESS_INTERVAL seconds. Progress is held
+back while the job's session has uncommitted writes (SQLite allows a single
+writer, so the progress update would wait on the job's own transaction) and
+written once the processor commits.
+
+Job state lives in the database, so any worker process can answer status polls
+and progress streams, but a job only runs in the process that accepted it.
+Jobs left queued or running by a process that went away are marked failed on
+startup once they have not been updated for UPLOAD_JOB_STALE_SECONDS.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Callable, Iterator, Optional
+import threading
+import tempfile
+import shutil
+import time
+import uuid
+import os
+
+from app import models, schemas, utils
+from app.database import SessionLocal
+
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", 2))
+UPLOAD_JOB_PROGRESS_INTERVAL = float(os.getenv("UPLOAD_JOB_PROGRESS_INTERVAL", 0.5))
+UPLOAD_JOB_STALE_SECONDS = int(os.getenv("UPLOAD_JOB_STALE_SECONDS", 600))
+
+# Seconds between keep-alive comments on an idle progress stream
+SSE_KEEPALIVE_SECONDS = 15
+
+FINISHED_STATUSES = (models.UploadJobStatus.completed, models.UploadJobStatus.failed)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the upload worker pool (created on first use)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=UPLOAD_JOB_WORKERS,
+                    thread_name_prefix="upload-job"
+                )
+    return _executor
+
+
+def _update_job(job_id: str, **values):
+    """Write job fields in a short session of their own"""
+    values['updated_at'] = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.query(models.UploadJob).filter(models.UploadJob.job_id == job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobProgress:
+    """
+    Progress callback passed to an upload processor as progress(rows_processed,
+    records_created, records_updated). Calls are cheap; the job row is only
+    written every UPLOAD_JOB_PROGRESS_INTERVAL seconds, and only while the job
+    session db has no uncommitted writes (the latest counts are written on the
+    first call after the processor commits).
+    """
+
+    def __init__(self, job_id: str, db: Session):
+        self.job_id = job_id
+        self._last_write = 0.0
+        self._writing = False
+        event.listen(db, "after_flush", self._wrote)
+        event.listen(db, "do_orm_execute", self._executed)
+        event.listen(db, "after_commit", self._ended)
+        event.listen(db, "after_rollback", self._ended)
+
+    def _wrote(self, *args):
+        self._writing = True
+
+    def _executed(self, orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            self._writing = True
+
+    def _ended(self, *args):
+        self._writing = False
+
+    def __call__(self, rows_processed: int, records_created: int = 0, records_updated: int = 0):
+        if self._writing:
+            return
+        now = time.monotonic()
+        if now - self._last_write < UPLOAD_JOB_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        _update_job(
+            self.job_id,
+            rows_processed=rows_processed,
+            records_created=records_created,
+            records_updated=records_updated
+        )
+
+
+def submit_upload_job(
+    db: Session,
+    upload_type: str,
+    file: UploadFile,
+    processor: Callable,
+    created_by: Optional[int] = None,
+    all_sheets: bool = False
+) -> models.UploadJob:
+    """
+    Queue processor(file, db, progress) for the uploaded file and return the job.
+    The upload is copied first because FastAPI closes it when the request ends.
+    all_sheets tells the row estimate that every sheet of a workbook is read.
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, delete=False)
+    path = handle.name
+    try:
+        with handle:
+            file.file.seek(0)
+            shutil.copyfileobj(file.file, handle)
+
+        job = models.UploadJob(
+            job_id=uuid.uuid4().hex,
+            upload_type=upload_type,
+            filename=file.filename,
+            status=models.UploadJobStatus.queued,
+            rows_processed=0,
+            records_created=0,
+            records_updated=0,
+            created_by=created_by
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        get_executor().submit(_run_job, job.job_id, path, file.filename, processor, all_sheets)
+    except Exception:
+        # The copy is removed by _run_job, which will not run
+        db.rollback()
+        os.remove(path)
+        raise
+    return job
+
+
+def _run_job(job_id: str, path: str, filename: str, processor: Callable, all_sheets: bool = False):
+    db = SessionLocal()
+    try:
+        with open(path, 'rb') as handle:
+            upload = UploadFile(file=handle, filename=filename)
+            try:
+                rows_total = utils.estimate_upload_rows(upload, all_sheets=all_sheets)
+            except Exception:
+                rows_total = None
+            _update_job(job_id, status=models.UploadJobStatus.running, rows_total=rows_total)
+
+            result = processor(upload, db, JobProgress(job_id, db))
+
+        _update_job(
+            job_id,
+            status=models.UploadJobStatus.completed,
+            rows_processed=result.records_processed,
+            records_created=result.records_created,
+            records_updated=result.records_updated,
+            result=result.json(),
+            finished_at=datetime.utcnow()
+        )
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        print(f"Upload job {job_id} failed: {error}")
+        _update_job(
+            job_id,
+            status=models.UploadJobStatus.failed,
+            error=str(error),
+            finished_at=datetime.utcnow()
+        )
+    finally:
+        db.close()
+        os.remove(path)
+
+
+def get_upload_job(db: Session, job_id: str) -> Optional[models.UploadJob]:
+    return db.query(models.UploadJob).filter(models.UploadJob.job_id == job_id).first()
+
+
+def stream_upload_job(job_id: str) -> Iterator[str]:
+    """
+    Server-sent events for one job: a "data:" event whenever the job changes,
+    ending after the event that reports it completed or failed.
+    """
+    last_payload = None
+    last_sent = time.monotonic()
+    while True:
+        db = SessionLocal()
+        try:
+            job = get_upload_job(db, job_id)
+            if job is None:
+                return
+            payload = schemas.UploadJobOut.from_orm(job).json()
+            finished = job.status in FINISHED_STATUSES
+        finally:
+            db.close()
+
+        if payload != last_payload:
+            yield f"data: {payload}\n\n"
+            last_payload = payload
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent > SSE_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        if finished:
+            return
+        time.sleep(UPLOAD_JOB_PROGRESS_INTERVAL)
+
+
+def fail_interrupted_jobs():
+    """Mark jobs abandoned by a stopped process as failed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        count = db.query(models.UploadJob).filter(
+            models.UploadJob.status.in_([models.UploadJobStatus.queued, models.UploadJobStatus.running]),
+            models.UploadJob.updated_at < cutoff
+        ).update({
+            'status': models.UploadJobStatus.failed,
+            'error': "Upload job was interrupted by a server restart",
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        if count:
+            print(f"Marked {count} interrupted upload jobs as failed")
+    except Exception as e:
+        db.rollback()
+        print(f"Warning: Could not check for interrupted upload jobs: {e}")
+    finally:
+        db.close()
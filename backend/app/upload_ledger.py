@@ -0,0 +1,162 @@
+"""
+Content-hash ledger for tariff and criteria uploads.
+
+Every upload records the SHA-256 of the file and its parsing options in
+upload_ledger. When the most recent upload of the same type has the same
+digest and completed, the new upload is answered from the ledger without
+parsing the file again.
+
+Each row written by an upload also records a digest of its normalized values
+under its duplicate key (upload_row_digests). A later upload skips rows whose
+digest is unchanged, so a modified file only writes the rows that differ.
+
+Both shortcuts assume the catalog has only been changed by uploads since. The
+admin endpoints that edit plans, tariffs or criteria directly call
+forget_uploads(), which makes file digests unusable and drops row digests.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+
+from app import models, schemas
+
+DIGEST_READ_CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(file, **options) -> str:
+    """
+    SHA-256 of an uploaded file and the options it is parsed with (e.g.
+    all_sheets): the same file read differently is a different upload
+    """
+    digest = hashlib.sha256()
+    file.file.seek(0)
+    for block in iter(lambda: file.file.read(DIGEST_READ_CHUNK_SIZE), b''):
+        digest.update(block)
+    file.file.seek(0)
+    if options:
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def row_digest(values: dict) -> str:
+    """SHA-256 of a normalized row"""
+    payload = json.dumps(values, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def row_key(key) -> str:
+    """String form of a duplicate key tuple (or a single id)"""
+    if isinstance(key, tuple):
+        return "|".join(str(part) for part in key)
+    return str(key)
+
+
+def find_repeated_upload(db: Session, upload_type: str, digest: str) -> Optional[models.UploadLedger]:
+    """The last upload of this type, if it was the same file and still describes the catalog"""
+    latest = db.query(models.UploadLedger).filter(
+        models.UploadLedger.upload_type == upload_type
+    ).order_by(models.UploadLedger.ledger_id.desc()).first()
+    if latest is not None and latest.reusable and latest.file_digest == digest:
+        return latest
+    return None
+
+
+def repeated_upload_response(entry: models.UploadLedger) -> schemas.UploadResponse:
+    """Response for a file identical to a completed upload"""
+    previous = schemas.UploadResponse.parse_raw(entry.result) if entry.result else None
+    return schemas.UploadResponse(
+        message=f"Identical file was already uploaded on {entry.created_at:%Y-%m-%d %H:%M} UTC; nothing was changed",
+        records_processed=entry.records_processed,
+        records_created=0,
+        records_updated=0,
+        records_unchanged=entry.records_processed,
+        errors=previous.errors if previous else []
+    )
+
+
+def start_upload(db: Session, upload_type: str, digest: str, filename: Optional[str]) -> models.UploadLedger:
+    """Record an upload before its rows are written (committed with the first chunk)"""
+    entry = models.UploadLedger(
+        upload_type=upload_type,
+        file_digest=digest,
+        filename=filename,
+        records_processed=0,
+        reusable=False
+    )
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def complete_upload(entry: models.UploadLedger, result: schemas.UploadResponse):
+    """Mark the upload as complete; the caller commits"""
+    entry.records_processed = result.records_processed
+    entry.result = result.json()
+    entry.reusable = True
+
+
+def load_row_digests(db: Session, upload_type: str, keys: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Stored digests by row key (all rows of the type when keys is None)"""
+    query = db.query(models.UploadRowDigest.row_key, models.UploadRowDigest.row_digest).filter(
+        models.UploadRowDigest.upload_type == upload_type
+    )
+    if keys is not None:
+        keys = list(keys)
+        if not keys:
+            return {}
+        query = query.filter(models.UploadRowDigest.row_key.in_(keys))
+    return {key: digest for key, digest in query}
+
+
+def save_row_digests(db: Session, upload_type: str, ledger_id: int, rows: List[Tuple[str, int, str]]):
+    """Upsert (row_key, policy_id, digest) entries; the caller commits"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(models.UploadRowDigest)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(models.UploadRowDigest)
+    else:
+        raise NotImplementedError(f"Row digest upsert is not supported on {dialect}")
+
+    stmt = stmt.values([
+        {
+            'upload_type': upload_type,
+            'row_key': key,
+            'policy_id': policy_id,
+            'row_digest': digest,
+            'ledger_id': ledger_id
+        }
+        for key, policy_id, digest in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.UploadRowDigest.upload_type, models.UploadRowDigest.row_key],
+        set_={
+            'policy_id': stmt.excluded.policy_id,
+            'row_digest': stmt.excluded.row_digest,
+            'ledger_id': stmt.excluded.ledger_id
+        }
+    )
+    db.execute(stmt)
+
+
+def forget_uploads(db: Session, *upload_types: str, policy_id: Optional[int] = None, keep_rows: bool = False):
+    """
+    Record a catalog change made outside the upload endpoints: earlier files of
+    these types must be processed again, and row digests (of one policy when
+    policy_id is given) no longer match the database. The caller commits.
+    """
+    db.query(models.UploadLedger).filter(
+        models.UploadLedger.upload_type.in_(upload_types),
+        models.UploadLedger.reusable.is_(True)
+    ).update({'reusable': False}, synchronize_session=False)
+
+    if keep_rows:
+        return
+    rows = db.query(models.UploadRowDigest).filter(models.UploadRowDigest.upload_type.in_(upload_types))
+    if policy_id is not None:
+        rows = rows.filter(models.UploadRowDigest.policy_id == policy_id)
+    rows.delete(synchronize_session=False)
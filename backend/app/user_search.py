@@ -0,0 +1,136 @@
+"""
+Indexed name/email search for the admin user and application listings.
+
+A substring search (ilike '%term%') cannot use a B-tree index, so it scans
+every user. Instead:
+  - Postgres: GIN indexes with pg_trgm's gin_trgm_ops on users.name and
+    users.email answer the same ilike filter, and results are ranked by
+    trigram similarity.
+  - SQLite: users_search, an FTS5 table with the trigram tokenizer, shadows
+    users.name and users.email. Triggers on users keep it in sync with every
+    write, including raw SQL. A quoted phrase query matches the same
+    substrings as ilike and is ranked by bm25.
+
+The trigram indexes need at least TRIGRAM_MIN_LENGTH characters; shorter
+terms (and databases without the index) fall back to the plain ilike scan.
+
+The migration creates the indexes; ensure_search_index() creates them at
+startup for databases built with create_all().
+"""
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query
+
+from app import models
+
+TRIGRAM_MIN_LENGTH = 3
+
+SEARCH_TABLE = "users_search"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, email, content='users', content_rowid='user_id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON users BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email) VALUES (new.user_id, new.name, new.email);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON users BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email) VALUES ('delete', old.user_id, old.name, old.email);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF name, email ON users BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email) VALUES ('delete', old.user_id, old.name, old.email);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email) VALUES (new.user_id, new.name, new.email);
+    END
+    """,
+]
+
+users_search = table(SEARCH_TABLE, column("rowid"), column("rank"))
+
+# Whether users_search exists, per SQLite database URL
+_sqlite_index_ready = {}
+
+
+def ensure_search_index(connection: Connection) -> bool:
+    """Create the search indexes if missing; True when they were created now"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        exists = connection.execute(text("SELECT to_regclass('ix_users_name_trgm') IS NOT NULL")).scalar()
+        if exists:
+            return False
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.execute(text(statement))
+        return True
+    if dialect == 'sqlite':
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SEARCH_TABLE}
+        ).scalar()
+        if exists:
+            return False
+        for statement in SQLITE_SEARCH_DDL:
+            connection.execute(text(statement))
+        # Index the users that already exist
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+        _sqlite_index_ready[str(connection.engine.url)] = True
+        return True
+    return False
+
+
+def _sqlite_index_available(query: Query) -> bool:
+    bind = query.session.get_bind()
+    key = str(bind.url)
+    if key not in _sqlite_index_ready:
+        _sqlite_index_ready[key] = query.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SEARCH_TABLE}
+        ).scalar() is not None
+    return _sqlite_index_ready[key]
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_users(query: Query, term: str) -> Query:
+    """
+    Filter a query that selects or joins User to users whose name or email
+    contains term, best matches first (later order_by calls break ties).
+    """
+    term = term.strip()
+    dialect = query.session.get_bind().dialect.name
+    substring = or_(
+        models.User.name.ilike(f"%{term}%"),
+        models.User.email.ilike(f"%{term}%")
+    )
+
+    if dialect == 'postgresql':
+        query = query.filter(substring)
+        if len(term) >= TRIGRAM_MIN_LENGTH:
+            similarity = func.greatest(
+                func.similarity(models.User.name, term),
+                func.similarity(models.User.email, term)
+            )
+            query = query.order_by(similarity.desc())
+        return query
+
+    if dialect == 'sqlite' and len(term) >= TRIGRAM_MIN_LENGTH and _sqlite_index_available(query):
+        matches = select(
+            users_search.c.rowid.label("user_id"),
+            users_search.c.rank.label("rank")
+        ).where(
+            literal_column(SEARCH_TABLE).op("MATCH")(_fts_phrase(term))
+        ).subquery()
+        return query.join(matches, matches.c.user_id == models.User.user_id).order_by(matches.c.rank.asc())
+
+    return query.filter(substring)
@@ -2,7 +2,15 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 from passlib.context import CryptContext
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import collections
+import itertools
+import threading
+import tempfile
+import codecs
+import shutil
 import csv
 import json
 import io
@@ -66,85 +74,462 @@ def get_current_admin_user(token: str, db):
 
 
 # Upload Utilities
-def parse_csv_file(file) -> List[dict]:
-    """Parse CSV file and return list of dictionaries"""
-    content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
-    text = content.decode('utf-8')
-    csv_reader = csv.DictReader(io.StringIO(text))
-    return list(csv_reader)
+# The iter_* readers stream rows from the spooled upload instead of reading the
+# whole file into memory; the parse_* helpers keep returning full lists.
+UPLOAD_READ_CHUNK_SIZE = 64 * 1024
+JSON_NUMBER_CHARS = '0123456789+-.eE'
 
 
-def parse_json_file(file) -> List[dict]:
-    """Parse JSON file and return list of dictionaries"""
-    content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
-    text = content.decode('utf-8')
-    data = json.loads(text)
-    if isinstance(data, list):
-        return data
-    elif isinstance(data, dict):
-        return [data]
-    else:
-        raise ValueError("JSON file must contain an array or object")
+def iter_chunks(rows: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable of rows into lists of at most size rows"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
-def parse_excel_file(file) -> List[dict]:
-    """Parse Excel file (.xlsx) and return list of dictionaries"""
-    if not EXCEL_SUPPORT:
-        raise ImportError("openpyxl is not installed. Please install it to support Excel files.")
-    
-    content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
-    
-    # Load workbook from bytes
-    workbook = load_workbook(io.BytesIO(content), data_only=True)
-    
-    # Get the first sheet
-    sheet = workbook.active
-    
+def iter_csv_rows(file) -> Iterator[dict]:
+    """Stream CSV rows as dictionaries"""
+    file.file.seek(0)
+    text_stream = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
+    try:
+        for row in csv.DictReader(text_stream):
+            yield row
+    finally:
+        # Detach so closing the wrapper does not close the upload itself (a
+        # reader dropped before the end may only be closed after the upload)
+        if not file.file.closed:
+            text_stream.detach()
+            file.file.seek(0)
+
+
+def iter_json_rows(file) -> Iterator[dict]:
+    """
+    Stream the elements of a top-level JSON array without loading the whole
+    document. A top-level object is returned as a single row.
+    """
+    file.file.seek(0)
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = file.file.read(UPLOAD_READ_CHUNK_SIZE)
+        if not chunk:
+            eof = True
+            buffer = buffer[pos:] + utf8.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    def next_char() -> Optional[str]:
+        """Skip whitespace and return the next character without consuming it"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    try:
+        first = next_char()
+        if first == '{':
+            while fill():
+                pass
+            yield json.loads(buffer[pos:])
+            return
+        if first != '[':
+            raise ValueError("JSON file must contain an array or object")
+        pos += 1
+
+        expect_value = True
+        while True:
+            char = next_char()
+            if char is None:
+                raise ValueError("Unexpected end of JSON file")
+            if char == ']':
+                return
+            if not expect_value:
+                if char != ',':
+                    raise ValueError(f"Invalid JSON: expected ',' or ']' but found {char!r}")
+                pos += 1
+                expect_value = True
+                continue
+
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A value that reaches the buffer edge may be truncated, and so may a
+                    # number followed only by number characters ("-0" of "-0.5", "1" of "1e-3")
+                    rest = buffer[end:]
+                    truncated = not rest or (isinstance(value, (int, float)) and not rest.strip(JSON_NUMBER_CHARS))
+                    if eof or not truncated:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+            pos = end
+            expect_value = False
+            yield value
+    finally:
+        file.file.seek(0)
+
+
+def _iter_sheet_rows(sheet) -> Iterator[dict]:
+    """Rows of a read-only worksheet as dictionaries keyed by normalized header"""
+    rows = sheet.iter_rows(values_only=True)
+
     # Get headers from first row
     headers = []
-    for cell in sheet[1]:
-        header_value = cell.value
+    for header_value in next(rows, None) or ():
         if header_value is None:
             break
         # Normalize header: strip whitespace, convert to lowercase, replace spaces with underscores
-        normalized = str(header_value).strip().lower().replace(' ', '_').replace('-', '_')
-        headers.append(normalized)
-    
+        headers.append(normalize_header(header_value))
+
     if not headers:
         raise ValueError("Excel file must have headers in the first row")
-    
-    # Read data rows
-    data_list = []
-    for row in sheet.iter_rows(min_row=2, values_only=False):
-        # Check if row is empty
-        if all(cell.value is None or str(cell.value).strip() == '' for cell in row[:len(headers)]):
-            continue
-        
+
+    for values in rows:
+        # Read-only sheets drop trailing empty cells, so pad to the header width
+        values = tuple(values[:len(headers)]) + (None,) * (len(headers) - len(values))
+
         row_data = {}
-        for idx, cell in enumerate(row[:len(headers)]):
-            header = headers[idx]
-            value = cell.value
-            
+        for header, value in zip(headers, values):
             # Convert None or empty strings to None
             if value is None or (isinstance(value, str) and value.strip() == ''):
                 row_data[header] = None
             else:
                 # Try to preserve the original value type
                 row_data[header] = value
-        
-        # Only add non-empty rows
+
+        # Only yield non-empty rows
         if any(v is not None for v in row_data.values()):
-            data_list.append(row_data)
-    
-    return data_list
+            yield row_data
 
 
-def validate_policy_data(data: dict, db) -> Tuple[bool, str]:
-    """Validate policy data (check provider_id, type_id exist)"""
-    from . import models
+def iter_excel_rows(file) -> Iterator[dict]:
+    """Stream rows of the first sheet of an Excel file (.xlsx) using a read-only workbook"""
+    if not EXCEL_SUPPORT:
+        raise ImportError("openpyxl is not installed. Please install it to support Excel files.")
+
+    file.file.seek(0)
+    workbook = load_workbook(file.file, read_only=True, data_only=True)
+    try:
+        yield from _iter_sheet_rows(workbook.active)
+    finally:
+        workbook.close()
+        file.file.seek(0)
+
+
+# Multi-sheet workbooks (one sheet per plan or class) are read one sheet per
+# process. Each row is tagged with its sheet and its row number in that sheet.
+# A worker returns its sheet as one list, so at most EXCEL_SHEET_WORKERS sheets
+# are read ahead: the parent holds the sheet being imported plus up to
+# EXCEL_SHEET_WORKERS - 1 finished ones, i.e. peak memory is about
+# EXCEL_SHEET_WORKERS times the largest sheet, whatever the number of sheets.
+# With one worker (or one sheet) rows are streamed without reading any sheet
+# ahead.
+EXCEL_SHEET_KEY = '_sheet'
+EXCEL_SHEET_ROW_KEY = '_sheet_row'
+EXCEL_SHEET_WORKERS = int(os.getenv("EXCEL_SHEET_WORKERS", os.cpu_count() or 1))
+
+_sheet_executor = None
+_sheet_executor_lock = threading.Lock()
+
+
+def _get_sheet_executor() -> ProcessPoolExecutor:
+    global _sheet_executor
+    if _sheet_executor is None:
+        with _sheet_executor_lock:
+            if _sheet_executor is None:
+                # spawn: forking a server process that runs threads is not safe
+                _sheet_executor = ProcessPoolExecutor(
+                    max_workers=EXCEL_SHEET_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _sheet_executor
+
+
+def _iter_tagged_sheet_rows(workbook, sheet_name: str) -> Iterator[dict]:
+    """Rows of one sheet tagged with the sheet and row number"""
+    try:
+        for sheet_row, row_data in enumerate(_iter_sheet_rows(workbook[sheet_name]), start=1):
+            row_data[EXCEL_SHEET_KEY] = sheet_name
+            row_data[EXCEL_SHEET_ROW_KEY] = sheet_row
+            yield row_data
+    except ValueError:
+        # Sheets without a header row (notes, cover pages) hold no data
+        return
+
+
+def read_excel_sheet(path: str, sheet_name: str) -> List[dict]:
+    """Read one sheet of a workbook on disk (runs in a worker process)"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return list(_iter_tagged_sheet_rows(workbook, sheet_name))
+    finally:
+        workbook.close()
+
+
+def _iter_sheets_in_workers(path: str, sheet_names: List[str]) -> Iterator[dict]:
+    """Rows of the sheets in order, with at most EXCEL_SHEET_WORKERS sheets submitted at a time"""
+    executor = _get_sheet_executor()
+    pending = collections.deque()
+    names = iter(sheet_names)
+    try:
+        for name in itertools.islice(names, EXCEL_SHEET_WORKERS):
+            pending.append(executor.submit(read_excel_sheet, path, name))
+        while pending:
+            rows = pending.popleft().result()
+            yield from rows
+            del rows
+            # Read the next sheet only once this one has been imported
+            for name in itertools.islice(names, 1):
+                pending.append(executor.submit(read_excel_sheet, path, name))
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_excel_sheet_rows(file) -> Iterator[dict]:
+    """
+    Rows of every sheet of an Excel file (.xlsx), sheets read in parallel.
+    Rows are yielded sheet by sheet in workbook order, tagged with
+    EXCEL_SHEET_KEY and EXCEL_SHEET_ROW_KEY.
+    """
+    if not EXCEL_SUPPORT:
+        raise ImportError("openpyxl is not installed. Please install it to support Excel files.")
+
+    # Worker processes open the workbook themselves, so it has to be on disk
+    with tempfile.NamedTemporaryFile(prefix="upload-", suffix=".xlsx", delete=False) as handle:
+        file.file.seek(0)
+        shutil.copyfileobj(file.file, handle)
+        path = handle.name
+    file.file.seek(0)
+
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet_names = workbook.sheetnames
+            if len(sheet_names) == 1 or EXCEL_SHEET_WORKERS <= 1:
+                for name in sheet_names:
+                    yield from _iter_tagged_sheet_rows(workbook, name)
+                return
+        finally:
+            workbook.close()
+
+        yield from _iter_sheets_in_workers(path, sheet_names)
+    finally:
+        os.remove(path)
+
+
+def estimate_upload_rows(file, all_sheets: bool = False) -> Optional[int]:
+    """
+    Cheap estimate of the number of data rows, used for upload progress.
+    CSV counts lines (quoted newlines make it an over-estimate), Excel uses the
+    sheet dimensions of the first sheet, or the sum over every sheet with
+    all_sheets. Returns None when unknown (JSON).
+    """
+    extension = file.filename.split('.')[-1].lower()
+    file.file.seek(0)
+    try:
+        if extension == 'csv':
+            lines = 0
+            last_byte = b'\n'
+            for block in iter(lambda: file.file.read(UPLOAD_READ_CHUNK_SIZE), b''):
+                lines += block.count(b'\n')
+                last_byte = block[-1:]
+            if last_byte != b'\n':
+                lines += 1
+            return max(lines - 1, 0)
+        if extension == 'xlsx' and EXCEL_SUPPORT:
+            workbook = load_workbook(file.file, read_only=True, data_only=True)
+            try:
+                sheets = workbook.worksheets if all_sheets else [workbook.active]
+                max_rows = [sheet.max_row for sheet in sheets]
+            finally:
+                workbook.close()
+            if not all(max_rows):
+                return None
+            return sum(max(max_row - 1, 0) for max_row in max_rows)
+        return None
+    finally:
+        file.file.seek(0)
+
+
+def parse_csv_file(file) -> List[dict]:
+    """Parse CSV file and return list of dictionaries"""
+    return list(iter_csv_rows(file))
+
+
+def parse_json_file(file) -> List[dict]:
+    """Parse JSON file and return list of dictionaries"""
+    return list(iter_json_rows(file))
+
+
+def parse_excel_file(file) -> List[dict]:
+    """Parse Excel file (.xlsx) and return list of dictionaries"""
+    return list(iter_excel_rows(file))
+
+
+def normalize_header(key) -> str:
+    """Upload column name as a field name: lowercase, spaces and dashes as underscores"""
+    return str(key).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def safe_int(value, default=None):
+    if value is None or value == '':
+        return default
+    try:
+        # Handle Excel numeric types and strings
+        if isinstance(value, (int, float)):
+            return int(value)
+        # Convert string to number
+        return int(float(str(value).strip()))
+    except (ValueError, TypeError, AttributeError):
+        return default
+
+
+def safe_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_percentage(value):
+    """Convert percentage value (1-100) to decimal (0-1) format"""
+    if value is None or value == '':
+        return None
+    try:
+        percentage = float(value)
+        # If value is > 1, assume it's a percentage (1-100) and convert to decimal (0-1)
+        if percentage > 1:
+            return percentage / 100.0
+        # If value is <= 1, assume it's already in decimal format (0-1)
+        return percentage
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_optional_text(value):
+    """Stripped string, or None for any empty value"""
+    return str(value).strip() if value else None
+
+
+class RowNormalizer:
+    """
+    Conversion of uploaded rows to field values, driven by a spec of
+    {field: (converter, default)} and column aliases ({alias: field}).
+
+    Column names are normalized and resolved to fields once per set of keys
+    (once per file for CSV and Excel), so each row only runs the converters.
+    Missing fields get their default; unknown columns are dropped. When two
+    columns resolve to the same field the later one wins.
+    """
+
+    def __init__(self, spec: dict, aliases: Optional[dict] = None):
+        self.spec = spec
+        self.aliases = aliases or {}
+        self._defaults = {field: default for field, (converter, default) in spec.items()}
+        # key tuple -> [(column, field, converter)]
+        self._plans = {}
+
+    def _plan(self, keys: tuple) -> list:
+        resolved = {}
+        for key in keys:
+            field = normalize_header(key)
+            field = self.aliases.get(field, field)
+            if field in self.spec:
+                resolved[field] = key
+        return [(column, field, self.spec[field][0]) for field, column in resolved.items()]
+
+    def __call__(self, row: dict) -> dict:
+        keys = tuple(row)
+        plan = self._plans.get(keys)
+        if plan is None:
+            plan = self._plans[keys] = self._plan(keys)
+
+        values = self._defaults.copy()
+        for column, field, converter in plan:
+            values[field] = converter(row[column])
+        return values
+
+
+class UploadValidationContext:
+    """
+    Reference data shared by the rows of one bulk upload.
+
+    Each set of valid IDs is loaded with a single query the first time a row
+    needs it, so checking a row never goes back to the database. Unknown IDs
+    are not reported row by row: they are collected and turned into one error
+    per ID by unknown_id_errors().
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._id_sets = {}
+        # (label, id) -> row numbers that referenced it
+        self._unknown_ids = {}
+
+    def _ids(self, column) -> set:
+        key = column.key
+        if key not in self._id_sets:
+            self._id_sets[key] = {value for (value,) in self.db.query(column)}
+        return self._id_sets[key]
+
+    def policy_ids(self) -> set:
+        from . import models
+        return self._ids(models.InsurancePlan.policy_id)
+
+    def provider_ids(self) -> set:
+        from . import models
+        return self._ids(models.Provider.provider_id)
+
+    def type_ids(self) -> set:
+        from . import models
+        return self._ids(models.InsuranceType.type_id)
+
+    def check_id(self, label: str, value: int, valid_ids: set, row_number: Union[int, str]) -> bool:
+        """Return True if value is a known ID, otherwise remember the row that used it"""
+        if value in valid_ids:
+            return True
+        self._unknown_ids.setdefault((label, value), []).append(row_number)
+        return False
+
+    def unknown_id_errors(self, max_rows: int = 10) -> List[str]:
+        """One error message per unknown ID, listing the rows that referenced it"""
+        errors = []
+        for (label, value), row_numbers in self._unknown_ids.items():
+            rows = ", ".join(str(row_number) for row_number in row_numbers[:max_rows])
+            if len(row_numbers) > max_rows:
+                rows += f" and {len(row_numbers) - max_rows} more"
+            noun = "row" if len(row_numbers) == 1 else "rows"
+            errors.append(f"{label} with ID {value} not found in {len(row_numbers)} {noun} ({rows})")
+        return errors
+
+
+def validate_policy_data(data: dict, context: UploadValidationContext, row_number: int) -> Tuple[bool, str]:
+    """
+    Validate policy data (check provider_id, type_id exist).
+    Unknown IDs return (False, "") and are reported through the context.
+    """
     if 'provider_id' not in data:
         return False, "Missing required field: provider_id"
     if 'type_id' not in data:
@@ -152,20 +537,20 @@ def validate_policy_data(data: dict, db) -> Tuple[bool, str]:
     if 'name' not in data:
         return False, "Missing required field: name"
     
-    provider = db.query(models.Provider).filter(models.Provider.provider_id == int(data['provider_id'])).first()
-    if not provider:
-        return False, f"Provider with ID {data['provider_id']} not found"
+    if not context.check_id("Provider", int(data['provider_id']), context.provider_ids(), row_number):
+        return False, ""
     
-    insurance_type = db.query(models.InsuranceType).filter(models.InsuranceType.type_id == int(data['type_id'])).first()
-    if not insurance_type:
-        return False, f"Insurance type with ID {data['type_id']} not found"
+    if not context.check_id("Insurance type", int(data['type_id']), context.type_ids(), row_number):
+        return False, ""
     
     return True, ""
 
 
-def validate_tariff_data(data: dict, db) -> Tuple[bool, str]:
-    """Validate tariff data (check policy_id exists)"""
-    from . import models
+def validate_tariff_data(data: dict, context: UploadValidationContext, row_number: Union[int, str]) -> Tuple[bool, str]:
+    """
+    Validate tariff data (check policy_id exists).
+    Unknown IDs return (False, "") and are reported through the context.
+    """
     if 'policy_id' not in data or data['policy_id'] is None:
         return False, "Missing required field: policy_id"
     if 'age_min' not in data or data['age_min'] is None:
@@ -186,9 +571,8 @@ def validate_tariff_data(data: dict, db) -> Tuple[bool, str]:
     except (ValueError, TypeError):
         return False, f"Invalid policy_id: {data['policy_id']}"
     
-    policy = db.query(models.InsurancePlan).filter(models.InsurancePlan.policy_id == policy_id).first()
-    if not policy:
-        return False, f"Policy with ID {policy_id} not found"
+    if not context.check_id("Policy", policy_id, context.policy_ids(), row_number):
+        return False, ""
     
     return True, ""
 
@@ -215,126 +599,142 @@ def validate_outpatient_criteria_data(data: dict) -> Tuple[bool, str]:
         return False, f"Invalid outpatient_criteria_data structure: {str(e)}"
 
 
-def parse_criteria_excel_to_json(data_list: List[dict]) -> List[dict]:
-    """Convert flat Excel data structure to nested JSON structure for criteria"""
-    # Define all coverage fields
-    IN_PATIENT_GENERAL = [
-        "annual_limit", "scope_of_coverage", "network", "geographic_coverage_elective",
-        "geographic_coverage_emergency", "waiting_period", "non_direct_billing", "cold_case",
-        "hospital_accommodation", "road_ambulance", "maternity_in_patient", "maternity_lab_test",
-        "new_born", "nursery_incubator", "extra_bed_parent", "home_care",
-        "plan_upgrade_downgrade", "passive_war", "payment_frequency", "pre_existing_conditions",
-    ]
-    
-    IN_PATIENT_CASE = [
-        "physiotherapy", "work_related_injuries", "acute_allergy_treatments", "bariatric_surgeries",
-        "breast_reconstruction", "chemotherapy_radiotherapy", "chronic_conditions",
-        "congenital_cases_lifetime", "congenital_tests_thalassemia", "epidural", "epilepsy", "icu",
-        "infertility_impotence_sterility", "laparoscopic_procedures", "migraines", "motorcycling",
-        "organ_transplant", "polysomnography", "prosthesis_due_to_accident",
-        "prosthesis_due_to_sickness", "rehabilitation", "renal_dialysis", "scoliosis",
-        "std_excluding_hiv", "varicocele", "varicose_veins", "morgue_burial_expenses",
-        "genetic_tests", "diagnostic_tests", "ambulatory_laboratory_exams",
-        "doctor_visits_consultations", "prescribed_medicines_drugs",
-    ]
-    
-    OUT_PATIENT = [
-        "outpatient_annual_limit", "outpatient_coverage", "outpatient_network",
-        "outpatient_deductible", "diagnostic_tests", "ambulatory_laboratory_exams",
-        "doctor_visits_consultations", "prescribed_medicines_drugs",
-    ]
-    
+# Criteria sheet columns, as written by create_criteria_template.py:
+# "In-Patient General: {Field} - Notes", "In-Patient Case: ..." and "Out-Patient: ..."
+CRITERIA_IN_PATIENT_GENERAL = [
+    "annual_limit", "scope_of_coverage", "network", "geographic_coverage_elective",
+    "geographic_coverage_emergency", "waiting_period", "non_direct_billing", "cold_case",
+    "hospital_accommodation", "road_ambulance", "maternity_in_patient", "maternity_lab_test",
+    "new_born", "nursery_incubator", "extra_bed_parent", "home_care",
+    "plan_upgrade_downgrade", "passive_war", "payment_frequency", "pre_existing_conditions",
+]
+
+CRITERIA_IN_PATIENT_CASE = [
+    "physiotherapy", "work_related_injuries", "acute_allergy_treatments", "bariatric_surgeries",
+    "breast_reconstruction", "chemotherapy_radiotherapy", "chronic_conditions",
+    "congenital_cases_lifetime", "congenital_tests_thalassemia", "epidural", "epilepsy", "icu",
+    "infertility_impotence_sterility", "laparoscopic_procedures", "migraines", "motorcycling",
+    "organ_transplant", "polysomnography", "prosthesis_due_to_accident",
+    "prosthesis_due_to_sickness", "rehabilitation", "renal_dialysis", "scoliosis",
+    "std_excluding_hiv", "varicocele", "varicose_veins", "morgue_burial_expenses",
+    "genetic_tests", "diagnostic_tests", "ambulatory_laboratory_exams",
+    "doctor_visits_consultations", "prescribed_medicines_drugs",
+]
+
+CRITERIA_OUT_PATIENT = [
+    "outpatient_annual_limit", "outpatient_coverage", "outpatient_network",
+    "outpatient_deductible", "diagnostic_tests", "ambulatory_laboratory_exams",
+    "doctor_visits_consultations", "prescribed_medicines_drugs",
+]
+
+
+def _is_general_header(header: str) -> bool:
+    return "general" in header
+
+
+def _is_case_header(header: str) -> bool:
+    return ("in" in header and "patient" in header and "case" in header) or \
+           ("case" in header and "general" not in header)
+
+
+def _is_out_patient_header(header: str) -> bool:
+    return ("out" in header and "patient" in header) or ("outpatient" in header)
+
+
+# section -> (fields, header filter)
+CRITERIA_SECTIONS = {
+    "general_coverages": (CRITERIA_IN_PATIENT_GENERAL, _is_general_header),
+    "case_coverages": (CRITERIA_IN_PATIENT_CASE, _is_case_header),
+    "out_patient": (CRITERIA_OUT_PATIENT, _is_out_patient_header),
+}
+
+
+class CriteriaHeaderMap:
+    """
+    Resolution of criteria sheet headers to (section, field), done once per
+    set of headers instead of once per row.
+
+    A field takes the first column (in sheet order) whose header passes the
+    section filter and contains the field name. Headers that could feed more
+    than one field, or fields that match several columns, are listed in
+    ambiguities.
+    """
+
+    def __init__(self, headers: Iterable[str]):
+        headers = list(headers)
+        # Compare with "-" and "_" read as spaces
+        spaced = [header.replace('-', ' ').replace('_', ' ').lower() for header in headers]
+
+        # section -> [(field, header or None)]
+        self.columns = {}
+        self.ambiguities = []
+        used_by = {}
+        for section, (fields, header_filter) in CRITERIA_SECTIONS.items():
+            section_headers = [
+                (header, spaced_header)
+                for header, spaced_header in zip(headers, spaced)
+                if header_filter(header.lower())
+            ]
+            self.columns[section] = []
+            for field in fields:
+                field_spaced = field.replace('_', ' ').lower()
+                candidates = [header for header, spaced_header in section_headers if field_spaced in spaced_header]
+                header = candidates[0] if candidates else None
+                self.columns[section].append((field, header))
+                if header is not None:
+                    used_by.setdefault(header, []).append(f"{section}.{field}")
+                if len(candidates) > 1:
+                    self.ambiguities.append(
+                        f"Field {section}.{field} matches columns {', '.join(candidates)}; using {header}"
+                    )
+
+        for header, fields in used_by.items():
+            if len(fields) > 1:
+                self.ambiguities.append(f"Column {header} is used for fields {', '.join(fields)}")
+
+    def convert(self, row_data: dict) -> dict:
+        """Nested criteria payload for one row"""
+        coverages = {}
+        for section, columns in self.columns.items():
+            section_coverages = {}
+            for field, header in columns:
+                notes_value = row_data.get(header) if header is not None else None
+                section_coverages[field] = {"notes": "" if notes_value is None else str(notes_value).strip()}
+            coverages[section] = section_coverages
+
+        return {
+            "policy_id": int(row_data['policy_id']),
+            "criteria_data": {
+                "in_patient": {
+                    "general_coverages": coverages["general_coverages"],
+                    "case_coverages": coverages["case_coverages"]
+                }
+            },
+            "outpatient_criteria_data": {
+                "out_patient": coverages["out_patient"]
+            }
+        }
+
+
+def parse_criteria_excel_to_json(data_list: Iterable[dict], ambiguities: Optional[List[str]] = None) -> List[dict]:
+    """
+    Convert flat Excel data structure to nested JSON structure for criteria.
+    Header ambiguities are appended to the ambiguities list when one is given.
+    """
     result = []
+    header_maps = {}  # header tuple -> CriteriaHeaderMap; one entry per sheet layout
     
     for row_data in data_list:
         if 'policy_id' not in row_data or row_data['policy_id'] is None:
             continue
         
-        # Build in-patient general coverages
-        general_coverages = {}
-        for field in IN_PATIENT_GENERAL:
-            # Try to find the column - template uses "In-Patient General: {Field} - Notes"
-            notes_key = None
-            field_name_normalized = field.replace('_', ' ').title()
-            
-            for key in row_data.keys():
-                normalized_key = key.lower()
-                # Match patterns like "in-patient general: annual limit - notes" or variations
-                if ("in" in normalized_key and "patient" in normalized_key and "general" in normalized_key) or \
-                   ("general" in normalized_key):
-                    # Extract the field name from the column header
-                    key_normalized = key.replace('-', ' ').replace('_', ' ').lower()
-                    field_normalized = field.replace('_', ' ').lower()
-                    # Check if the field name is in the column header
-                    if field_normalized in key_normalized:
-                        notes_key = key
-                        break
-            
-            notes_value = row_data.get(notes_key, "") if notes_key else ""
-            if notes_value is None:
-                notes_value = ""
-            general_coverages[field] = {"notes": str(notes_value).strip()}
+        headers = tuple(row_data.keys())
+        header_map = header_maps.get(headers)
+        if header_map is None:
+            header_map = header_maps[headers] = CriteriaHeaderMap(headers)
+            if ambiguities is not None:
+                ambiguities.extend(header_map.ambiguities)
         
-        # Build in-patient case coverages
-        case_coverages = {}
-        for field in IN_PATIENT_CASE:
-            notes_key = None
-            field_name_normalized = field.replace('_', ' ').title()
-            
-            for key in row_data.keys():
-                normalized_key = key.lower()
-                if ("in" in normalized_key and "patient" in normalized_key and "case" in normalized_key) or \
-                   ("case" in normalized_key and "general" not in normalized_key):
-                    key_normalized = key.replace('-', ' ').replace('_', ' ').lower()
-                    field_normalized = field.replace('_', ' ').lower()
-                    if field_normalized in key_normalized:
-                        notes_key = key
-                        break
-            
-            notes_value = row_data.get(notes_key, "") if notes_key else ""
-            if notes_value is None:
-                notes_value = ""
-            case_coverages[field] = {"notes": str(notes_value).strip()}
-        
-        # Build out-patient coverages
-        out_patient_coverages = {}
-        for field in OUT_PATIENT:
-            notes_key = None
-            
-            for key in row_data.keys():
-                normalized_key = key.lower()
-                if ("out" in normalized_key and "patient" in normalized_key) or \
-                   ("outpatient" in normalized_key):
-                    key_normalized = key.replace('-', ' ').replace('_', ' ').lower()
-                    field_normalized = field.replace('outpatient_', '').replace('_', ' ').lower()
-                    # Handle special case where field already contains "outpatient"
-                    if field.startswith("outpatient_"):
-                        field_normalized = field.replace('_', ' ').lower()
-                    if field_normalized in key_normalized:
-                        notes_key = key
-                        break
-            
-            notes_value = row_data.get(notes_key, "") if notes_key else ""
-            if notes_value is None:
-                notes_value = ""
-            out_patient_coverages[field] = {"notes": str(notes_value).strip()}
-        
-        # Build the nested structure
-        criteria_data = {
-            "in_patient": {
-                "general_coverages": general_coverages,
-                "case_coverages": case_coverages
-            }
-        }
-        
-        outpatient_criteria_data = {
-            "out_patient": out_patient_coverages
-        }
-        
-        result.append({
-            "policy_id": int(row_data['policy_id']),
-            "criteria_data": criteria_data,
-            "outpatient_criteria_data": outpatient_criteria_data
-        })
+        result.append(header_map.convert(row_data))
     
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,94 @@
+"""
+Vectorized tariff matcher backed by NumPy.
+
+The catalog is stored as columnar arrays (one entry per tariff, sorted by
+policy_id then tariff_id) and every quote predicate is a boolean mask over
+those arrays. The "all family ages within range" check is a single comparison
+against the youngest and oldest age, whatever the number of family members.
+
+Select it with QUOTE_ENGINE=numpy. It shares snapshot handling and
+invalidation with TariffIndex.
+"""
+from typing import Dict, List
+
+from app import schemas
+from app.matching import quote_family_size, quote_age_bounds
+from app.tariff_index import TariffIndex
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+
+class VectorTariffIndex(TariffIndex):
+    """Columnar tariff snapshot evaluated with NumPy masks"""
+
+    def _build(self, tariffs: List[schemas.MatchedTariffOut]):
+        if not NUMPY_SUPPORT:
+            raise ImportError("numpy is not installed. Please install it to use QUOTE_ENGINE=numpy.")
+
+        tariffs = sorted(tariffs, key=lambda t: (t.policy_id, t.tariff_id))
+        self.tariffs = tariffs
+        self.class_codes: Dict[str, int] = {}
+        for tariff in tariffs:
+            self.class_codes.setdefault(tariff.class_type.upper(), len(self.class_codes))
+
+        self.age_min = np.array([t.age_min for t in tariffs], dtype=np.int32)
+        self.age_max = np.array([t.age_max for t in tariffs], dtype=np.int32)
+        self.family_min = np.array([t.family_min for t in tariffs], dtype=np.int32)
+        self.family_max = np.array([t.family_max for t in tariffs], dtype=np.int32)
+        self.class_code = np.array([self.class_codes[t.class_type.upper()] for t in tariffs], dtype=np.int32)
+        self.policy_id = np.array([t.policy_id for t in tariffs], dtype=np.int64)
+        # NaN marks "no outpatient coverage"
+        self.outpatient_pct = np.array(
+            [t.outpatient_coverage_percentage if t.outpatient_coverage_percentage is not None else np.nan for t in tariffs],
+            dtype=np.float64
+        )
+
+    def match_mask(self, criteria: schemas.PolicyMatchCriteria):
+        """Boolean mask of tariffs matching the criteria"""
+        code = self.class_codes.get(criteria.insurance_class.upper())
+        family_size = quote_family_size(criteria)
+        if code is None or family_size is None:
+            return np.zeros(len(self.tariffs), dtype=bool)
+        age_low, age_high = quote_age_bounds(criteria)
+        return (
+            (self.class_code == code)
+            & (self.family_min <= family_size) & (self.family_max >= family_size)
+            & (self.age_min <= age_low) & (self.age_max >= age_high)
+        )
+
+    def match(self, criteria: schemas.PolicyMatchCriteria) -> List[schemas.MatchedPolicyOut]:
+        hits = np.flatnonzero(self.match_mask(criteria))
+        if hits.size == 0:
+            return []
+
+        # Hits are ordered by policy_id, so each plan is one contiguous run
+        hit_policies = self.policy_id[hits]
+        run_starts = np.flatnonzero(np.r_[True, hit_policies[1:] != hit_policies[:-1]])
+        run_ends = np.r_[run_starts[1:], hits.size]
+        coverage = np.nan_to_num(self.outpatient_pct[hits], nan=0.0)
+
+        matched_policies = []
+        for start, end in zip(run_starts, run_ends):
+            rows = hits[start:end]
+            # argmin returns the first minimum, i.e. the lowest tariff_id on ties
+            base_row = rows[np.argmin(coverage[start:end])]
+            outpatient_rows = rows[coverage[start:end] > 0]
+            outpatient_rows = outpatient_rows[np.argsort(self.outpatient_pct[outpatient_rows], kind="stable")]
+
+            matched_policies.append(schemas.MatchedPolicyOut(
+                policy=self.plans[int(hit_policies[start])],
+                matching_tariff=self.tariffs[base_row],
+                outpatient_options=[
+                    schemas.OutpatientOption(
+                        outpatient_coverage_percentage=self.tariffs[row].outpatient_coverage_percentage,
+                        outpatient_price_usd=float(self.tariffs[row].outpatient_price_usd) if self.tariffs[row].outpatient_price_usd else None,
+                        tariff_id=self.tariffs[row].tariff_id
+                    )
+                    for row in outpatient_rows
+                ]
+            ))
+        return matched_policies
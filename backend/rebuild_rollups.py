@@ -0,0 +1,17 @@
+"""Script to rebuild the daily analytics rollups from user policies, claims and users"""
+from app.database import SessionLocal
+from app import rollups
+
+db = SessionLocal()
+try:
+    print("Rebuilding daily rollups...")
+    counts = rollups.rebuild_rollups(db)
+    db.commit()
+    for table, rows in counts.items():
+        print(f"  {table}: {rows} rows")
+    print("✅ Rollups rebuilt")
+except Exception as e:
+    print(f"❌ Error: {e}")
+    db.rollback()
+finally:
+    db.close()
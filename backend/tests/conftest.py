@@ -0,0 +1,231 @@
+"""
+Shared fixtures. The app runs against a throwaway SQLite file: the settings
+below must be in place before app.database is imported, and every test starts
+from an empty schema with empty caches.
+
+Tests marked benchmark are skipped unless pytest runs with --benchmark
+(add -s to see the numbers they print). Tests that use postgres_db run against
+the Postgres database at TEST_POSTGRES_URL, whose tables they drop and
+recreate, and are skipped when it is not set.
+"""
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+
+_DB_DIR = tempfile.mkdtemp(prefix="insurance-app-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-the-test-suite-only")
+os.environ.setdefault("ALGORITHM", "HS256")
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    # plan_criteria uses JSONB; SQLite stores it as JSON
+    return "JSON"
+
+
+from app import cache, models, user_search
+from app.database import Base, SessionLocal, dispose_async_engine, engine
+from app.main import app
+from app.routes.admin_routes import get_current_admin
+from app.tariff_index import invalidate_tariff_index
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="run the benchmarks (tests marked benchmark); print their results with -s")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Empty schema, search index and caches for every test"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # drop_all takes the users triggers but not the FTS table that shadows users
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {user_search.SEARCH_TABLE}"))
+        user_search.ensure_search_index(connection)
+    cache.set_cache(cache.LocalCache())
+    invalidate_tariff_index()
+    yield
+    app.dependency_overrides.clear()
+    # Pooled aiosqlite connections keep their threads (and the test run) alive
+    asyncio.run(dispose_async_engine())
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def postgres_db():
+    """Session on an emptied schema of the Postgres database at TEST_POSTGRES_URL"""
+    if not TEST_POSTGRES_URL:
+        pytest.skip("set TEST_POSTGRES_URL to a disposable Postgres database")
+    postgres_engine = create_engine(TEST_POSTGRES_URL)
+    Base.metadata.drop_all(bind=postgres_engine)
+    Base.metadata.create_all(bind=postgres_engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=postgres_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=postgres_engine)
+        postgres_engine.dispose()
+
+
+@pytest.fixture
+def count_statements():
+    """Context manager that collects the SQL statements sent through the engine"""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return counter
+
+
+@pytest.fixture
+def admin_user(db):
+    user = models.User(name="Admin", email="admin@example.com", password_hash="x", is_admin=True)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    return user
+
+
+@pytest.fixture
+def client(admin_user):
+    """Test client signed in as admin_user"""
+    app.dependency_overrides[get_current_admin] = lambda: admin_user
+    return TestClient(app)
+
+
+@pytest.fixture
+def catalog(db):
+    """
+    Two providers with three active plans and overlapping tariffs (mixed
+    class_type case, open and closed outpatient coverage, family ranges)
+    """
+    return add_catalog(db)
+
+
+@pytest.fixture
+def postgres_catalog(postgres_db):
+    """The catalog in postgres_db"""
+    return add_catalog(postgres_db)
+
+
+def add_catalog(db):
+    providers = [models.Provider(name="Alpha Assurance"), models.Provider(name="Beta Health")]
+    insurance_type = models.InsuranceType(name="Health")
+    db.add_all(providers + [insurance_type])
+    db.flush()
+
+    plans = [
+        models.InsurancePlan(name=f"Plan {i}", provider_id=providers[i % 2].provider_id,
+                             type_id=insurance_type.type_id, status=models.PolicyStatus.active)
+        for i in range(3)
+    ]
+    db.add_all(plans)
+    db.flush()
+
+    tariffs = [
+        # policy, age_min, age_max, class, family_min, family_max, outpatient %, inpatient, total
+        (0, 0, 30, "A", 1, 1, None, 900, 900),
+        (0, 31, 64, "A", 1, 1, None, 1400, 1400),
+        (0, 0, 64, "B", 1, 4, 0.8, 700, 950),
+        (0, 0, 64, "b", 2, 6, 1.0, 650, 1000),
+        (1, 18, 45, "A", 1, 1, 0.5, 1000, 1200),
+        (1, 18, 45, "A", 1, 1, None, 1100, 1100),
+        (1, 0, 99, "B", 1, 5, 0.8, 800, 1050),
+        (2, 25, 60, "a", 1, 3, 1.0, 1300, 1600),
+        (2, 25, 60, "C", 1, 3, None, 500, 500),
+    ]
+    for index, age_min, age_max, class_type, family_min, family_max, outpatient, inpatient, total in tariffs:
+        db.add(models.Tariff(
+            policy_id=plans[index].policy_id,
+            age_min=age_min,
+            age_max=age_max,
+            class_type=class_type,
+            family_min=family_min,
+            family_max=family_max,
+            outpatient_coverage_percentage=outpatient,
+            inpatient_usd=Decimal(inpatient),
+            total_usd=Decimal(total),
+            outpatient_price_usd=Decimal(total - inpatient) if outpatient else None
+        ))
+    db.commit()
+    return [plan.policy_id for plan in plans]
+
+
+@pytest.fixture
+def applications(db, catalog):
+    """
+    24 user policies of 8 applicants across the catalog's plans, in every
+    status (two thirds pending_payment), some with a document version
+    """
+    issued = datetime(2026, 1, 1)
+    version = models.PolicyDocumentVersion(policy_id=catalog[0], version_number="2026.1",
+                                           pdf_url="/static/plan-0.pdf", effective_date=date(2026, 1, 1))
+    users = [
+        models.User(name=f"Applicant {i}", email=f"applicant{i}@example.com", password_hash="x",
+                    phone=f"+961 70 000 00{i}" if i % 2 else None, created_at=issued)
+        for i in range(8)
+    ]
+    db.add_all(users + [version])
+    db.flush()
+
+    statuses = [models.UserPolicyStatus.pending_payment, models.UserPolicyStatus.pending_payment,
+                models.UserPolicyStatus.active, models.UserPolicyStatus.expired]
+    user_policies = [
+        models.UserPolicy(
+            user_id=users[i % len(users)].user_id,
+            policy_id=catalog[i % len(catalog)],
+            version_id=version.version_id if i % len(catalog) == 0 else None,
+            policy_number=f"P-{i:04d}",
+            premium_paid=Decimal("125.50") * (i + 1) if i % 3 else None,
+            status=statuses[i % 3] if i % 5 else statuses[3],
+            # Out of id order, with ties, so ordering by issue time is exercised
+            issued_at=issued + timedelta(hours=(i * 7) % 11)
+        )
+        for i in range(24)
+    ]
+    db.add_all(user_policies)
+    db.commit()
+    return [user_policy.user_policy_id for user_policy in user_policies]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app import models, schemas
+
+
+# Offset pages count then run one joined SELECT; keyset pages without a total
+# only run the SELECT. Neither grows with the page size (no per-row user lookups)
+@pytest.mark.parametrize("params, expected", [
+    ({}, 2),
+    ({"status": "active"}, 2),
+    ({"provider_id": 1, "status": "expired"}, 2),
+    ({"cursor": ""}, 1),
+    ({"cursor": "", "status": "active"}, 1),
+])
+def test_statement_count_does_not_grow_with_page_size(client, applications, count_statements, params, expected):
+    for page_size in (1, 5, 50):
+        with count_statements() as statements:
+            response = client.get("/admin/applications", params=dict(params, page_size=page_size))
+        assert response.status_code == 200
+        assert response.json()["items"]
+        assert len(statements) == expected, statements
+        assert sum(statement.lstrip().upper().startswith("SELECT") for statement in statements) == expected
+
+
+def test_applications_match_the_detail_schemas(client, db, applications):
+    body = client.get("/admin/applications", params={"page_size": 50}).json()
+    items = body["items"]
+
+    pending = db.query(models.UserPolicy).filter(
+        models.UserPolicy.status == models.UserPolicyStatus.pending_payment
+    ).all()
+    assert body["total"] == len(items) == len(pending)
+    assert {item["status"] for item in items} == {"pending_payment"}
+
+    # Oldest applications first
+    issued = [item["issued_at"] for item in items]
+    assert issued == sorted(issued)
+
+    by_id = {user_policy.user_policy_id: user_policy for user_policy in pending}
+    for item in items:
+        user_policy = by_id[item["user_policy_id"]]
+        expected = schemas.UserPolicyDetailOut.from_orm(user_policy).dict()
+        expected["user"] = schemas.UserOut.from_orm(user_policy.user).dict()
+        assert item == jsonable_encoder(expected)
+        assert item["user"]["user_id"] == user_policy.user_id
+        assert item["plan"]["provider"]["name"] == user_policy.plan.provider.name
+
+
+def test_filters_and_search(client, db, applications, catalog):
+    items = client.get("/admin/applications", params={"provider_id": 2, "page_size": 50}).json()["items"]
+    assert items
+    assert {item["plan"]["provider"]["name"] for item in items} == {"Beta Health"}
+    assert {item["status"] for item in items} == {"pending_payment"}
+
+    items = client.get("/admin/applications", params={"search": "applicant3@example.com", "page_size": 50}).json()["items"]
+    assert items
+    assert {item["user"]["email"] for item in items} == {"applicant3@example.com"}
@@ -0,0 +1,102 @@
+"""
+Load test: the async read handlers against sync def twins of the same
+queries (how the handlers were written before), on the same database, at
+increasing concurrency. Sync handlers queue for Starlette's threadpool
+(40 threads); async ones wait on the database without holding a thread.
+Once more sync requests are in flight than the pool has connections, threads
+that wait for a connection can starve the threads that would return one;
+those requests fail with a pool timeout and are counted as errors.
+
+    python -m pytest tests/test_benchmark_async_reads.py --benchmark -s
+"""
+import asyncio
+import time
+from typing import List
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import database, models, schemas, serializers
+from app.database import dispose_async_engine
+from app.main import app
+
+pytestmark = pytest.mark.benchmark
+
+REQUESTS = 500
+CONCURRENCY = [1, 10, 40, 200]
+
+# The app's pool settings, failing after 5s instead of 30s when starved
+sync_engine = create_engine(database.SQLALCHEMY_DATABASE_URL, **dict(database._engine_options(), pool_timeout=5))
+SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+
+
+def get_db():
+    db = SyncSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+sync_router = APIRouter()
+
+
+@sync_router.get("/marketplace/policies", response_model=List[schemas.InsurancePlanOut])
+def list_policies(db: Session = Depends(get_db)):
+    return db.query(models.InsurancePlan).all()
+
+
+@sync_router.get("/policies/mine", response_model=List[schemas.UserPolicyDetailOut])
+def my_policies(user_id: int, db: Session = Depends(get_db)):
+    return db.query(models.UserPolicy).options(
+        *serializers.user_policy_detail_options()
+    ).filter(models.UserPolicy.user_id == user_id).all()
+
+
+sync_app = FastAPI()
+sync_app.include_router(sync_router)
+
+
+@pytest.fixture
+def many_plans(db, catalog):
+    first = db.query(models.InsurancePlan).get(catalog[0])
+    db.add_all([
+        models.InsurancePlan(name=f"Load plan {i}", provider_id=first.provider_id, type_id=first.type_id,
+                             status=models.PolicyStatus.active)
+        for i in range(50)
+    ])
+    db.commit()
+
+
+async def load(target, path, concurrency):
+    """(requests per second, failed requests); one event loop per call"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=target, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                return response.status_code == 200
+
+        assert await one()  # warm up the engine and pool
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+    # Pooled aiosqlite connections belong to this loop
+    await dispose_async_engine()
+    return REQUESTS / elapsed, results.count(False)
+
+
+@pytest.mark.parametrize("path", ["/marketplace/policies", "/policies/mine?user_id=2"])
+def test_async_and_sync_read_throughput(many_plans, applications, path):
+    print(f"\n{path}: {REQUESTS} requests")
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'errors':>7} {'async req/s':>12} {'errors':>7}")
+    for concurrency in CONCURRENCY:
+        sync_rate, sync_errors = asyncio.run(load(sync_app, path, concurrency))
+        async_rate, async_errors = asyncio.run(load(app, path, concurrency))
+        print(f"{concurrency:>12} {sync_rate:>12.0f} {sync_errors:>7} {async_rate:>12.0f} {async_errors:>7}")
+        assert async_errors == 0
+    sync_engine.dispose()
@@ -0,0 +1,70 @@
+"""
+Multi-sheet tariff workbook, 5,000 rows per sheet: iter_excel_sheet_rows
+reading the sheets one after another (EXCEL_SHEET_WORKERS=1) against
+reading them in the spawned process pool with 2 and 4 workers. The pool is
+started and warmed up before it is timed; the speedup is bounded by the
+number of CPUs.
+
+    python -m pytest tests/test_benchmark_excel_sheets.py --benchmark -s
+"""
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app import utils
+
+pytestmark = pytest.mark.benchmark
+
+SHEETS = 8
+ROWS_PER_SHEET = 5_000
+WORKERS = [1, 2, 4]
+HEADER = ("Plan ID", "Class", "Age Min", "Age Max", "Family Min", "Family Max",
+          "Outpatient Coverage %", "Inpatient USD", "Outpatient Price USD", "Total USD")
+
+
+@pytest.fixture(scope="module")
+def workbook_bytes():
+    workbook = Workbook(write_only=True)
+    for sheet_number in range(SHEETS):
+        sheet = workbook.create_sheet(f"Plan {sheet_number + 1}")
+        sheet.append(HEADER)
+        for i in range(ROWS_PER_SHEET):
+            age = i % 100
+            sheet.append((sheet_number + 1, "ABCDE"[i % 5], age, age + 9, 1, 1 + i % 10,
+                          0.8, 1000.0 + age, 400.0, 1400.0 + age))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def read_all(workbook_bytes):
+    return list(utils.iter_excel_sheet_rows(UploadFile(file=io.BytesIO(workbook_bytes), filename="tariffs.xlsx")))
+
+
+def test_multi_sheet_read_time_by_workers(monkeypatch, workbook_bytes):
+    print(f"\n{SHEETS} sheets x {ROWS_PER_SHEET} rows, {os.cpu_count()} CPU(s)")
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>9}")
+    expected = None
+    for workers in WORKERS:
+        monkeypatch.setattr(utils, "EXCEL_SHEET_WORKERS", workers)
+        monkeypatch.setattr(utils, "_sheet_executor", None)
+        if workers > 1:
+            # Spawned workers start up (and import the app) on first use
+            list(utils._get_sheet_executor().map(abs, range(workers)))
+        try:
+            started = time.perf_counter()
+            rows = read_all(workbook_bytes)
+            elapsed = time.perf_counter() - started
+        finally:
+            if utils._sheet_executor is not None:
+                utils._sheet_executor.shutdown()
+
+        assert len(rows) == SHEETS * ROWS_PER_SHEET
+        if expected is None:
+            expected = rows
+        assert rows == expected
+        print(f"{workers:>8} {elapsed:>9.2f} {len(rows) / elapsed:>9.0f}")
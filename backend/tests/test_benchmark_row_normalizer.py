@@ -0,0 +1,116 @@
+"""
+Rows per second of tariff row normalization: utils.RowNormalizer with the
+tariff spec against the per-row code the upload ran before (every header
+normalized and the converter closures defined again for each row), on CSV
+rows (strings) and Excel rows (typed values).
+
+    python -m pytest tests/test_benchmark_row_normalizer.py --benchmark -s
+"""
+import time
+
+import pytest
+
+from app import tariff_import, utils
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = 100_000
+HEADER = ["Plan ID", "Class", "Age Min", "Age Max", "Family Type", "Family Min", "Family Max",
+          "Inpatient USD", "Total USD", "Outpatient Coverage Percentage", "Outpatient Price USD"]
+HEADER_ALIASES = {"Class": "Class Type"}
+
+
+def legacy_normalize(data):
+    """Tariff row conversion as the upload loop did it before RowNormalizer"""
+    normalized_data = {}
+    for key, value in data.items():
+        normalized_key = str(key).strip().lower().replace(' ', '_').replace('-', '_')
+        if normalized_key == 'plan_id':
+            normalized_key = 'policy_id'
+        normalized_data[normalized_key] = value
+
+    def safe_int(value, default=None):
+        if value is None or value == '':
+            return default
+        try:
+            if isinstance(value, (int, float)):
+                return int(value)
+            return int(float(str(value).strip()))
+        except (ValueError, TypeError, AttributeError):
+            return default
+
+    if 'policy_id' in normalized_data:
+        normalized_data['policy_id'] = safe_int(normalized_data.get('policy_id'))
+    if 'age_min' in normalized_data:
+        normalized_data['age_min'] = safe_int(normalized_data.get('age_min'))
+    if 'age_max' in normalized_data:
+        normalized_data['age_max'] = safe_int(normalized_data.get('age_max'))
+    if 'family_min' in normalized_data:
+        normalized_data['family_min'] = safe_int(normalized_data.get('family_min'), 1)
+    if 'family_max' in normalized_data:
+        normalized_data['family_max'] = safe_int(normalized_data.get('family_max'), 1)
+
+    def safe_float(value):
+        if value is None or value == '':
+            return None
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return None
+
+    def safe_percentage(value):
+        if value is None or value == '':
+            return None
+        try:
+            percentage = float(value)
+            if percentage > 1:
+                return percentage / 100.0
+            return percentage
+        except (ValueError, TypeError):
+            return None
+
+    return {
+        'policy_id': normalized_data.get('policy_id'),
+        'age_min': normalized_data.get('age_min'),
+        'age_max': normalized_data.get('age_max'),
+        'class_type': str(normalized_data.get('class_type', '')).strip(),
+        'family_type': str(normalized_data.get('family_type', '')).strip() if normalized_data.get('family_type') else None,
+        'family_min': normalized_data.get('family_min', 1),
+        'family_max': normalized_data.get('family_max', 1),
+        'inpatient_usd': safe_float(normalized_data.get('inpatient_usd')),
+        'total_usd': safe_float(normalized_data.get('total_usd')),
+        'outpatient_coverage_percentage': safe_percentage(normalized_data.get('outpatient_coverage_percentage')),
+        'outpatient_price_usd': safe_float(normalized_data.get('outpatient_price_usd')),
+    }
+
+
+def excel_rows():
+    header = [HEADER_ALIASES.get(column, column) for column in HEADER]
+    for i in range(ROWS):
+        age = i % 100
+        yield dict(zip(header, (1 + i % 50, " ABCDE"[1 + i % 5], age, age + 9, "family" if i % 2 else None,
+                                1, 1 + i % 10, 1000.0 + age, 1400.0 + age, 80 if i % 3 else None, 400.0)))
+
+
+def csv_rows():
+    for row in excel_rows():
+        yield {column: "" if value is None else str(value) for column, value in row.items()}
+
+
+def rows_per_second(normalize, rows):
+    started = time.perf_counter()
+    results = [normalize(row) for row in rows]
+    return len(rows) / (time.perf_counter() - started), results
+
+
+@pytest.mark.parametrize("source", [csv_rows, excel_rows], ids=["csv", "excel"])
+def test_row_normalizer_throughput(source):
+    rows = list(source())
+    legacy_rate, expected = rows_per_second(legacy_normalize, rows)
+    normalizer = utils.RowNormalizer(tariff_import.TARIFF_ROW_SPEC, tariff_import.TARIFF_COLUMN_ALIASES)
+    rate, results = rows_per_second(normalizer, rows)
+
+    assert results == expected
+    print(f"\n{source.__name__[:-5]}, {ROWS} rows")
+    print(f"{'per-row closures':>18}: {legacy_rate:>9.0f} rows/s")
+    print(f"{'RowNormalizer':>18}: {rate:>9.0f} rows/s ({rate / legacy_rate:.1f}x)")
@@ -0,0 +1,64 @@
+"""
+Objects per second of the compiled serializers (serializers.compile_serializer)
+against schema.from_orm(obj).dict(), which the handlers ran before, on
+loaded ORM objects: 10,000 tariffs (flat) and 1,000 plans with their provider
+and insurance type (nested). Best of three runs each.
+
+    python -m pytest tests/test_benchmark_serializers.py --benchmark -s
+"""
+import itertools
+import time
+
+import pytest
+
+from app import models, schemas, serializers
+
+pytestmark = pytest.mark.benchmark
+
+TARIFFS = 10_000
+PLANS = 1_000
+RUNS = 3
+
+
+@pytest.fixture
+def objects(db, catalog):
+    first = db.get(models.InsurancePlan, catalog[0])
+    db.add_all([
+        models.InsurancePlan(name=f"Plan {i}", provider_id=first.provider_id, type_id=first.type_id,
+                             status=models.PolicyStatus.active, description="Benchmark plan")
+        for i in range(PLANS)
+    ])
+    # 5 classes x 100 ages x 10 family sizes x with and without outpatient cover
+    keys = itertools.product("ABCDE", range(100), range(1, 11), [None, 0.8])
+    db.execute(models.Tariff.__table__.insert(), [
+        {"policy_id": catalog[0], "class_type": class_type, "age_min": age, "age_max": age + 9,
+         "family_min": 1, "family_max": family_max, "outpatient_coverage_percentage": outpatient,
+         "inpatient_usd": 1000 + age, "total_usd": 1400 + age, "outpatient_price_usd": 400 if outpatient else None}
+        for class_type, age, family_max, outpatient in itertools.islice(keys, TARIFFS)
+    ])
+    db.commit()
+    return {
+        "tariffs": (db.query(models.Tariff).all(), schemas.TariffOut, serializers.serialize_tariff),
+        "plans (nested)": (db.query(models.InsurancePlan).options(*serializers.plan_detail_options()).all(),
+                           schemas.InsurancePlanDetailOut, serializers.serialize_plan_detail),
+    }
+
+
+def best_rate(serialize, items):
+    best = None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        results = [serialize(item) for item in items]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best, results
+
+
+def test_compiled_serializer_throughput(objects):
+    print(f"\n{'':>16} {'from_orm (obj/s)':>17} {'compiled (obj/s)':>17}")
+    for label, (items, schema, serialize) in objects.items():
+        from_orm_rate, expected = best_rate(lambda item: schema.from_orm(item).dict(), items)
+        compiled_rate, results = best_rate(serialize, items)
+        assert results == expected
+        print(f"{label:>16} {from_orm_rate:>17.0f} {compiled_rate:>17.0f} ({compiled_rate / from_orm_rate:.1f}x)")
+        assert compiled_rate > from_orm_rate
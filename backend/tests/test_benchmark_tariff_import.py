@@ -0,0 +1,95 @@
+"""
+100k-row tariff upload: the set-based upsert (tariff_import.write_tariffs,
+one INSERT ... ON CONFLICT DO UPDATE per chunk) against the ORM loop the
+upload used before (every tariff loaded into a dict, one object per row,
+a commit every 500 rows). Each side imports the rows into an empty table,
+then imports them again with 10% of the prices changed.
+
+    python -m pytest tests/test_benchmark_tariff_import.py --benchmark -s
+"""
+import itertools
+import time
+
+import pytest
+
+from app import models, tariff_import
+from app.utils import iter_chunks
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = 100_000
+BATCH_SIZE = 500
+OUTPATIENT = [None, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 1.0]
+KEY_FIELDS = ['policy_id', 'age_min', 'age_max', 'class_type', 'family_min', 'family_max',
+              'outpatient_coverage_percentage']
+
+
+def upload_rows(policy_id, changed_every=0):
+    """ROWS distinct upload keys; every changed_every-th row gets a new price"""
+    keys = itertools.product(range(100), "ABCDEFGHIJ", range(1, 11), OUTPATIENT)
+    rows = []
+    for i, (age_min, class_type, family_min, outpatient) in enumerate(itertools.islice(keys, ROWS)):
+        total = 1000 + age_min + (1 if changed_every and i % changed_every == 0 else 0)
+        rows.append({
+            'policy_id': policy_id, 'age_min': age_min, 'age_max': age_min, 'class_type': class_type,
+            'family_type': None, 'family_min': family_min, 'family_max': family_min,
+            'inpatient_usd': 1000.0, 'total_usd': float(total),
+            'outpatient_coverage_percentage': outpatient,
+            'outpatient_price_usd': float(total - 1000) if outpatient is not None else None,
+        })
+    return rows
+
+
+def orm_import(db, rows):
+    existing = {tuple(getattr(tariff, field) for field in KEY_FIELDS): tariff for tariff in db.query(models.Tariff)}
+    for i, row in enumerate(rows, 1):
+        key = tuple(row[field] for field in KEY_FIELDS)
+        tariff = existing.get(key)
+        if tariff is not None:
+            for field in tariff_import.TARIFF_UPDATE_COLUMNS:
+                setattr(tariff, field, row[field])
+        else:
+            existing[key] = tariff = models.Tariff(**row)
+            db.add(tariff)
+        if i % BATCH_SIZE == 0:
+            db.commit()
+    db.commit()
+
+
+def set_based_import(db, rows):
+    counts = [0, 0, 0]
+    for chunk in iter_chunks(iter(rows), BATCH_SIZE):
+        for i, count in enumerate(tariff_import.write_tariffs(db, chunk)):
+            counts[i] += count
+        db.commit()
+    return tuple(counts)
+
+
+def timed(step, *args):
+    started = time.perf_counter()
+    result = step(*args)
+    return time.perf_counter() - started, result
+
+
+def test_tariff_upsert_throughput(db, catalog):
+    policy_id = catalog[2]
+    first, second = upload_rows(policy_id), upload_rows(policy_id, changed_every=10)
+    db.query(models.Tariff).delete()
+    db.commit()
+
+    print(f"\n{ROWS} tariff rows, chunks of {BATCH_SIZE}")
+    print(f"{'':>32} {'new table':>12} {'10% changed':>12}")
+
+    orm_first, _ = timed(orm_import, db, first)
+    orm_second, _ = timed(orm_import, db, second)
+    db.expunge_all()
+    assert db.query(models.Tariff).count() == ROWS
+    print(f"{'ORM loop (rows/s)':>32} {ROWS / orm_first:>12.0f} {ROWS / orm_second:>12.0f}")
+
+    db.query(models.Tariff).delete()
+    db.commit()
+    upsert_first, created = timed(set_based_import, db, first)
+    upsert_second, changed = timed(set_based_import, db, second)
+    assert created == (ROWS, 0, 0)
+    assert changed == (0, ROWS // 10, ROWS - ROWS // 10)
+    print(f"{'INSERT ... ON CONFLICT (rows/s)':>32} {ROWS / upsert_first:>12.0f} {ROWS / upsert_second:>12.0f}")
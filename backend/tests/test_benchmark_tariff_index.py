@@ -0,0 +1,101 @@
+"""
+Quote latency on a synthetic catalog of 200 plans x 5,000 tariffs: the
+original scan path (one tariff query per plan, filtered in Python), the SQL
+engine, and the in-memory indexes (TariffIndex and the NumPy
+VectorTariffIndex), with their build times.
+
+    python -m pytest tests/test_benchmark_tariff_index.py --benchmark -s
+"""
+import itertools
+import time
+
+import pytest
+
+from app import matching, models, schemas
+from app.tariff_index import get_tariff_index, invalidate_tariff_index
+from app.vector_index import VectorTariffIndex
+
+pytestmark = pytest.mark.benchmark
+
+PLANS = 200
+# 5 classes x 10 age bands x 10 family ranges x 10 outpatient options
+CLASSES = "ABCDE"
+AGE_BANDS = [(age, age + 9) for age in range(0, 100, 10)]
+FAMILY_RANGES = [(1, 1), (1, 2), (1, 4), (2, 4), (2, 6), (3, 6), (1, 8), (4, 8), (5, 10), (1, 10)]
+OUTPATIENT = [None, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 1.0]
+TARIFFS_PER_PLAN = len(CLASSES) * len(AGE_BANDS) * len(FAMILY_RANGES) * len(OUTPATIENT)
+
+QUOTES = [
+    schemas.PolicyMatchCriteria(insurance_class="A", insurance_type="individual", primary_age=34),
+    schemas.PolicyMatchCriteria(insurance_class="c", insurance_type="family", primary_age=41,
+                                family_size=4, family_ages=[40, 12, 9]),
+    schemas.PolicyMatchCriteria(insurance_class="E", insurance_type="family", primary_age=27,
+                                family_size=2, family_ages=[25]),
+    schemas.PolicyMatchCriteria(insurance_class="B", insurance_type="family", primary_age=30,
+                                family_size=3, family_ages=[5, 70]),  # no band covers 5-70
+]
+
+
+@pytest.fixture
+def large_catalog(db):
+    provider = models.Provider(name="Benchmark Assurance")
+    insurance_type = models.InsuranceType(name="Health")
+    db.add_all([provider, insurance_type])
+    db.flush()
+    plans = [
+        models.InsurancePlan(name=f"Plan {i}", provider_id=provider.provider_id, type_id=insurance_type.type_id,
+                             status=models.PolicyStatus.active)
+        for i in range(PLANS)
+    ]
+    db.add_all(plans)
+    db.commit()
+
+    tariffs = models.Tariff.__table__
+    for plan in plans:
+        db.execute(tariffs.insert(), [
+            {
+                "policy_id": plan.policy_id, "class_type": class_type, "age_min": age_min, "age_max": age_max,
+                "family_min": family_min, "family_max": family_max, "outpatient_coverage_percentage": outpatient,
+                "inpatient_usd": 1000 + age_min, "total_usd": 1000 + age_min + (outpatient or 0) * 500,
+                "outpatient_price_usd": outpatient * 500 if outpatient is not None else None,
+            }
+            for class_type, (age_min, age_max), (family_min, family_max), outpatient
+            in itertools.product(CLASSES, AGE_BANDS, FAMILY_RANGES, OUTPATIENT)
+        ])
+    db.commit()
+
+
+def per_quote_ms(engine, quotes, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [engine(criteria) for criteria in quotes]
+    return (time.perf_counter() - started) * 1000 / (repeat * len(quotes)), results
+
+
+def quotes(results):
+    return [[matched.dict() for matched in result] for result in results]
+
+
+def test_quote_latency_by_engine(db, large_catalog):
+    print(f"\n{PLANS} plans x {TARIFFS_PER_PLAN} tariffs, {len(QUOTES)} quotes")
+
+    scan_ms, expected = per_quote_ms(lambda criteria: matching.match_policies_scan(db, criteria), QUOTES)
+    assert any(expected) and not all(expected)
+    print(f"{'scan (one query per plan)':>28}: {scan_ms:10.2f} ms/quote")
+
+    sql_ms, results = per_quote_ms(lambda criteria: matching.match_policies_sql(db, criteria), QUOTES)
+    assert quotes(results) == quotes(expected)
+    print(f"{'sql (one statement)':>28}: {sql_ms:10.2f} ms/quote")
+
+    for index_class in (matching.quote_index_class(), VectorTariffIndex):
+        invalidate_tariff_index()
+        db.expunge_all()
+        started = time.perf_counter()
+        index = get_tariff_index(db, index_class)
+        build_s = time.perf_counter() - started
+
+        index_ms, results = per_quote_ms(index.match, QUOTES, repeat=20)
+        assert quotes(results) == quotes(expected)
+        print(f"{index_class.__name__:>28}: {index_ms:10.2f} ms/quote (built in {build_s:.1f} s, "
+              f"{scan_ms / index_ms:.0f}x faster than scan)")
+        assert index_ms < scan_ms
@@ -0,0 +1,106 @@
+"""
+Memory of the streaming upload readers (iter_csv_rows, iter_json_rows,
+iter_excel_rows) across input sizes: peak Python allocations (tracemalloc)
+while every row is read and dropped, next to the peak when the rows are
+kept in a list, as the readers did before they streamed. The streaming peak
+should stay flat as the file grows. openpyxl is the exception: its sheet
+parser clears each <row> element it has read but leaves it attached to
+<sheetData> until the sheet ends, about 90 bytes per row, still a small
+fraction of what keeping the rows costs.
+
+    python -m pytest tests/test_benchmark_upload_readers.py --benchmark -s
+"""
+import csv
+import io
+import json
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app import utils
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [10_000, 40_000, 160_000]
+HEADER = ["Plan ID", "Class", "Age Min", "Age Max", "Family Min", "Family Max",
+          "Outpatient Coverage %", "Inpatient USD", "Outpatient Price USD", "Total USD"]
+
+
+def tariff_rows(count):
+    for i in range(count):
+        age = i % 100
+        yield [1 + i % 50, "ABCDE"[i % 5], age, age + 9, 1, 1 + i % 10, 0.8, 1000.0 + age, 400.0, 1400.0 + age]
+
+
+def write_csv(handle, count):
+    text = io.TextIOWrapper(handle, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(HEADER)
+    writer.writerows(tariff_rows(count))
+    text.detach()
+
+
+def write_json(handle, count):
+    text = io.TextIOWrapper(handle, encoding="utf-8")
+    text.write("[")
+    for i, row in enumerate(tariff_rows(count)):
+        text.write(("," if i else "") + json.dumps(dict(zip(HEADER, row))))
+    text.write("]")
+    text.detach()
+
+
+def write_excel(handle, count):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Tariffs")
+    sheet.append(HEADER)
+    for row in tariff_rows(count):
+        sheet.append(row)
+    workbook.save(handle)
+
+
+# (extension, writer, reader, bytes per row the reader may keep until the end)
+READERS = [
+    ("csv", write_csv, utils.iter_csv_rows, 0),
+    ("json", write_json, utils.iter_json_rows, 0),
+    ("xlsx", write_excel, utils.iter_excel_rows, 128),
+]
+
+
+def peak_kib(read):
+    """Peak traced allocations while read() runs; the upload is on disk, so only the reader counts"""
+    tracemalloc.start()
+    try:
+        read()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def drain(rows):
+    count = 0
+    for _ in rows:
+        count += 1
+    return count
+
+
+@pytest.mark.parametrize("extension, write, reader, residue", READERS, ids=[reader[0] for reader in READERS])
+def test_streaming_reader_memory_is_flat(extension, write, reader, residue):
+    print(f"\n{reader.__name__}")
+    print(f"{'rows':>8} {'file KiB':>9} {'streamed KiB':>13} {'list KiB':>9}")
+    streamed = []
+    for size in SIZES:
+        with tempfile.TemporaryFile() as handle:
+            write(handle, size)
+            file_kib = handle.tell() / 1024
+            upload = UploadFile(file=handle, filename=f"tariffs.{extension}")
+            counts = []
+            streamed.append(peak_kib(lambda: counts.append(drain(reader(upload)))))
+            kept = peak_kib(lambda: counts.append(len(list(reader(upload)))))
+        assert counts == [size, size]
+        print(f"{size:>8} {file_kib:>9.0f} {streamed[-1]:>13.0f} {kept:>9.0f}")
+
+    # 16x the rows; allow for buffers and caches that fill up to a fixed size
+    assert streamed[-1] < 2 * streamed[0] + residue * SIZES[-1] / 1024
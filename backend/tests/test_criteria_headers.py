@@ -0,0 +1,114 @@
+import io
+
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+import create_criteria_template as template
+from app import utils
+
+SECTIONS = [
+    ("general_coverages", "In-Patient General", template.IN_PATIENT_GENERAL),
+    ("case_coverages", "In-Patient Case", template.IN_PATIENT_CASE),
+    ("out_patient", "Out-Patient", template.OUT_PATIENT),
+]
+
+
+def template_headers():
+    """Header row as written by create_criteria_template.py"""
+    headers = ["Policy ID"]
+    for _, label, fields in SECTIONS:
+        headers += [f"{label}: {field.replace('_', ' ').title()} - Notes" for field in fields]
+    return headers
+
+
+def read_sheet(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return utils.iter_excel_rows(UploadFile(file=io.BytesIO(buffer.getvalue()), filename="criteria.xlsx"))
+
+
+def coverages(payload):
+    return {
+        "general_coverages": payload["criteria_data"]["in_patient"]["general_coverages"],
+        "case_coverages": payload["criteria_data"]["in_patient"]["case_coverages"],
+        "out_patient": payload["outpatient_criteria_data"]["out_patient"],
+    }
+
+
+def test_template_columns_map_to_their_own_fields():
+    headers = template_headers()
+    # Each cell names its column, so the payload shows which column fed each field
+    rows = list(read_sheet([headers, [7] + [f" {header} " for header in headers[1:]]]))
+
+    ambiguities = []
+    [payload] = utils.parse_criteria_excel_to_json(rows, ambiguities)
+    assert ambiguities == []
+    assert payload["policy_id"] == 7
+    for section, label, fields in SECTIONS:
+        assert coverages(payload)[section] == {
+            field: {"notes": f"{label}: {field.replace('_', ' ').title()} - Notes"} for field in fields
+        }
+
+
+def test_headers_are_resolved_once_per_layout(monkeypatch):
+    headers = template_headers()
+    rows = list(read_sheet([headers] + [[i] + ["x"] * (len(headers) - 1) for i in range(1, 51)]))
+    rows.append({"policy_id": 99, "in_patient_general:_network___notes": "Wide"})
+
+    built = []
+    original = utils.CriteriaHeaderMap.__init__
+
+    def init(self, headers):
+        built.append(tuple(headers))
+        original(self, headers)
+
+    monkeypatch.setattr(utils.CriteriaHeaderMap, "__init__", init)
+    result = utils.parse_criteria_excel_to_json(rows)
+    assert len(result) == 51
+    assert len(built) == 2
+    assert coverages(result[-1])["general_coverages"]["network"] == {"notes": "Wide"}
+    assert coverages(result[-1])["general_coverages"]["annual_limit"] == {"notes": ""}
+
+
+def test_missing_values_and_rows_without_policy():
+    rows = [
+        {"policy_id": None, "in_patient_general:_annual_limit___notes": "skipped"},
+        {"policy_id": "3", "in_patient_general:_annual_limit___notes": None,
+         "in_patient_case:_icu___notes": 250000, "out_patient:_outpatient_deductible___notes": "  10%  "},
+        {"in_patient_general:_annual_limit___notes": "no policy column"},
+    ]
+    [payload] = utils.parse_criteria_excel_to_json(rows)
+    assert payload["policy_id"] == 3
+    assert coverages(payload)["general_coverages"]["annual_limit"] == {"notes": ""}
+    assert coverages(payload)["case_coverages"]["icu"] == {"notes": "250000"}
+    assert coverages(payload)["out_patient"]["outpatient_deductible"] == {"notes": "10%"}
+    assert coverages(payload)["out_patient"]["outpatient_network"] == {"notes": ""}
+
+
+def test_ambiguous_headers_are_reported():
+    headers = [
+        "policy_id",
+        "General: Annual Limit - Notes",
+        "General: Annual Limit (2025) - Notes",
+        "General: Network and Waiting Period - Notes",
+    ]
+    header_map = utils.CriteriaHeaderMap(headers)
+    assert header_map.ambiguities == [
+        "Field general_coverages.annual_limit matches columns General: Annual Limit - Notes, "
+        "General: Annual Limit (2025) - Notes; using General: Annual Limit - Notes",
+        "Column General: Network and Waiting Period - Notes is used for fields "
+        "general_coverages.network, general_coverages.waiting_period",
+    ]
+
+    row = dict(zip(headers, [1, "current", "old", "shared"]))
+    general = coverages(header_map.convert(row))["general_coverages"]
+    assert general["annual_limit"] == {"notes": "current"}
+    assert general["network"] == general["waiting_period"] == {"notes": "shared"}
+
+    # Reported once per layout, not once per row
+    ambiguities = []
+    utils.parse_criteria_excel_to_json([row, dict(row, policy_id=2)], ambiguities)
+    assert ambiguities == header_map.ambiguities
@@ -0,0 +1,80 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app import utils
+
+
+def workbook_upload(sheets):
+    """UploadFile of a workbook with one sheet per (title, rows) pair; rows start with the header"""
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename="tariffs.xlsx")
+
+
+SHEETS = [
+    ("Class A", [("Plan ID", "Age Min"), (1, 0), (1, 31)]),
+    ("Notes", []),
+    ("Class B", [("Plan ID", "Age Min"), (2, 18)]),
+    ("Class C", [("Plan ID", "Age Min"), (3, 25), (3, 40), (3, 60)]),
+]
+
+EXPECTED = [
+    ("Class A", 1, 1, 0), ("Class A", 2, 1, 31),
+    ("Class B", 1, 2, 18),
+    ("Class C", 1, 3, 25), ("Class C", 2, 3, 40), ("Class C", 3, 3, 60),
+]
+
+
+def tagged(rows):
+    return [(row[utils.EXCEL_SHEET_KEY], row[utils.EXCEL_SHEET_ROW_KEY], row["plan_id"], row["age_min"]) for row in rows]
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Runs sheets in threads and records which sheets were submitted"""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[1])
+        return super().submit(fn, *args)
+
+
+def test_single_worker_streams_sheets_in_order(monkeypatch):
+    monkeypatch.setattr(utils, "EXCEL_SHEET_WORKERS", 1)
+    assert tagged(utils.iter_excel_sheet_rows(workbook_upload(SHEETS))) == EXPECTED
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_read_a_bounded_number_of_sheets_ahead(monkeypatch, workers):
+    executor = RecordingExecutor()
+    monkeypatch.setattr(utils, "EXCEL_SHEET_WORKERS", workers)
+    monkeypatch.setattr(utils, "_get_sheet_executor", lambda: executor)
+
+    rows = utils.iter_excel_sheet_rows(workbook_upload(SHEETS))
+    first = next(rows)
+    # The first sheet is being imported: no sheets beyond the window were read
+    assert executor.submitted == [title for title, _ in SHEETS[:workers]]
+
+    assert tagged([first, *rows]) == EXPECTED
+    assert executor.submitted == [title for title, _ in SHEETS]
+    executor.shutdown()
+
+
+def test_row_estimate_covers_every_sheet_with_all_sheets():
+    upload = workbook_upload(SHEETS)
+    assert utils.estimate_upload_rows(upload) == 2
+    assert utils.estimate_upload_rows(upload, all_sheets=True) == len(EXPECTED)
+    assert upload.file.tell() == 0
@@ -0,0 +1,136 @@
+import itertools
+from decimal import Decimal
+
+import pytest
+
+from app import matching, metrics, models, schemas
+from app.cache import bump_catalog_version
+from app.tariff_index import get_tariff_index
+from app.vector_index import VectorTariffIndex
+
+# Every class (in both cases and one without tariffs), both quote types, ages
+# on and around the tariff boundaries, and family sizes/ages in and out of range
+CRITERIA = [
+    schemas.PolicyMatchCriteria(
+        insurance_class=insurance_class,
+        insurance_type=insurance_type,
+        primary_age=primary_age,
+        family_size=family_size,
+        family_ages=family_ages
+    )
+    for insurance_class, insurance_type, primary_age, family_size, family_ages in itertools.product(
+        ["A", "a", "B", "C", "D"],
+        ["individual", "family"],
+        [0, 25, 31, 45, 64, 70],
+        [None, 1, 3, 6],
+        [None, [], [20], [10, 50]]
+    )
+]
+
+
+def quotes(results):
+    return [matched.dict() for matched in results]
+
+
+@pytest.fixture
+def inactive_plan(db, catalog):
+    """An inactive plan whose tariffs would match: it must never be quoted"""
+    return add_inactive_plan(db, catalog)
+
+
+def add_inactive_plan(db, catalog):
+    active = db.get(models.InsurancePlan, catalog[0])
+    plan = models.InsurancePlan(name="Retired plan", provider_id=active.provider_id, type_id=active.type_id,
+                                status=models.PolicyStatus.inactive)
+    db.add(plan)
+    db.flush()
+    db.add(models.Tariff(policy_id=plan.policy_id, age_min=0, age_max=99, class_type="A", family_min=1,
+                         family_max=9, inpatient_usd=Decimal(1), total_usd=Decimal(1)))
+    db.commit()
+    return plan.policy_id
+
+
+def test_catalog_criteria_have_matches(db, catalog, inactive_plan):
+    matched = [quotes(matching.match_policies_scan(db, criteria)) for criteria in CRITERIA]
+    assert sum(1 for result in matched if result) > len(CRITERIA) // 4
+    assert all(m["policy"]["policy_id"] != inactive_plan for result in matched for m in result)
+
+
+def test_index_matches_scan(db, catalog, inactive_plan):
+    index = get_tariff_index(db)
+    for criteria in CRITERIA:
+        assert quotes(index.match(criteria)) == quotes(matching.match_policies_scan(db, criteria)), criteria
+
+
+def test_index_answers_without_queries(db, catalog, count_statements):
+    get_tariff_index(db)
+    with count_statements() as statements:
+        for criteria in CRITERIA:
+            get_tariff_index(db).match(criteria)
+    assert statements == []
+
+
+def test_index_is_rebuilt_after_a_catalog_write(db, catalog):
+    criteria = schemas.PolicyMatchCriteria(insurance_class="C", insurance_type="individual", primary_age=10)
+    assert quotes(get_tariff_index(db).match(criteria)) == []
+
+    db.add(models.Tariff(policy_id=catalog[1], age_min=0, age_max=17, class_type="C", family_min=1,
+                         family_max=1, inpatient_usd=Decimal(300), total_usd=Decimal(300)))
+    db.commit()
+    bump_catalog_version()
+
+    result = quotes(get_tariff_index(db).match(criteria))
+    assert [m["policy"]["policy_id"] for m in result] == [catalog[1]]
+    assert result == quotes(matching.match_policies_scan(db, criteria))
+
+
+def test_index_builds_are_reported_in_metrics(client, db, catalog, capsys):
+    builds = metrics.timing("tariff_index.build")["count"]
+    get_tariff_index(db)
+    get_tariff_index(db)
+    bump_catalog_version()
+    get_tariff_index(db)
+    assert metrics.timing("tariff_index.build")["count"] == builds + 2
+    assert capsys.readouterr().out == ""
+
+    report = client.get("/_metrics").json()["tariff_index"]
+    assert report["TariffIndex"]["plans"] == len(catalog)
+    assert report["TariffIndex"]["tariffs"] == db.query(models.Tariff).count()
+
+
+def test_sql_engine_matches_scan(db, catalog, inactive_plan):
+    for criteria in CRITERIA:
+        assert quotes(matching.match_policies_sql(db, criteria)) == quotes(matching.match_policies_scan(db, criteria)), criteria
+
+
+def test_sql_engine_matches_scan_on_postgres(postgres_db, postgres_catalog):
+    add_inactive_plan(postgres_db, postgres_catalog)
+    for criteria in CRITERIA:
+        assert quotes(matching.match_policies_sql(postgres_db, criteria)) == quotes(
+            matching.match_policies_scan(postgres_db, criteria)), criteria
+
+
+def test_sql_engine_runs_one_statement(db, catalog, count_statements):
+    criteria = schemas.PolicyMatchCriteria(insurance_class="a", insurance_type="family", primary_age=30,
+                                           family_size=2, family_ages=[28, 40])
+    with count_statements() as statements:
+        result = matching.match_policies_sql(db, criteria)
+    assert result
+    assert len(statements) == 1
+
+
+def test_numpy_index_matches_scan(db, catalog, inactive_plan):
+    index = get_tariff_index(db, VectorTariffIndex)
+    for criteria in CRITERIA:
+        assert quotes(index.match(criteria)) == quotes(matching.match_policies_scan(db, criteria)), criteria
+
+
+def test_numpy_index_with_many_family_ages(db, catalog):
+    index = get_tariff_index(db, VectorTariffIndex)
+    # Only the third plan's class A tariff (ages 25-60, families of 1-3) covers every age
+    for family_ages, expected in (([30] * 40, [catalog[2]]), (list(range(25, 61)), [catalog[2]]), (list(range(24, 61)), [])):
+        criteria = schemas.PolicyMatchCriteria(insurance_class="A", insurance_type="family", primary_age=40,
+                                               family_size=3, family_ages=family_ages)
+        result = quotes(index.match(criteria))
+        assert [m["policy"]["policy_id"] for m in result] == expected
+        assert result == quotes(matching.match_policies_scan(db, criteria))
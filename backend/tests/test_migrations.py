@@ -0,0 +1,99 @@
+import importlib.util
+import os
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+
+VERSIONS = os.path.join(os.path.dirname(__file__), os.pardir, "alembic", "versions")
+
+
+def load_migration(filename):
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(VERSIONS, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(connection, step):
+    with Operations.context(MigrationContext.configure(connection)):
+        step()
+
+
+def tariff_rows(connection):
+    return connection.execute(text(
+        "SELECT tariff_id, policy_id, age_min, class_type, outpatient_coverage_percentage, total_usd "
+        "FROM tariffs ORDER BY tariff_id"
+    )).all()
+
+
+@pytest.fixture
+def connection(tmp_path):
+    """tariffs as they were before the upload key was unique"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    models.Tariff.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX uq_tariffs_upload_key"))
+    with engine.begin() as connection:
+        yield connection
+    engine.dispose()
+
+
+def insert(connection, *tariffs):
+    for tariff_id, age_min, outpatient, total in tariffs:
+        connection.execute(text(
+            "INSERT INTO tariffs (tariff_id, policy_id, age_min, age_max, class_type, family_min, family_max, "
+            "outpatient_coverage_percentage, total_usd) VALUES (:id, 1, :age, :age + 9, 'A', 1, 1, :op, :total)"
+        ), {"id": tariff_id, "age": age_min, "op": outpatient, "total": total})
+
+
+def test_duplicate_tariffs_are_archived_not_deleted(connection, capsys):
+    migration = load_migration("2fbdee06764c_unique_tariff_upload_key.py")
+    insert(connection,
+           (1, 0, None, 100), (2, 0, None, 110), (3, 0, None, 120),  # three tariffs for one key
+           (4, 0, 0.8, 200), (5, 10, None, 300), (6, 10, None, 310))
+    before = tariff_rows(connection)
+
+    run(connection, migration.upgrade)
+
+    assert [row.tariff_id for row in tariff_rows(connection)] == [3, 4, 6]
+    archived = connection.execute(text(f"SELECT tariff_id, total_usd FROM {migration.ARCHIVE_TABLE} ORDER BY tariff_id")).all()
+    assert [(row.tariff_id, float(row.total_usd)) for row in archived] == [(1, 100), (2, 110), (5, 300)]
+    assert "Moved 3 duplicate tariffs" in capsys.readouterr().out
+    with pytest.raises(IntegrityError):
+        with connection.begin_nested():
+            insert(connection, (7, 0, None, 130))
+
+    run(connection, migration.downgrade)
+    assert tariff_rows(connection) == before
+    assert not inspect(connection).has_table(migration.ARCHIVE_TABLE)
+
+
+def test_no_archive_without_duplicates(connection, capsys):
+    migration = load_migration("2fbdee06764c_unique_tariff_upload_key.py")
+    insert(connection, (1, 0, None, 100), (2, 0, 0.8, 200))
+
+    run(connection, migration.upgrade)
+    assert len(tariff_rows(connection)) == 2
+    assert not inspect(connection).has_table(migration.ARCHIVE_TABLE)
+    assert capsys.readouterr().out == ""
+
+
+def index_sql(connection, name):
+    return connection.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": name}).scalar()
+
+
+def test_class_index_is_rebuilt_on_upper_class_type(connection):
+    migration = load_migration("f3b9d1c7a2e5_index_upper_tariff_class.py")
+    connection.execute(text("DROP INDEX ix_tariffs_policy_class_age"))
+    connection.execute(text("CREATE INDEX ix_tariffs_policy_class_age ON tariffs (policy_id, class_type, age_min, age_max)"))
+
+    run(connection, migration.upgrade)
+    assert "upper(class_type)" in index_sql(connection, "ix_tariffs_policy_class_age")
+
+    run(connection, migration.downgrade)
+    assert "upper" not in index_sql(connection, "ix_tariffs_policy_class_age")
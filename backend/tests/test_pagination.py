@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app import models, pagination
+
+# path, query parameters, item key
+LISTS = [
+    ("/admin/users", {}, "user_id"),
+    ("/admin/users", {"is_admin": "false"}, "user_id"),
+    ("/admin/policies", {}, "policy_id"),
+    ("/admin/claims", {}, "claim_id"),
+    ("/admin/claims", {"status": "approved"}, "claim_id"),
+    ("/admin/applications", {}, "user_policy_id"),
+    ("/admin/applications", {"status": "active"}, "user_policy_id"),
+]
+
+
+@pytest.fixture
+def claims(db, applications):
+    db.add_all([
+        models.Claim(user_policy_id=applications[i % len(applications)], claim_amount=Decimal(40 * (i + 1)),
+                     status=list(models.ClaimStatus)[i % 4], date_filed=date(2026, 2, 1) + timedelta(days=i))
+        for i in range(17)
+    ])
+    db.commit()
+
+
+def get(client, path, **params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def offset_keys(client, path, params, key):
+    keys, page = [], 1
+    while True:
+        body = get(client, path, page=page, page_size=4, **params)
+        keys += [item[key] for item in body["items"]]
+        if page >= body["total_pages"]:
+            return keys, body["total"]
+        page += 1
+
+
+def keyset_keys(client, path, params, key, page_size):
+    keys, cursor, pages = [], "", 0
+    while cursor is not None:
+        body = get(client, path, cursor=cursor, page_size=page_size, **params)
+        assert body["page"] is None and body["total"] is None
+        assert len(body["items"]) <= page_size
+        if body["next_cursor"] is not None:
+            assert len(body["items"]) == page_size
+        keys += [item[key] for item in body["items"]]
+        cursor = body["next_cursor"]
+        pages += 1
+    return keys, pages
+
+
+@pytest.mark.parametrize("path,params,key", LISTS)
+@pytest.mark.parametrize("page_size", [1, 3, 100])
+def test_keyset_pages_cover_every_row_once(client, claims, path, params, key, page_size):
+    expected, total = offset_keys(client, path, params, key)
+    assert total == len(expected) > 0
+
+    keys, pages = keyset_keys(client, path, params, key, page_size)
+    assert keys == sorted(set(expected))
+    assert pages == max(1, -(-total // page_size))
+
+    exact = get(client, path, cursor="", page_size=page_size, total="exact", **params)
+    assert (exact["total"], exact["total_is_estimate"]) == (total, False)
+    assert exact["total_pages"] == -(-total // page_size)
+
+
+def test_estimated_total_stops_at_the_cap(client, claims, monkeypatch):
+    total = get(client, "/admin/claims", page_size=5)["total"]
+    assert get(client, "/admin/claims", cursor="", page_size=5, total="estimate")["total"] == total
+
+    monkeypatch.setattr(pagination, "PAGINATION_COUNT_CAP", 10)
+    body = get(client, "/admin/claims", cursor="", page_size=5, total="estimate")
+    assert (body["total"], body["total_is_estimate"]) == (10, True)
+
+
+def test_unknown_total_mode_is_rejected(client, claims):
+    assert client.get("/admin/claims", params={"cursor": "", "total": "approximate"}).status_code == 422
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "e30", pagination.encode_cursor(3)[:-2], "bnVsbA"])
+def test_tampered_cursor_is_rejected(client, claims, cursor):
+    response = client.get("/admin/claims", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("key", [0, 7, 123456789, "2026-01-01T00:00:00", "P-0001"])
+def test_cursor_round_trip(key):
+    cursor = pagination.encode_cursor(key)
+    assert "=" not in cursor
+    assert pagination.decode_cursor(cursor) == key
+
+
+def test_empty_cursor_is_the_first_page():
+    assert pagination.decode_cursor("") is None
+    with pytest.raises(HTTPException):
+        pagination.decode_cursor("%%%")
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app import models
+from app.database import AsyncSessionLocal, get_async_engine
+from app.rollups import rebuild_rollups
+
+ROLLUPS = (models.PolicyDailyRollup, models.ClaimDailyRollup, models.UserDailyRollup)
+
+
+def rollup_rows(db):
+    """Rollup rows with non-zero measures, by table"""
+    snapshot = {}
+    for model in ROLLUPS:
+        columns = [column.name for column in model.__table__.columns]
+        measures = [column.name for column in model.__table__.columns if not column.primary_key]
+        rows = set()
+        for row in db.query(model):
+            values = {column: getattr(row, column) for column in columns}
+            if any(values[column] for column in measures):
+                rows.add(tuple(Decimal(value) if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+                               else value for value in values.values()))
+        snapshot[model.__tablename__] = rows
+    return snapshot
+
+
+def test_incremental_rollups_match_a_rebuild(db, catalog):
+    now = datetime(2026, 3, 10, 12, 0)
+    users = [
+        models.User(name=f"User {i}", email=f"user{i}@example.com", password_hash="x",
+                    created_at=now - timedelta(days=i % 3), is_active=bool(i % 2))
+        for i in range(6)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    user_policies = [
+        models.UserPolicy(user_id=users[i].user_id, policy_id=catalog[i % 3],
+                          status=list(models.UserPolicyStatus)[i % 3],
+                          premium_paid=Decimal(100 * (i + 1)) if i % 4 else None,
+                          issued_at=now - timedelta(days=i % 2, hours=i))
+        for i in range(6)
+    ]
+    db.add_all(user_policies)
+    db.flush()
+
+    claims = [
+        models.Claim(user_policy_id=user_policies[i % 6].user_policy_id, claim_amount=Decimal(25 * (i + 1)),
+                     status=list(models.ClaimStatus)[i % 4], date_filed=(now - timedelta(days=i % 4)).date())
+        for i in range(8)
+    ]
+    db.add_all(claims)
+    db.commit()
+
+    # Changes to tracked columns, a move to another plan and deletions
+    user_policies[0].status = models.UserPolicyStatus.expired
+    user_policies[1].premium_paid = None
+    user_policies[2].policy_id = catalog[0]
+    user_policies[3].issued_at = now - timedelta(days=5)
+    claims[0].claim_amount = Decimal("999.50")
+    claims[1].status = models.ClaimStatus.approved
+    claims[2].user_policy_id = user_policies[5].user_policy_id
+    users[0].is_active = not users[0].is_active
+    db.delete(claims[3])
+    db.delete(claims[4])
+    db.commit()
+
+    # Writers outside SessionLocal (here an async session) keep the rollups current too
+    async def add_user_policy():
+        async with AsyncSessionLocal(bind=get_async_engine()) as session:
+            session.add(models.UserPolicy(user_id=users[4].user_id, policy_id=catalog[1],
+                                          status=models.UserPolicyStatus.active,
+                                          premium_paid=Decimal("42.00"), issued_at=now))
+            await session.commit()
+
+    asyncio.run(add_user_policy())
+
+    db.expire_all()
+    incremental = rollup_rows(db)
+    assert all(incremental.values())
+
+    rebuild_rollups(db)
+    db.commit()
+    assert rollup_rows(db) == incremental
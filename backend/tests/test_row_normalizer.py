@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app import tariff_import, utils
+
+
+def normalizer():
+    return utils.RowNormalizer(tariff_import.TARIFF_ROW_SPEC, tariff_import.TARIFF_COLUMN_ALIASES)
+
+
+EXPECTED = {
+    'policy_id': 12,
+    'age_min': 18,
+    'age_max': 45,
+    'class_type': 'A',
+    'family_type': None,
+    'family_min': 1,
+    'family_max': 4,
+    'inpatient_usd': 1000.0,
+    'total_usd': 1250.5,
+    'outpatient_coverage_percentage': 0.85,
+    'outpatient_price_usd': None,
+}
+
+
+def test_aliases_headers_and_defaults():
+    row = {
+        ' Plan ID ': '12',
+        'Age-Min': '18',
+        'AGE_MAX': 45.0,
+        'Class Type': ' A ',
+        'Family Max': '4',
+        'Inpatient USD': '1000',
+        'total_usd': 1250.5,
+        'Outpatient Coverage Percentage': 85,
+        'Notes': 'dropped',
+    }
+    assert normalizer()(row) == EXPECTED
+
+
+def test_later_column_wins():
+    assert normalizer()({'plan_id': 1, 'policy_id': 2})['policy_id'] == 2
+    assert normalizer()({'policy_id': 2, 'plan_id': 1})['policy_id'] == 1
+
+
+def test_columns_are_resolved_once_per_layout(monkeypatch):
+    normalize = normalizer()
+    resolved = []
+    monkeypatch.setattr(utils, "normalize_header", lambda key: resolved.append(key) or str(key).strip().lower())
+    for i in range(100):
+        normalize({'policy_id': i, 'age_min': i})
+    normalize({'policy_id': 1})
+    assert resolved == ['policy_id', 'age_min', 'policy_id']
+
+
+@pytest.mark.parametrize("field,value,expected", [
+    ('age_min', '', None),
+    ('age_min', ' 30 ', 30),
+    ('age_min', '30.9', 30),
+    ('age_min', 'thirty', None),
+    ('family_min', None, 1),
+    ('family_min', 'x', 1),
+    ('family_max', 6.0, 6),
+    ('total_usd', '99.95', 99.95),
+    ('total_usd', 'n/a', None),
+    ('outpatient_coverage_percentage', 100, 1.0),
+    ('outpatient_coverage_percentage', '0.5', 0.5),
+    ('outpatient_coverage_percentage', 1, 1.0),
+    ('outpatient_coverage_percentage', '', None),
+    ('class_type', '', None),
+    ('class_type', 0, None),
+    ('family_type', ' Family ', 'Family'),
+])
+def test_converters(field, value, expected):
+    assert normalizer()({field: value})[field] == expected
+
+
+def test_csv_json_and_excel_rows_normalize_alike():
+    headers = ['Plan ID', 'Age Min', 'Age Max', 'Class Type', 'Family Max', 'Inpatient USD', 'Total USD',
+               'Outpatient Coverage Percentage']
+    values = [12, 18, 45, 'A', 4, 1000, 1250.5, 85]
+
+    csv_file = UploadFile(file=io.BytesIO((",".join(headers) + "\n" + ",".join(map(str, values)) + "\n").encode()),
+                          filename="tariffs.csv")
+    json_file = UploadFile(file=io.BytesIO(json.dumps([dict(zip(headers, values))]).encode()), filename="tariffs.json")
+    workbook = Workbook()
+    workbook.active.append(headers)
+    workbook.active.append(values)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    excel_file = UploadFile(file=io.BytesIO(buffer.getvalue()), filename="tariffs.xlsx")
+
+    normalize = normalizer()
+    for rows in (utils.iter_csv_rows(csv_file), utils.iter_json_rows(json_file), utils.iter_excel_rows(excel_file)):
+        assert [normalize(row) for row in rows] == [EXPECTED]
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from app import models, schemas, serializers
+
+
+def as_json(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+def test_plan_serializer_matches_from_orm(db, catalog):
+    plans = db.query(models.InsurancePlan).options(*serializers.plan_detail_options()).all()
+    assert plans
+    for plan in plans:
+        assert serializers.serialize_plan_detail(plan) == schemas.InsurancePlanDetailOut.from_orm(plan).dict()
+
+
+def test_tariff_serializers_match_from_orm(db, catalog):
+    tariffs = db.query(models.Tariff).all()
+    for tariff in tariffs:
+        assert serializers.serialize_tariff(tariff) == schemas.TariffOut.from_orm(tariff).dict()
+        if tariff.outpatient_coverage_percentage is not None:
+            assert serializers.serialize_outpatient_option(tariff) == schemas.OutpatientOption.from_orm(tariff).dict()
+
+
+def test_application_serializer_matches_from_orm(db, applications):
+    user_policies = db.query(models.UserPolicy).options(*serializers.user_policy_detail_options()).all()
+    assert any(user_policy.version is not None for user_policy in user_policies)
+    for user_policy in user_policies:
+        expected = schemas.UserPolicyDetailOut.from_orm(user_policy).dict()
+        expected["user"] = schemas.UserOut.from_orm(user_policy.user).dict()
+        assert as_json(serializers.serialize_application(user_policy)) == as_json(expected)
+
+
+# Objects each compiled serializer is checked against, by schema
+SAMPLES = {
+    schemas.ProviderOut: lambda db: db.query(models.Provider).all(),
+    schemas.InsuranceTypeOut: lambda db: db.query(models.InsuranceType).all(),
+    schemas.InsurancePlanDetailOut: lambda db: db.query(models.InsurancePlan).options(
+        *serializers.plan_detail_options()).all(),
+    schemas.UserOut: lambda db: db.query(models.User).all(),
+    schemas.PolicyDocumentVersionOut: lambda db: db.query(models.PolicyDocumentVersion).all(),
+    schemas.UserPolicyDetailOut: lambda db: db.query(models.UserPolicy).options(
+        *serializers.user_policy_detail_options()).all(),
+    schemas.TariffOut: lambda db: db.query(models.Tariff).all(),
+    schemas.OutpatientOption: lambda db: db.query(models.Tariff).filter(
+        models.Tariff.outpatient_coverage_percentage.isnot(None)).all(),
+}
+
+
+def compiled_serializers():
+    return [value for value in vars(serializers).values() if callable(value) and hasattr(value, "schema")]
+
+
+def test_every_compiled_serializer_matches_from_orm(db, applications):
+    compiled = compiled_serializers()
+    assert {serialize.schema for serialize in compiled} == set(SAMPLES)
+    for serialize in compiled:
+        objects = SAMPLES[serialize.schema](db)
+        assert objects, serialize.__name__
+        for obj in objects:
+            assert serialize(obj) == serialize.schema.from_orm(obj).dict(), serialize.__name__
+
+
+@pytest.fixture
+def many_plans(db, catalog):
+    first = db.get(models.InsurancePlan, catalog[0])
+    providers = [models.Provider(name=f"Provider {i}") for i in range(6)]
+    db.add_all(providers)
+    db.flush()
+    db.add_all([
+        models.InsurancePlan(name=f"Extra plan {i}", provider_id=providers[i % 6].provider_id,
+                             type_id=first.type_id, status=models.PolicyStatus.active)
+        for i in range(30)
+    ])
+    db.commit()
+
+
+# Offset pages count then select; keyset pages without a total only select
+@pytest.mark.parametrize("path, expected", [
+    ("/admin/policies?page_size={size}", 2),
+    ("/admin/policies?page_size={size}&cursor=", 1),
+])
+def test_plan_listing_statement_count_does_not_grow_with_page_size(client, many_plans, count_statements, path, expected):
+    for size in (2, 30):
+        with count_statements() as statements:
+            response = client.get(path.format(size=size))
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == size
+        assert len(statements) == expected, statements
+
+
+def test_plan_detail_loads_relationships_in_one_statement(client, catalog, count_statements):
+    with count_statements() as statements:
+        response = client.get(f"/admin/policies/{catalog[1]}")
+    assert response.status_code == 200
+    assert response.json()["provider"]["name"] == "Beta Health"
+    assert len(statements) == 1
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from app import models, tariff_import
+
+
+def tariff_row(policy_id, age_min, class_type="A", outpatient=None, total=100.0, **values):
+    row = {
+        'policy_id': policy_id,
+        'age_min': age_min,
+        'age_max': age_min + 9,
+        'class_type': class_type,
+        'family_type': None,
+        'family_min': 1,
+        'family_max': 1,
+        'inpatient_usd': total,
+        'total_usd': total,
+        'outpatient_coverage_percentage': outpatient,
+        'outpatient_price_usd': None,
+    }
+    row.update(values)
+    return row
+
+
+def diff_counts(db, rows):
+    actions = [action for action, _, _ in tariff_import.diff_tariffs(db, rows)]
+    return actions.count("create"), actions.count("update"), actions.count("unchanged")
+
+
+def write(db, rows):
+    """Write rows, checking the dry-run diff predicted the same outcome"""
+    expected = diff_counts(db, rows)
+    counts = tariff_import.write_tariffs(db, rows)
+    db.commit()
+    assert counts == expected
+    return counts
+
+
+def stored(db, policy_id):
+    return {
+        (t.age_min, t.class_type, t.outpatient_coverage_percentage): (t.total_usd, t.family_type)
+        for t in db.query(models.Tariff).filter(models.Tariff.policy_id == policy_id)
+    }
+
+
+def test_upsert_reports_created_updated_and_unchanged(db, catalog):
+    policy_id = catalog[2]
+    before = db.query(models.Tariff).count()
+    rows = [tariff_row(policy_id, age, outpatient=outpatient) for age in range(0, 100, 10) for outpatient in (None, 0.8)]
+
+    assert write(db, rows) == (20, 0, 0)
+    assert db.query(models.Tariff).count() == before + 20
+
+    assert write(db, rows) == (0, 0, 20)
+
+    changed = [dict(row, total_usd=250.0) if row['age_min'] < 30 else row for row in rows]
+    changed[-1] = dict(changed[-1], family_type="Single")
+    assert write(db, changed) == (0, 7, 13)
+    assert db.query(models.Tariff).count() == before + 20
+
+    tariffs = stored(db, policy_id)
+    assert tariffs[(0, "A", None)] == (Decimal("250.00"), None)
+    assert tariffs[(90, "A", 0.8)] == (Decimal("100.00"), "Single")
+    assert tariffs[(50, "A", None)] == (Decimal("100.00"), None)
+
+
+def test_rows_without_outpatient_coverage_conflict_with_each_other(db, catalog):
+    policy_id = catalog[2]
+    assert write(db, [tariff_row(policy_id, 0)]) == (1, 0, 0)
+    assert write(db, [tariff_row(policy_id, 0, total=120.0)]) == (0, 1, 0)
+    assert write(db, [tariff_row(policy_id, 0, outpatient=0.0)]) == (1, 0, 0)
+    assert stored(db, policy_id)[(0, "A", None)] == (Decimal("120.00"), None)
+
+
+def test_mixed_chunk(db, catalog):
+    policy_id = catalog[1]
+    write(db, [tariff_row(policy_id, 0), tariff_row(policy_id, 10), tariff_row(policy_id, 20)])
+    rows = [
+        tariff_row(policy_id, 0),
+        tariff_row(policy_id, 10, total=99.99),
+        tariff_row(policy_id, 30),
+        tariff_row(policy_id, 0, class_type="B"),
+    ]
+    assert write(db, rows) == (2, 1, 1)
+
+
+def test_upload_counts_come_from_the_database(client, db, catalog):
+    csv_rows = ["policy_id,age_min,age_max,class_type,family_min,family_max,inpatient_usd,total_usd,outpatient_coverage_percentage"]
+    csv_rows += [f"{catalog[2]},{age},{age + 4},A,1,2,{100 + age},{100 + age},{'85' if age % 10 else ''}" for age in range(0, 100, 5)]
+    # The first row repeats the key of an existing catalog tariff (plan 3, ages 25-60, class C) with new prices
+    csv_rows.insert(1, f"{catalog[2]},25,60,C,1,3,450,450,")
+    data = ("\n".join(csv_rows) + "\n").encode()
+
+    def upload(content):
+        response = client.post("/admin/upload/tariffs", files={"file": ("tariffs.csv", content)}, params={"force": "true"})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    first = upload(data)
+    assert (first["records_created"], first["records_updated"], first["records_unchanged"]) == (20, 1, 0)
+    again = upload(data)
+    assert (again["records_created"], again["records_updated"], again["records_unchanged"]) == (0, 0, 21)
@@ -0,0 +1,103 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from app import matching, schemas, tariff_import
+from app.database import engine
+
+# Both tariff indexes start with policy_id and serve per-policy reads
+TARIFF_INDEXES = ("ix_tariffs_policy_class_age", "uq_tariffs_upload_key")
+
+QUOTE = schemas.PolicyMatchCriteria(insurance_class="A", insurance_type="family", primary_age=30,
+                                    family_size=1, family_ages=[])
+
+
+@contextmanager
+def tariff_queries(bind=engine):
+    """(statement, parameters) of every statement that reads the tariffs table"""
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "tariffs" in statement and not statement.lstrip().upper().startswith("EXPLAIN"):
+            queries.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def query_plan(db, statement, parameters) -> str:
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return " | ".join(row[-1] for row in rows)
+
+
+def assert_tariffs_use(db, queries, *index_names):
+    """Every query searches tariffs through one of the indexes"""
+    assert queries
+    for statement, parameters in queries:
+        plan = query_plan(db, statement, parameters)
+        used = re.findall(r"SEARCH tariffs USING (?:COVERING )?INDEX (\w+)", plan)
+        assert used and set(used) <= set(index_names), f"{statement}\n-> {plan}"
+        assert "SCAN tariffs" not in plan, f"{statement}\n-> {plan}"
+
+
+def test_scan_engine_reads_tariffs_by_index(db, catalog):
+    with tariff_queries() as queries:
+        matching.match_policies_scan(db, QUOTE)
+    assert_tariffs_use(db, queries, *TARIFF_INDEXES)
+
+
+def test_sql_engine_reads_tariffs_by_index(db, catalog):
+    # Table statistics, as a database that has been analyzed has them
+    db.execute(text("ANALYZE"))
+    with tariff_queries() as queries:
+        matching.match_policies_sql(db, QUOTE)
+    assert_tariffs_use(db, queries, "ix_tariffs_policy_class_age")
+    # The case-insensitive class comparison is part of the index search
+    assert "(policy_id=? AND <expr>=?" in query_plan(db, *queries[0])
+
+
+def test_postgres_reads_tariffs_by_index(postgres_db, postgres_catalog):
+    # A table this small is read sequentially unless that is ruled out
+    postgres_db.execute(text("ANALYZE tariffs"))
+    postgres_db.execute(text("SET enable_seqscan = off"))
+    bind = postgres_db.get_bind()
+    with tariff_queries(bind) as sql_queries:
+        matching.match_policies_sql(postgres_db, QUOTE)
+    with tariff_queries(bind) as scan_queries:
+        matching.match_policies_scan(postgres_db, QUOTE)
+
+    def plan(statement, parameters):
+        rows = postgres_db.connection().exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        return "\n".join(row[0] for row in rows)
+
+    sql_plan = plan(*sql_queries[0])
+    assert "ix_tariffs_policy_class_age" in sql_plan, sql_plan
+    # The class comparison is an index condition, not a filter on the rows found
+    assert any("upper(" in line for line in sql_plan.splitlines() if "Index Cond:" in line), sql_plan
+    assert scan_queries
+    for statement, parameters in scan_queries:
+        scan_plan = plan(statement, parameters)
+        assert any(f"Index Scan using {name}" in scan_plan or f"Bitmap Index Scan on {name}" in scan_plan
+                   for name in TARIFF_INDEXES), scan_plan
+
+
+@pytest.mark.parametrize("method", ["get", "delete"])
+def test_admin_policy_tariffs_use_index(client, db, catalog, method):
+    with tariff_queries() as queries:
+        response = client.request(method, f"/admin/policies/{catalog[0]}/tariffs")
+    assert response.status_code == 200
+    reads = [(statement, parameters) for statement, parameters in queries if not statement.startswith("DELETE")]
+    assert_tariffs_use(db, reads, *TARIFF_INDEXES)
+
+
+def test_upload_key_lookup_uses_unique_index(db, catalog):
+    keys = [(catalog[0], 0, 30, "A", 1, 1, None), (catalog[1], 18, 45, "A", 1, 1, 0.5)]
+    with tariff_queries() as queries:
+        current = tariff_import.load_current_tariffs(db, keys)
+    assert set(current) == set(keys)
+    assert_tariffs_use(db, queries, "uq_tariffs_upload_key")
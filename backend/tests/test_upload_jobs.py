@@ -0,0 +1,93 @@
+import io
+import json
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from app import models, upload_jobs, utils
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/admin/upload/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Upload job {job_id} did not finish within {timeout}s")
+
+
+def tariff_csv(policy_ids, rows):
+    lines = ["policy_id,age_min,age_max,class_type,family_min,family_max,inpatient_usd,total_usd"]
+    for i in range(rows):
+        lines.append(f"{policy_ids[i % len(policy_ids)]},{i},{i + 1},A,1,1,{100 + i},{100 + i}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.fixture
+def every_progress_call(monkeypatch):
+    # Write progress on every call so updates overlap the job's transactions
+    monkeypatch.setattr(upload_jobs, "UPLOAD_JOB_PROGRESS_INTERVAL", 0)
+
+
+def test_background_tariff_upload_completes(client, catalog, db, every_progress_call):
+    response = client.post(
+        "/admin/upload/tariffs",
+        files={"file": ("tariffs.csv", tariff_csv(catalog, 1200))},
+        params={"background": "true"}
+    )
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job["error"]
+    assert job["rows_processed"] == 1200
+    assert job["records_created"] == 1200
+    assert job["result"]["errors"] == []
+    assert db.query(models.Tariff).count() == 1200 + 9
+
+
+def test_background_criteria_upload_completes(client, catalog, db, every_progress_call):
+    def notes(fields):
+        return {field: {"notes": "Covered"} for field in fields}
+
+    criteria = [
+        {
+            "policy_id": policy_id,
+            "criteria_data": {"in_patient": {
+                "general_coverages": notes(utils.CRITERIA_IN_PATIENT_GENERAL),
+                "case_coverages": notes(utils.CRITERIA_IN_PATIENT_CASE)
+            }},
+            "outpatient_criteria_data": {"out_patient": notes(utils.CRITERIA_OUT_PATIENT)}
+        }
+        for policy_id in catalog
+    ]
+    response = client.post(
+        "/admin/upload/criteria",
+        files={"file": ("criteria.json", json.dumps(criteria).encode())},
+        params={"background": "true"}
+    )
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job["error"]
+    assert job["records_created"] == len(catalog)
+    assert db.query(models.PlanCriteria).count() == len(catalog)
+
+
+@pytest.mark.parametrize("failing", ["commit", "submit"])
+def test_failed_submission_removes_the_upload_copy(db, catalog, monkeypatch, tmp_path, failing):
+    monkeypatch.setattr(upload_jobs.tempfile, "tempdir", str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError(f"{failing} failed")
+
+    if failing == "commit":
+        monkeypatch.setattr(db, "commit", fail)
+    else:
+        monkeypatch.setattr(upload_jobs, "get_executor", lambda: type("Executor", (), {"submit": fail})())
+
+    upload = UploadFile(file=io.BytesIO(tariff_csv(catalog, 10)), filename="tariffs.csv")
+    with pytest.raises(RuntimeError, match=f"{failing} failed"):
+        upload_jobs.submit_upload_job(db, "tariffs", upload, lambda *args: None)
+    assert list(tmp_path.iterdir()) == []
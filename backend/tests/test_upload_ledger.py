@@ -0,0 +1,95 @@
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app import models, utils
+
+HEADER = ("policy_id", "age_min", "age_max", "class_type", "family_min", "family_max", "inpatient_usd", "total_usd")
+
+
+def two_sheet_workbook(policy_id):
+    workbook = Workbook()
+    class_a = workbook.active
+    class_a.title = "Class A"
+    class_b = workbook.create_sheet("Class B")
+    for sheet, class_type in ((class_a, "A"), (class_b, "B")):
+        sheet.append(HEADER)
+        for age in range(0, 60, 20):
+            sheet.append((policy_id, age, age + 19, class_type, 1, 1, 500 + age, 500 + age))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def read_sheets_in_process(monkeypatch):
+    monkeypatch.setattr(utils, "EXCEL_SHEET_WORKERS", 1)
+
+
+@pytest.fixture
+def policy_id(db):
+    provider = models.Provider(name="Alpha Assurance")
+    insurance_type = models.InsuranceType(name="Health")
+    db.add_all([provider, insurance_type])
+    db.flush()
+    plan = models.InsurancePlan(name="Plan", provider_id=provider.provider_id, type_id=insurance_type.type_id)
+    db.add(plan)
+    db.commit()
+    return plan.policy_id
+
+
+def upload_tariffs(client, data, **params):
+    response = client.post("/admin/upload/tariffs", files={"file": ("tariffs.xlsx", data)}, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def class_types(db):
+    return sorted(class_type for (class_type,) in db.query(models.Tariff.class_type).distinct())
+
+
+def test_identical_file_is_not_processed_again(client, db, policy_id):
+    data = two_sheet_workbook(policy_id)
+
+    assert upload_tariffs(client, data)["records_created"] == 3
+    repeated = upload_tariffs(client, data)
+    assert repeated["message"].startswith("Identical file")
+    assert repeated["records_created"] == 0
+
+
+def test_same_file_with_all_sheets_imports_the_other_sheets(client, db, policy_id):
+    data = two_sheet_workbook(policy_id)
+
+    upload_tariffs(client, data)
+    assert class_types(db) == ["A"]
+
+    result = upload_tariffs(client, data, all_sheets="true")
+    assert not result["message"].startswith("Identical file")
+    assert result["records_created"] == 3
+    assert result["records_unchanged"] == 3
+    db.expire_all()
+    assert class_types(db) == ["A", "B"]
+
+    assert upload_tariffs(client, data, all_sheets="true")["message"].startswith("Identical file")
+
+
+def test_identical_criteria_workbook_is_not_parsed_again(client, db, policy_id, monkeypatch):
+    workbook = Workbook()
+    workbook.active.append(["Policy ID", "In-Patient General: Annual Limit - Notes", "Out-Patient: Outpatient Network - Notes"])
+    workbook.active.append([policy_id, "USD 1,000,000", "Worldwide"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    def upload():
+        response = client.post("/admin/upload/criteria", files={"file": ("criteria.xlsx", buffer.getvalue())})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    assert upload()["records_created"] == 1
+
+    def fail(file):
+        raise AssertionError("a repeated workbook was parsed")
+
+    monkeypatch.setattr(utils, "iter_excel_rows", fail)
+    assert upload()["message"].startswith("Identical file")
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app import utils
+
+
+def upload(data: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+# Values that straddle read boundaries at small chunk sizes: nested containers,
+# strings with brackets, commas, escapes and multi-byte characters, bare numbers
+ROWS = [
+    {"policy_id": 1, "class_type": "A", "inpatient_usd": 1250.5, "notes": "covers [x], {y}, \"z\""},
+    {"policy_id": 22, "class_type": "b", "family_ages": [3, 7, 41], "nested": {"a": [1, {"b": None}]}},
+    {"policy_id": 333, "class_type": "C", "notes": "Médical — 医疗 — 🏥", "escaped": "tab\tand\\backslash"},
+    12345678901234567890,
+    -0.25e-3,
+    "plain string",
+    True,
+    None,
+    [],
+    {},
+]
+
+
+@pytest.fixture(params=[1, 2, 3, 7, 64, utils.UPLOAD_READ_CHUNK_SIZE])
+def chunk_size(request, monkeypatch):
+    monkeypatch.setattr(utils, "UPLOAD_READ_CHUNK_SIZE", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("dump", [
+    lambda rows: json.dumps(rows),
+    lambda rows: json.dumps(rows, indent=4),
+    lambda rows: json.dumps(rows, ensure_ascii=False, separators=(",", ":")),
+    lambda rows: "\n\t " + json.dumps(rows, indent="\t") + " \n",
+])
+def test_json_rows_match_json_loads(chunk_size, dump):
+    data = dump(ROWS).encode("utf-8")
+    assert list(utils.iter_json_rows(upload(data, "rows.json"))) == json.loads(data)
+
+
+def test_json_object_is_a_single_row(chunk_size):
+    data = json.dumps(ROWS[1]).encode("utf-8")
+    assert list(utils.iter_json_rows(upload(data, "row.json"))) == [ROWS[1]]
+
+
+def test_json_empty_array(chunk_size):
+    assert list(utils.iter_json_rows(upload(b" [ ] ", "rows.json"))) == []
+
+
+@pytest.mark.parametrize("data", [
+    b'"just a string"',
+    b'[{"a": 1}, {"b": 2}',
+    b'[{"a": 1} {"b": 2}]',
+    b'[{"a": 1}, {"b": ]',
+    b'',
+])
+def test_invalid_json_raises_value_error(chunk_size, data):
+    with pytest.raises(ValueError):
+        list(utils.iter_json_rows(upload(data, "rows.json")))
+
+
+def test_json_rows_are_read_incrementally(monkeypatch):
+    monkeypatch.setattr(utils, "UPLOAD_READ_CHUNK_SIZE", 1024)
+    file = upload(json.dumps([{"row": i, "padding": "x" * 100} for i in range(10000)]).encode(), "rows.json")
+    rows = utils.iter_json_rows(file)
+    assert next(rows) == {"row": 0, "padding": "x" * 100}
+    assert file.file.tell() <= 2 * 1024
+    assert sum(1 for _ in rows) == 9999
+    assert file.file.tell() == 0
+
+
+CSV_TEXT = (
+    'policy_id,class_type,notes\r\n'
+    '1,A,"multi-line\nnote, with comma"\r\n'
+    '2,b,"quoted ""value"""\r\n'
+    '3,C,Médical 医疗\r\n'
+    '4,,\r\n'
+)
+
+
+def test_csv_rows_match_dict_reader():
+    expected = list(csv.DictReader(io.StringIO(CSV_TEXT, newline="")))
+    file = upload(CSV_TEXT.encode("utf-8"), "rows.csv")
+    assert list(utils.iter_csv_rows(file)) == expected
+    # The upload stays open and rewound for the next reader (digest, job copy)
+    assert not file.file.closed
+    assert file.file.tell() == 0
+
+
+def test_csv_rows_are_read_incrementally():
+    lines = ["policy_id,notes"] + [f"{i},{'x' * 100}" for i in range(20000)]
+    file = upload(("\n".join(lines) + "\n").encode(), "rows.csv")
+    rows = utils.iter_csv_rows(file)
+    assert next(rows) == {"policy_id": "0", "notes": "x" * 100}
+    assert file.file.tell() < len(file.file.getvalue()) // 4
+    rows.close()
+    assert not file.file.closed
+
+
+def test_dropped_csv_reader_after_the_upload_was_closed():
+    file = upload(CSV_TEXT.encode("utf-8"), "rows.csv")
+    rows = utils.iter_csv_rows(file)
+    next(rows)
+    file.file.close()
+    rows.close()
+
+
+@pytest.mark.parametrize("size", [1, 3, 4, 10])
+def test_iter_chunks(size):
+    chunks = list(utils.iter_chunks(iter(range(10)), size))
+    assert [row for chunk in chunks for row in chunk] == list(range(10))
+    assert all(len(chunk) == size for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= size
+
+
+def test_excel_rows_are_padded_and_blank_rows_skipped():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Plan ID", "Class Type", "Notes"])
+    sheet.append([1, "A", "first"])
+    sheet.append([2, "B"])
+    sheet.append([None, "  ", None])
+    sheet.append([3, "C", "third"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    rows = list(utils.iter_excel_rows(upload(buffer.getvalue(), "rows.xlsx")))
+    assert rows == [
+        {"plan_id": 1, "class_type": "A", "notes": "first"},
+        {"plan_id": 2, "class_type": "B", "notes": None},
+        {"plan_id": 3, "class_type": "C", "notes": "third"},
+    ]
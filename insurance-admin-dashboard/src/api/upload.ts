@@ -10,6 +10,8 @@ export interface UploadResponse {
   records_processed: number;
   records_created: number;
   records_updated?: number;
+  records_unchanged?: number; // matched rows with identical values, not rewritten
+  dry_run?: boolean;
   errors?: string[];
 }
 
@@ -54,6 +56,80 @@ export async function uploadCriteria(file: File): Promise<UploadResponse> {
   return response.data;
 }
 
+/**
+ * Background upload jobs
+ * The file is accepted right away and processed by the backend worker pool;
+ * progress is read from /admin/upload/jobs/{job_id}
+ */
+export type UploadJobStatus = "queued" | "running" | "completed" | "failed";
+
+export interface UploadJob {
+  job_id: string;
+  upload_type: UploadType;
+  filename?: string | null;
+  status: UploadJobStatus;
+  rows_total?: number | null; // estimate, unknown for JSON files
+  rows_processed: number;
+  records_created: number;
+  records_updated: number;
+  result?: UploadResponse | null;
+  error?: string | null;
+  created_at?: string;
+  updated_at?: string;
+  finished_at?: string | null;
+}
+
+export async function startUploadJob(uploadType: UploadType, file: File): Promise<UploadJob> {
+  const formData = new FormData();
+  formData.append("file", file);
+
+  const response = await api.post<UploadJob>(`/admin/upload/${uploadType}`, formData, {
+    params: { background: true },
+    headers: {
+      "Content-Type": "multipart/form-data",
+    },
+  });
+
+  return response.data;
+}
+
+export async function getUploadJob(jobId: string): Promise<UploadJob> {
+  const response = await api.get<UploadJob>(`/admin/upload/jobs/${jobId}`);
+  return response.data;
+}
+
+/**
+ * Poll a job until it completes or fails, reporting every state seen.
+ * Resolves with the upload result; rejects with the job error.
+ */
+export async function waitForUploadJob(
+  jobId: string,
+  onProgress?: (job: UploadJob) => void,
+  intervalMs = 1000
+): Promise<UploadResponse> {
+  for (;;) {
+    const job = await getUploadJob(jobId);
+    onProgress?.(job);
+    if (job.status === "completed" && job.result) {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Upload failed");
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
+export async function runUploadJob(
+  uploadType: UploadType,
+  file: File,
+  onProgress?: (job: UploadJob) => void
+): Promise<UploadResponse> {
+  const job = await startUploadJob(uploadType, file);
+  onProgress?.(job);
+  return waitForUploadJob(job.job_id, onProgress);
+}
+
 // Legacy function for backward compatibility
 export async function uploadRatesFile(file: File): Promise<UploadResponse> {
   return uploadPolicies(file);
@@ -1,6 +1,6 @@
-import { useState, useEffect, useRef } from "react";
+import { useState, useRef } from "react";
 import { useMutation } from "@tanstack/react-query";
-import { uploadPolicies, uploadTariffs, uploadCriteria, UploadType } from "@/api/upload";
+import { runUploadJob, UploadJob, UploadType } from "@/api/upload";
 import {
   Card,
   CardContent,
@@ -20,68 +20,37 @@ export function UploadPage() {
   const [uploadType, setUploadType] = useState<UploadType>("policies");
   const [uploadProgress, setUploadProgress] = useState(0);
   const [estimatedTimeRemaining, setEstimatedTimeRemaining] = useState<number | null>(null);
+  const [uploadJob, setUploadJob] = useState<UploadJob | null>(null);
   const startTimeRef = useRef<number | null>(null);
-  const progressIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
 
-  const getUploadFunction = () => {
-    switch (uploadType) {
-      case "policies":
-        return uploadPolicies;
-      case "tariffs":
-        return uploadTariffs;
-      case "criteria":
-        return uploadCriteria;
-      default:
-        return uploadPolicies;
+  // Progress comes from the background job: rows processed out of the
+  // (estimated) row count of the file
+  const handleJobProgress = (job: UploadJob) => {
+    setUploadJob(job);
+    if (!startTimeRef.current || job.status !== "running" || !job.rows_total) return;
+
+    const progress = Math.min(99, (job.rows_processed / job.rows_total) * 100);
+    setUploadProgress(progress);
+
+    // Estimate the remaining time from the rate so far, after 3 seconds
+    const elapsed = (Date.now() - startTimeRef.current) / 1000; // seconds
+    if (elapsed > 3 && job.rows_processed > 0) {
+      const rowsPerSecond = job.rows_processed / elapsed;
+      const remaining = (job.rows_total - job.rows_processed) / rowsPerSecond;
+      setEstimatedTimeRemaining(Math.max(0, Math.round(remaining)));
     }
   };
 
   const uploadMutation = useMutation({
-    mutationFn: getUploadFunction(),
+    mutationFn: (selectedFile: File) => runUploadJob(uploadType, selectedFile, handleJobProgress),
     onMutate: () => {
       // Reset progress when starting upload
       setUploadProgress(0);
       setEstimatedTimeRemaining(null);
+      setUploadJob(null);
       startTimeRef.current = Date.now();
-      
-      // Start progress simulation with a realistic logarithmic curve
-      // Uses exponential decay: progress = max * (1 - e^(-k*t))
-      // This naturally slows down as it approaches the maximum
-      const maxProgress = 90; // Cap at 90% to leave room for final processing
-      const k = 0.02; // Rate constant - lower = slower progress
-      
-      progressIntervalRef.current = setInterval(() => {
-        if (!startTimeRef.current) return;
-        
-        const elapsed = (Date.now() - startTimeRef.current) / 1000; // seconds
-        
-        // Calculate progress using exponential growth formula
-        // This naturally slows down as it approaches maxProgress
-        const progress = maxProgress * (1 - Math.exp(-k * elapsed));
-        
-        setUploadProgress(progress);
-        
-        // Calculate estimated time remaining using a conservative approach
-        // Only show estimate after 3 seconds
-        if (elapsed > 3 && progress > 5) {
-          // Use a conservative multiplier: assume we're only 70% through actual processing
-          // This accounts for the fact that database operations can be slow
-          const conservativeProgress = progress * 0.7;
-          if (conservativeProgress > 0) {
-            const estimatedTotal = elapsed / (conservativeProgress / 100);
-            const remaining = estimatedTotal - elapsed;
-            setEstimatedTimeRemaining(Math.max(0, Math.round(remaining)));
-          }
-        }
-      }, 500); // Update every 500ms
     },
     onSuccess: (data) => {
-      // Clear progress interval
-      if (progressIntervalRef.current) {
-        clearInterval(progressIntervalRef.current);
-        progressIntervalRef.current = null;
-      }
-      
       // Set progress to 100%
       setUploadProgress(100);
       setEstimatedTimeRemaining(0);
@@ -119,35 +88,23 @@ export function UploadPage() {
       setTimeout(() => {
         setUploadProgress(0);
         setEstimatedTimeRemaining(null);
+        setUploadJob(null);
         startTimeRef.current = null;
       }, 2000);
     },
     onError: (error: any) => {
-      // Clear progress interval
-      if (progressIntervalRef.current) {
-        clearInterval(progressIntervalRef.current);
-        progressIntervalRef.current = null;
-      }
       setUploadProgress(0);
       setEstimatedTimeRemaining(null);
       startTimeRef.current = null;
       
-      toast.error(error.response?.data?.detail || "Upload failed");
+      // Axios errors carry the API detail; failed jobs reject with their error
+      toast.error(error.response?.data?.detail || error.message || "Upload failed");
       if (error.response?.data?.errors) {
         console.error("Upload errors:", error.response.data.errors);
       }
     },
   });
 
-  // Cleanup interval on unmount
-  useEffect(() => {
-    return () => {
-      if (progressIntervalRef.current) {
-        clearInterval(progressIntervalRef.current);
-      }
-    };
-  }, []);
-
   const handleDrag = (e: React.DragEvent) => {
     e.preventDefault();
     e.stopPropagation();
@@ -468,7 +425,13 @@ export function UploadPage() {
                 <div className="space-y-2">
                   <div className="flex items-center justify-between text-sm">
                     <span className="text-muted-foreground">
-                      Processing file...
+                      {!uploadJob
+                        ? "Uploading file..."
+                        : uploadJob.status === "queued"
+                          ? "Waiting for a worker..."
+                          : uploadJob.rows_total
+                            ? `Processing rows... ${uploadJob.rows_processed.toLocaleString()} of ~${uploadJob.rows_total.toLocaleString()}`
+                            : `Processing rows... ${uploadJob.rows_processed.toLocaleString()}`}
                     </span>
                     <span className="text-muted-foreground">
                       {Math.round(uploadProgress)}%
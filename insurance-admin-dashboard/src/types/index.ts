@@ -133,6 +133,9 @@ export interface PaginatedResponse<T> {
   page: number;
   page_size: number;
   total_pages: number;
+  // Keyset pages (?cursor=): page is null and total/total_pages only with ?total=
+  next_cursor?: string | null;
+  total_is_estimate?: boolean;
 }
 
 export interface ApiError {